@@ -0,0 +1,108 @@
+"""Seeded synthetic agencies for the benchmarks.
+
+The same scale and seed always produce the same newspapers, editors, subscribers,
+issues and deliveries, with the same IDs, on either storage backend.
+"""
+import random
+from datetime import date, timedelta
+from itertools import accumulate, count
+from typing import Dict, List
+
+from src.model.agency import Agency
+from src.model.editor import Editor
+from src.model.newspaper import Newspaper
+from src.model.subscriber import Subscriber
+
+# (papers, editors, subscribers, issues per paper, subscriptions per subscriber)
+SCALES = {
+    'small': (100, 50, 5000, 10, 3),
+    'medium': (1000, 300, 50000, 20, 3),
+    'large': (10000, 2000, 500000, 30, 3),
+}
+
+START = date(2024, 1, 1)
+FREQUENCIES = (1, 7, 14, 30)
+WORDS = ('Daily', 'Weekly', 'Morning', 'Evening', 'Herald', 'Tribune', 'Gazette', 'Courier', 'Post', 'Times')
+STREETS = ('Elm St', 'Main St', 'Oak Ave', 'Pine Rd', 'Maple Dr', 'Cedar Ln')
+
+# the IDs of each kind of entity start at their own base, so they are large like generated ones
+PAPER_BASE, EDITOR_BASE, SUBSCRIBER_BASE, ISSUE_BASE = (kind << 56 for kind in range(1, 5))
+
+
+class Dataset(object):
+    # the IDs of a generated agency, for picking the targets of the benchmarked operations
+    def __init__(self, seed: int):
+        self.seed = seed
+        self.paper_ids: List[int] = []
+        self.editor_ids: List[int] = []
+        self.subscriber_ids: List[int] = []
+        self.issue_ids: Dict[int, List[int]] = {}
+        self.released: Dict[int, List[int]] = {}
+        self.issues = 0
+        self.subscriptions = 0
+        self.deliveries = 0
+        self._next_ids = {base: count(base + 10 ** 9) for base in (PAPER_BASE, EDITOR_BASE, SUBSCRIBER_BASE)}
+
+    def fresh_id(self, base: int) -> int:
+        # an ID of this kind that the generated agency does not use yet
+        return next(self._next_ids[base])
+
+    def summary(self) -> dict:
+        return {"papers": len(self.paper_ids), "editors": len(self.editor_ids),
+                "subscribers": len(self.subscriber_ids), "issues": self.issues,
+                "subscriptions": self.subscriptions, "deliveries": self.deliveries, "seed": self.seed}
+
+
+def generate(agency: Agency, papers: int, editors: int, subscribers: int, issues: int, subscriptions: int,
+             release_ratio: float = 0.5, seed: int = 0) -> Dataset:
+    # Fills the agency. Every paper has `issues` issues (from its release calendar) with one
+    # of its editors; the first `release_ratio` of them are released and delivered to the
+    # subscribers. Subscribers pick papers with a Zipf-like skew, so a few papers are popular.
+    rng = random.Random(seed)
+    dataset = Dataset(seed)
+    issue_ids = count(ISSUE_BASE)
+
+    def allocate(number: int) -> List[int]:
+        return [next(issue_ids) for _ in range(number)]
+
+    with agency.batch():
+        for n in range(papers):
+            paper = Newspaper(PAPER_BASE + n, f'{rng.choice(WORDS)} {rng.choice(WORDS)} {n}',
+                              rng.choice(FREQUENCIES), round(rng.uniform(1, 50), 2))
+            agency.add_newspaper(paper)
+            dataset.paper_ids.append(paper.paper_id)
+
+        for n in range(editors):
+            agency.add_editor(Editor(EDITOR_BASE + n, f'Editor {n}', rng.choice(STREETS)))
+            dataset.editor_ids.append(EDITOR_BASE + n)
+
+        for paper_id in dataset.paper_ids:
+            paper = agency.get_newspaper(paper_id)
+            editor = agency.get_editor(rng.choice(dataset.editor_ids)) if dataset.editor_ids else None
+            end = START + timedelta(days=paper.frequency * (issues - 1))
+            created = agency.add_issue_calendar(paper, START, end, allocate, pages=rng.randint(8, 64),
+                                                editor=editor)["created"] if issues else 0
+            dataset.issue_ids[paper_id] = [issue.issue_id for issue in paper.issues]
+            dataset.issues += created
+
+        popularity = list(accumulate(1 / (rank + 1) for rank in range(papers)))
+        for n in range(subscribers):
+            subscriber = Subscriber(SUBSCRIBER_BASE + n, f'Reader {n}', f'{rng.randint(1, 999)} {rng.choice(STREETS)}')
+            agency.add_subscriber(subscriber)
+            dataset.subscriber_ids.append(subscriber.subscriber_id)
+            chosen = set()
+            for paper_id in rng.choices(dataset.paper_ids, cum_weights=popularity, k=min(subscriptions, papers)):
+                if paper_id not in chosen:
+                    chosen.add(paper_id)
+                    agency.subscribe(subscriber, agency.get_newspaper(paper_id))
+            dataset.subscriptions += len(chosen)
+
+        for paper_id in dataset.paper_ids:
+            paper = agency.get_newspaper(paper_id)
+            released = dataset.issue_ids[paper_id][:int(len(dataset.issue_ids[paper_id]) * release_ratio)]
+            dataset.released[paper_id] = released
+            for issue_id in released:
+                issue = agency.get_newspaper_issue(paper, issue_id)
+                agency.release_issue(paper, issue)
+                dataset.deliveries += agency.deliver_issue_to_subscribers(paper, issue)["delivered"]
+    return dataset
@@ -0,0 +1,122 @@
+"""Timing, memory and baseline comparison for the benchmark suite."""
+import gc
+import json
+import platform
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Sequence
+
+# runs of the operation done before timing, to warm caches and compiled encoders up
+WARMUP = 5
+# runs traced for the memory peak (tracemalloc slows them down, so they are not timed)
+MEMORY_RUNS = 20
+
+
+def percentile(sorted_samples: Sequence[float], point: float) -> float:
+    # nearest-rank percentile
+    if not sorted_samples:
+        return 0.0
+    rank = max(int(round(point / 100 * len(sorted_samples) + 0.5)) - 1, 0)
+    return sorted_samples[min(rank, len(sorted_samples) - 1)]
+
+
+def measure(run: Callable[[object], object], prepare: Callable[[int], List[object]], repeat: int) -> dict:
+    # Times `run` on each of the `repeat` arguments from `prepare` (made before the clock
+    # starts, so mutations get fresh targets), then traces a few more runs for the largest
+    # memory peak of a single run above what was allocated before it.
+    for argument in prepare(WARMUP):
+        run(argument)
+
+    arguments = prepare(repeat)
+    samples = []
+    gc.collect()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        for argument in arguments:
+            before = time.perf_counter_ns()
+            run(argument)
+            samples.append(time.perf_counter_ns() - before)
+        elapsed = time.perf_counter() - started
+    finally:
+        gc.enable()
+
+    peak = 0
+    arguments = prepare(min(repeat, MEMORY_RUNS))
+    tracemalloc.start()
+    try:
+        for argument in arguments:
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            run(argument)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+    finally:
+        tracemalloc.stop()
+
+    samples.sort()
+    return {"runs": len(samples),
+            "p50_ms": percentile(samples, 50) / 1e6,
+            "p99_ms": percentile(samples, 99) / 1e6,
+            "mean_ms": sum(samples) / len(samples) / 1e6 if samples else 0.0,
+            "ops_per_s": len(samples) / elapsed if elapsed else 0.0,
+            "peak_kib": peak / 1024}
+
+
+def environment() -> dict:
+    return {"python": platform.python_version(), "machine": platform.machine(), "system": platform.system(),
+            "time": time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+
+
+def save(path: str, meta: dict, results: Dict[str, dict]):
+    with open(path, 'w') as file:
+        json.dump({"meta": meta, "results": results}, file, indent=2, sort_keys=True)
+        file.write('\n')
+
+
+def load(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[dict]:
+    # The change of p50, p99 and throughput against the baseline per operation, in percent
+    # (positive is slower). An operation regressed when its p50 got slower by more than
+    # `threshold` percent; p99 over a few hundred runs is too noisy to fail a run on.
+    rows = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+
+        def change(key: str, inverse: bool = False) -> Optional[float]:
+            if not before[key]:
+                return None
+            ratio = before[key] / result[key] if inverse else result[key] / before[key]
+            return (ratio - 1) * 100
+
+        row = {"name": name, "p50": change("p50_ms"), "p99": change("p99_ms"),
+               "throughput": change("ops_per_s", inverse=True) if result["ops_per_s"] else None}
+        row["regressed"] = row["p50"] is not None and row["p50"] > threshold
+        rows.append(row)
+    return rows
+
+
+def format_results(results: Dict[str, dict]) -> str:
+    lines = [f'{"operation":<40} {"runs":>6} {"p50 ms":>9} {"p99 ms":>9} {"ops/s":>10} {"peak KiB":>9}']
+    for name, result in results.items():
+        lines.append(f'{name:<40} {result["runs"]:>6} {result["p50_ms"]:>9.3f} {result["p99_ms"]:>9.3f} '
+                     f'{result["ops_per_s"]:>10.0f} {result["peak_kib"]:>9.1f}')
+    return '\n'.join(lines)
+
+
+def format_comparison(rows: List[dict], threshold: float) -> str:
+    def percent(value):
+        return '       -' if value is None else f'{value:>+7.1f}%'
+
+    lines = [f'{"operation":<40} {"p50":>8} {"p99":>8} {"ops/s":>9}']
+    for row in rows:
+        flag = '  REGRESSED' if row["regressed"] else ''
+        lines.append(f'{row["name"]:<40} {percent(row["p50"])} {percent(row["p99"])} '
+                     f'{percent(row["throughput"]):>9}{flag}')
+    lines.append(f'(positive is slower; a regression is a p50 more than {threshold:g}% slower)')
+    return '\n'.join(lines)
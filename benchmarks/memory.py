@@ -0,0 +1,94 @@
+"""Bytes per entity of the in-memory model, measured with tracemalloc.
+
+    python -m benchmarks.memory [--papers N] [--issues N] [--subscribers N] [--subscriptions N]
+"""
+import argparse
+import gc
+import tracemalloc
+
+from src.model.agency import Agency
+from src.model.editor import Editor
+from src.model.issue import Issue
+from src.model.newspaper import Newspaper
+from src.model.subscriber import Subscriber
+
+ID_BASE = 1 << 62
+
+
+def measure(step) -> int:
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    step()
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0] - before
+
+
+def run(papers: int, issues: int, subscribers: int, subscriptions: int) -> dict:
+    agency = Agency()
+    # IDs as large as the generated ones, so that none of them is a cached small int
+    paper_ids = [ID_BASE + n for n in range(papers)]
+    subscriber_ids = [2 * ID_BASE + n for n in range(subscribers)]
+
+    def add_newspapers():
+        for paper_id in paper_ids:
+            agency.add_newspaper(Newspaper(paper_id, "Daily", 7, 2.5))
+
+    def add_editors():
+        for n in range(papers):
+            editor = Editor(3 * ID_BASE + n, "Editor", "Main St")
+            agency.add_editor(editor)
+
+    def add_issues():
+        for paper_id in paper_ids:
+            paper = agency.get_newspaper(paper_id)
+            for n in range(issues):
+                paper.add_issue(Issue("2024-01-01", 12, 3 * ID_BASE, paper_id + n * papers + ID_BASE // 2,
+                                      released=True))
+
+    def add_subscribers():
+        for subscriber_id in subscriber_ids:
+            agency.add_subscriber(Subscriber(subscriber_id, "Reader", "Elm St"))
+
+    def subscribe():
+        for position, subscriber_id in enumerate(subscriber_ids):
+            subscriber = agency.get_subscriber(subscriber_id)
+            for n in range(subscriptions):
+                subscriber.subscribe_to_newspaper(agency.get_newspaper(paper_ids[(position + n) % papers]))
+
+    def deliver():
+        for paper_id in paper_ids:
+            paper = agency.get_newspaper(paper_id)
+            for issue in paper.issues:
+                for subscriber in paper.subscribers:
+                    paper.deliver_issue_id_to_subscriber(issue, subscriber)
+
+    tracemalloc.start()
+    results = {}
+    results["newspaper"] = measure(add_newspapers) / papers
+    results["editor"] = measure(add_editors) / papers
+    results["issue"] = measure(add_issues) / (papers * issues)
+    results["subscriber"] = measure(add_subscribers) / subscribers
+    # every subscription also owes the subscriber the paper's released issues
+    results["subscription"] = measure(subscribe) / (subscribers * subscriptions)
+    results["delivery"] = measure(deliver) / (subscribers * subscriptions * issues)
+    results["total_mb"] = tracemalloc.get_traced_memory()[0] / 2 ** 20
+    tracemalloc.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--papers', type=int, default=100)
+    parser.add_argument('--issues', type=int, default=10)
+    parser.add_argument('--subscribers', type=int, default=20000)
+    parser.add_argument('--subscriptions', type=int, default=2)
+    args = parser.parse_args()
+
+    results = run(args.papers, args.issues, args.subscribers, args.subscriptions)
+    for name, value in results.items():
+        unit = 'MB total' if name == 'total_mb' else 'bytes each'
+        print(f'{name:>14}: {value:10.1f} {unit}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""Latency, throughput and memory of the model and the API on a generated agency.
+
+    python -m benchmarks.suite [--scale small|medium|large] [--backend memory|sqlite] [--seed N]
+                               [--repeat N] [--only TEXT] [--save FILE] [--compare FILE] [--threshold PERCENT]
+
+Every operation runs --repeat times on targets picked with the seed; the API operations
+go through the Flask test client. --save writes the results as a baseline and --compare
+reports the change against one, exiting with 1 if an operation got slower than allowed.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+from src.app import create_app
+from src.model.agency import Agency
+from src.model.issue import Issue
+from src.model.newspaper import Newspaper
+from src.model.subscriber import Subscriber
+
+from .generator import SCALES, PAPER_BASE, SUBSCRIBER_BASE, ISSUE_BASE, Dataset, generate
+from .harness import compare, environment, format_comparison, format_results, load, measure, save
+
+# name -> (run, prepare)
+Operations = Dict[str, Tuple[Callable[[object], object], Callable[[int], List[object]]]]
+
+
+def model_operations(agency: Agency, dataset: Dataset, rng: random.Random) -> Operations:
+    def pick(ids: List[int], count: int) -> List[int]:
+        return [rng.choice(ids) for _ in range(count)]
+
+    def fresh_subscribers(count: int, subscriptions: int = 0) -> List[Subscriber]:
+        subscribers = []
+        for _ in range(count):
+            subscriber = Subscriber(dataset.fresh_id(SUBSCRIBER_BASE), 'Reader', 'Elm St')
+            agency.add_subscriber(subscriber)
+            for paper_id in pick(dataset.paper_ids, subscriptions):
+                agency.subscribe(subscriber, agency.get_newspaper(paper_id))
+            subscribers.append(subscriber)
+        return subscribers
+
+    issue_ids = iter(range(ISSUE_BASE + 10 ** 9, ISSUE_BASE + 2 * 10 ** 9))
+
+    def released_issues(count: int) -> List[Tuple[Newspaper, Issue]]:
+        # new issues of popular papers, released but not delivered yet
+        issues = []
+        for paper_id in pick(dataset.paper_ids[:10], count):
+            paper = agency.get_newspaper(paper_id)
+            issue = Issue('2024-06-01', 24, None, next(issue_ids))
+            agency.add_newspaper_issue(paper, issue)
+            agency.release_issue(paper, issue)
+            issues.append((paper, issue))
+        return issues
+
+    return {
+        'model add_newspaper': (
+            agency.add_newspaper,
+            lambda count: [Newspaper(dataset.fresh_id(PAPER_BASE), 'Daily', 7, 2.5) for _ in range(count)]),
+        'model subscribe': (
+            lambda target: agency.subscribe(*target),
+            lambda count: list(zip(fresh_subscribers(count),
+                                   map(agency.get_newspaper, pick(dataset.paper_ids, count))))),
+        'model deliver_issue_to_subscribers': (
+            lambda target: agency.deliver_issue_to_subscribers(*target),
+            released_issues),
+        'model remove_subscriber': (
+            agency.remove_subscriber,
+            lambda count: fresh_subscribers(count, subscriptions=3)),
+        'model missing_issues': (
+            lambda subscriber_id: agency.get_subscriber(subscriber_id).calculate_missing_issues(),
+            lambda count: pick(dataset.subscriber_ids, count)),
+        'model editor_issues': (
+            lambda editor_id: list(agency.get_editor_issues(agency.get_editor(editor_id))),
+            lambda count: pick(dataset.editor_ids, count)),
+        'model analytics_summary': (
+            lambda _: agency.get_analytics().summary(),
+            lambda count: [None] * count),
+    }
+
+
+def api_operations(client, agency: Agency, dataset: Dataset, rng: random.Random) -> Operations:
+    def checked(response):
+        if response.status_code >= 400:
+            raise RuntimeError(f'{response.request.method} {response.request.url}: {response.status_code}')
+        return response
+
+    def get(url: str):
+        return checked(client.get(url))
+
+    def urls(template: str, ids: List[int]) -> Callable[[int], List[str]]:
+        return lambda count: [template.format(rng.choice(ids)) for _ in range(count)]
+
+    def fresh_subscriptions(count: int) -> List[str]:
+        subscriber_ids = []
+        for _ in range(count):
+            subscriber = Subscriber(dataset.fresh_id(SUBSCRIBER_BASE), 'Reader', 'Elm St')
+            agency.add_subscriber(subscriber)
+            subscriber_ids.append(subscriber.subscriber_id)
+        return [f'/subscriber/{subscriber_id}/subscribe/{rng.choice(dataset.paper_ids)}'
+                for subscriber_id in subscriber_ids]
+
+    released = [(paper_id, issue_id) for paper_id, issue_ids in dataset.released.items() for issue_id in issue_ids]
+    return {
+        'GET /newspaper/?limit=100': (get, lambda count: ['/newspaper/?limit=100'] * count),
+        'GET /newspaper/<id>': (get, urls('/newspaper/{}', dataset.paper_ids)),
+        'GET /newspaper/<id>/issue': (get, urls('/newspaper/{}/issue?limit=100', dataset.paper_ids)),
+        'GET /newspaper/<id>/stats': (get, urls('/newspaper/{}/stats', dataset.paper_ids)),
+        'GET /subscriber/?limit=100': (get, lambda count: ['/subscriber/?limit=100'] * count),
+        'GET /subscriber/<id>': (get, urls('/subscriber/{}', dataset.subscriber_ids)),
+        'GET /subscriber/<id>/stats': (get, urls('/subscriber/{}/stats', dataset.subscriber_ids)),
+        'GET /subscriber/<id>/missingissues': (get, urls('/subscriber/{}/missingissues', dataset.subscriber_ids)),
+        'GET /editor/<id>/issues': (get, urls('/editor/{}/issues', dataset.editor_ids)),
+        'GET /analytics/': (get, lambda count: ['/analytics/'] * count),
+        'POST /newspaper/': (
+            lambda body: checked(client.post('/newspaper/', json=body)),
+            lambda count: [{"name": "Daily", "frequency": 7, "price": 2.5}] * count),
+        'POST /subscriber/<id>/subscribe/<id>': (
+            lambda url: checked(client.post(url)), fresh_subscriptions),
+        'POST /newspaper/<id>/issue/<id>/deliver': (
+            lambda url: checked(client.post(url, json={"only_missing": True})),
+            lambda count: ['/newspaper/{}/issue/{}/deliver'.format(*rng.choice(released)) for _ in range(count)]
+            if released else []),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--papers', type=int)
+    parser.add_argument('--editors', type=int)
+    parser.add_argument('--subscribers', type=int)
+    parser.add_argument('--issues', type=int, help='Issues per newspaper')
+    parser.add_argument('--subscriptions', type=int, help='Subscriptions per subscriber')
+    parser.add_argument('--release-ratio', type=float, default=0.5,
+                        help='The share of the issues that are released and delivered')
+    parser.add_argument('--backend', choices=('memory', 'sqlite'), default='memory')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=200, help='Timed runs per operation')
+    parser.add_argument('--only', help='Only run the operations whose name contains this text')
+    parser.add_argument('--save', metavar='FILE', help='Write the results as a baseline')
+    parser.add_argument('--compare', metavar='FILE', help='Compare the results with a saved baseline')
+    parser.add_argument('--threshold', type=float, default=20.0,
+                        help='The slowdown of p50 in percent that counts as a regression')
+    args = parser.parse_args()
+
+    papers, editors, subscribers, issues, subscriptions = SCALES[args.scale]
+    scale = {"papers": args.papers if args.papers is not None else papers,
+             "editors": args.editors if args.editors is not None else editors,
+             "subscribers": args.subscribers if args.subscribers is not None else subscribers,
+             "issues": args.issues if args.issues is not None else issues,
+             "subscriptions": args.subscriptions if args.subscriptions is not None else subscriptions}
+
+    directory = tempfile.TemporaryDirectory()
+    Agency.singleton_instance = None
+    app = create_app(database=os.path.join(directory.name, 'agency.db') if args.backend == 'sqlite' else None)
+    agency = Agency.get_instance()
+    started = time.perf_counter()
+    dataset = generate(agency, release_ratio=args.release_ratio, seed=args.seed, **scale)
+    print(f'Generated {dataset.summary()} on {args.backend} in {time.perf_counter() - started:.1f}s')
+
+    rng = random.Random(args.seed + 1)
+    operations = model_operations(agency, dataset, rng)
+    operations.update(api_operations(app.test_client(), agency, dataset, rng))
+    results = {}
+    for name, (run, prepare) in operations.items():
+        if args.only and args.only not in name:
+            continue
+        results[name] = measure(run, prepare, args.repeat)
+        print(f'  {name}', file=sys.stderr)
+    print(format_results(results))
+
+    meta = dict(environment(), scale=scale, release_ratio=args.release_ratio, backend=args.backend,
+                seed=args.seed, repeat=args.repeat)
+    if args.save:
+        save(args.save, meta, results)
+        print(f'Saved the baseline to {args.save}')
+    regressed = False
+    if args.compare:
+        baseline = load(args.compare)
+        if baseline["meta"].get("scale") != scale or baseline["meta"].get("backend") != args.backend:
+            print('Warning: the baseline was taken at another scale or on another backend')
+        rows = compare(results, baseline["results"], args.threshold)
+        print(format_comparison(rows, args.threshold))
+        regressed = any(row["regressed"] for row in rows)
+    agency.repository.close()
+    directory.cleanup()
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == '__main__':
+    main()
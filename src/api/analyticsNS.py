@@ -0,0 +1,108 @@
+from flask_restx import Namespace, reqparse, Resource, fields
+
+from ..model.agency import Agency
+
+
+analytics_ns = Namespace("analytics", description="Agency-wide figures over all newspapers and subscribers")
+
+summary_model = analytics_ns.model('AnalyticsSummaryModel', {
+    'newspapers': fields.Integer(help='The number of newspapers'),
+    'subscribers': fields.Integer(help='The number of subscribers'),
+    'subscriptions': fields.Integer(help='The number of subscriptions over all newspapers'),
+    'issues': fields.Integer(help='The number of issues over all newspapers'),
+    'released_issues': fields.Integer(help='The number of released issues'),
+    'deliveries': fields.Integer(help='The number of delivered issues'),
+    'monthly_revenue': fields.Float(help='The monthly revenue of the agency'),
+    'annual_revenue': fields.Float(help='The annual revenue of the agency'),
+    'delivery_rate': fields.Float(help='Deliveries per released issue and subscriber (empty without any)')
+    })
+
+percentiles_model = analytics_ns.model('PercentilesModel', {
+    'p50': fields.Float, 'p90': fields.Float, 'p99': fields.Float
+    })
+
+top_revenue_model = analytics_ns.model('TopRevenueModel', {
+    'paper_id': fields.Integer,
+    'monthly_revenue': fields.Float
+    })
+
+newspaper_summary_model = analytics_ns.model('NewspaperAnalyticsModel', {
+    'percentiles': fields.Nested(analytics_ns.model('NewspaperPercentilesModel', {
+        'price': fields.Nested(percentiles_model),
+        'subscribers': fields.Nested(percentiles_model),
+        'monthly_revenue': fields.Nested(percentiles_model),
+        'issues': fields.Nested(percentiles_model)
+        })),
+    'top_revenue': fields.List(fields.Nested(top_revenue_model),
+            help='The newspapers with the highest monthly revenue, highest first')
+    })
+
+group_model = analytics_ns.model('NewspaperGroupModel', {
+    'frequency': fields.Integer(help='The frequency of the group (when grouped by frequency)'),
+    'min_price': fields.Float(help='The lowest price of the band, inclusive (when grouped by price)'),
+    'max_price': fields.Float(help='The highest price of the band, exclusive (when grouped by price)'),
+    'newspapers': fields.Integer,
+    'subscribers': fields.Integer,
+    'monthly_revenue': fields.Float,
+    'delivery_rate': fields.Float
+    })
+
+subscriber_summary_model = analytics_ns.model('SubscriberAnalyticsModel', {
+    'subscriptions': fields.List(fields.Nested(analytics_ns.model('SubscriptionCountModel', {
+        'subscriptions': fields.Integer,
+        'subscribers': fields.Integer
+        })), help='The number of subscribers with each number of subscriptions'),
+    'monthly_cost': fields.Nested(percentiles_model)
+    })
+
+top_parser = reqparse.RequestParser()
+top_parser.add_argument('top', type=int, default=10, location='args',
+                        help='The number of newspapers in the revenue ranking')
+
+group_parser = reqparse.RequestParser()
+group_parser.add_argument('by', type=str, default='frequency', choices=('frequency', 'price'), location='args',
+                          help='Group the newspapers by frequency or by price band')
+group_parser.add_argument('bands', type=str, location='args',
+                          help='The price band edges for by=price, comma separated, e.g. 5,10,20')
+
+
+@analytics_ns.route('/')
+class AnalyticsAPI(Resource):
+    @analytics_ns.doc(description="Totals, revenue and delivery rate of the agency")
+    @analytics_ns.marshal_with(summary_model)
+    def get(self):
+        return Agency.get_instance().get_analytics().summary()
+
+
+@analytics_ns.route('/newspapers')
+class NewspaperAnalyticsAPI(Resource):
+    @analytics_ns.doc(description="Percentiles over the newspapers and the top newspapers by revenue")
+    @analytics_ns.expect(top_parser)
+    @analytics_ns.marshal_with(newspaper_summary_model)
+    def get(self):
+        top = top_parser.parse_args()['top']
+        if top < 0:
+            analytics_ns.abort(400, 'top must not be negative')
+        return Agency.get_instance().get_analytics().newspaper_summary(top)
+
+
+@analytics_ns.route('/newspapers/groups')
+class NewspaperGroupsAPI(Resource):
+    @analytics_ns.doc(description="Newspapers, subscribers, revenue and delivery rate per frequency or price band")
+    @analytics_ns.expect(group_parser)
+    @analytics_ns.marshal_list_with(group_model, envelope='groups')
+    def get(self):
+        args = group_parser.parse_args()
+        try:
+            bands = [float(edge) for edge in args['bands'].split(',') if edge.strip()] if args['bands'] else None
+        except ValueError:
+            analytics_ns.abort(400, f'Invalid price bands: {args["bands"]}')
+        return Agency.get_instance().get_analytics().newspaper_groups(args['by'], bands)
+
+
+@analytics_ns.route('/subscribers')
+class SubscriberAnalyticsAPI(Resource):
+    @analytics_ns.doc(description="The distribution of subscriptions and percentiles of the monthly cost")
+    @analytics_ns.marshal_with(subscriber_summary_model)
+    def get(self):
+        return Agency.get_instance().get_analytics().subscriber_summary()
@@ -0,0 +1,147 @@
+import codecs
+import json
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Dict, Iterator, List, Tuple
+
+from flask import request
+
+CHUNK_SIZE = 64 * 1024
+BATCH_SIZE = 1000
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonlines')
+
+# field name -> (accepted types, required)
+Spec = Dict[str, Tuple[tuple, bool]]
+
+
+class MalformedBody(ValueError):
+    def __init__(self, row: int, message: str):
+        super().__init__(message)
+        self.row = row
+
+
+def _iter_ndjson(stream) -> Iterator[Tuple[int, object]]:
+    row = 0
+    for line in iter(stream.readline, b''):
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            yield row, json.loads(line)
+        except ValueError as e:
+            yield row, e
+
+
+def _iter_json_array(stream, chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[int, object]]:
+    # Reads a top-level JSON array one element at a time, keeping only the unparsed tail in memory
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8')()
+    buffer, position, eof, row = '', 0, False, 0
+
+    def more() -> bool:
+        nonlocal buffer, position, eof
+        if eof:
+            return False
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + text.decode(chunk, final=eof)
+        position = 0
+        return True
+
+    def next_char() -> str:
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n':
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not more():
+                return ''
+
+    if next_char() != '[':
+        raise MalformedBody(row, 'Expected a JSON array or NDJSON body')
+    position += 1
+    if next_char() == ']':
+        return
+
+    while True:
+        next_char()
+        while True:
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+                # a value that touches the end of the buffer may be cut off mid-number
+                if end < len(buffer) or eof:
+                    break
+            except ValueError:
+                pass
+            if not more():
+                raise MalformedBody(row + 1, 'Malformed JSON element')
+        position = end
+        row += 1
+        yield row, record
+
+        separator = next_char()
+        position += 1
+        if separator == ']':
+            return
+        if separator != ',':
+            raise MalformedBody(row, "Expected ',' or ']' after element")
+
+
+def iter_records() -> Iterator[Tuple[int, object]]:
+    if request.mimetype in NDJSON_MIMETYPES:
+        return _iter_ndjson(request.stream)
+    return _iter_json_array(request.stream)
+
+
+def validate(record, spec: Spec) -> str:
+    # returns an error message, or an empty string for a valid record
+    if not isinstance(record, dict):
+        return 'Expected a JSON object'
+    for field, (types, required) in spec.items():
+        if field not in record:
+            if required:
+                return f"'{field}' is a required property"
+            continue
+        value = record[field]
+        if isinstance(value, bool) or not isinstance(value, types):
+            return f"'{field}' has an invalid type"
+    return ''
+
+
+def ingest(spec: Spec, build: Callable[[int, dict], object], add: Callable[[object], None],
+           entity_id: Callable[[object], int], allocate_ids: Callable[[int], List[int]],
+           batch_size: int = BATCH_SIZE, transaction: Callable[[], ContextManager] = nullcontext) -> dict:
+    # Validate and insert streamed records batch by batch, collecting per-row errors;
+    # the IDs of a batch are reserved together and each batch is added in one `transaction`,
+    # which is not held while the next batch is read from the request
+    ids, errors, batch = [], [], []
+
+    def flush():
+        valid = []
+        for row, record in batch:
+            message = str(record) if isinstance(record, Exception) else validate(record, spec)
+            if message:
+                errors.append({"row": row, "message": message})
+            else:
+                valid.append((row, record))
+        with transaction():
+            for (row, record), new_id in zip(valid, allocate_ids(len(valid))):
+                entity = build(new_id, record)
+                try:
+                    add(entity)
+                except ValueError as e:
+                    errors.append({"row": row, "message": str(e)})
+                    continue
+                ids.append(entity_id(entity))
+        batch.clear()
+
+    try:
+        for row, record in iter_records():
+            batch.append((row, record))
+            if len(batch) >= batch_size:
+                flush()
+    except MalformedBody as e:
+        errors.append({"row": e.row, "message": str(e)})
+    flush()
+
+    return {"created": len(ids), "ids": ids, "errors": errors}
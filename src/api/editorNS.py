@@ -4,7 +4,12 @@ from flask_restx import Namespace, Resource, fields
 from ..model.agency import Agency
 from ..model.editor import Editor
 
-from uuid import uuid4
+from .bulk import ingest
+from .pagination import page_parser, paginate
+from .streaming import streamable
+from .encoders import encoded_with
+from .newspaperNS import bulk_result_model, issue_model, issue_summary_fields
+
 
 editor_ns = Namespace("editor", description="Editor related operations")
 
@@ -18,27 +23,69 @@ editor_model = editor_ns.model('EditorModel', {
     'newspapers': fields.List(fields.Integer, required=False)
     })
 
+editor_page_model = editor_ns.model('EditorPageModel', {
+    'editors': fields.List(fields.Nested(editor_model)),
+    'next': fields.String(help='The cursor of the next page, null on the last page')
+    })
+
+editor_issue_model = editor_ns.clone('EditorIssueModel', issue_model, {
+    'paper_id': fields.Integer(help='The newspaper of the issue')
+    })
+
+editor_issue_page_model = editor_ns.model('EditorIssuePageModel', {
+    'message': fields.String,
+    'issues': fields.List(fields.Nested(editor_issue_model)),
+    'next': fields.String(help='The cursor of the next page, null on the last page')
+    })
+
+editor_page_parser = page_parser()
+editor_issue_page_parser = page_parser()
+
+editor_spec = {'name': ((str,), True), 'address': ((str,), False)}
+
 @editor_ns.route('/')
 class EditorAPI(Resource):
     @editor_ns.doc(editor_model, description="Create an editor")
     @editor_ns.marshal_list_with(editor_model, envelope='editors')
     def post(self):
-        editor_id = int(uuid4().int >> 64)
+        editor_id = Agency.get_instance().ids.next_id()
         new_editor = Editor(editor_id=editor_id,
                             name=editor_ns.payload['name'],
                             address=editor_ns.payload['address'])
         Agency.get_instance().add_editor(new_editor)
         return new_editor.serialize()
 
-    @editor_ns.doc(editor_model, description="List all editors in the agency")
-    @editor_ns.marshal_list_with(editor_model, envelope='editors')
+    @editor_ns.doc(editor_model, description="List all editors in the agency (stream=json|ndjson streams the whole collection)")
+    @streamable(editor_model, 'editors', lambda: (Agency.get_instance().get_all_editors(), None), Editor.serialize,
+                key=lambda editor: editor.editor_id)
+    @editor_ns.expect(editor_page_parser)
+    @encoded_with(editor_ns, editor_page_model)
     def get(self):
-        return [editor.serialize() for editor in Agency.get_instance().get_all_editors()]
+        try:
+            editors, next_cursor = paginate(Agency.get_instance().get_all_editors(), editor_page_parser.parse_args())
+        except ValueError as e:
+            editor_ns.abort(400, str(e))
+        return {"editors": [editor.serialize() for editor in editors], "next": next_cursor}
+
+@editor_ns.route('/bulk')
+class EditorBulk(Resource):
+    @editor_ns.doc(description="Create editors from a streamed NDJSON body or a JSON array of editors")
+    @editor_ns.response(200, 'Success', bulk_result_model)
+    def post(self):
+        agency = Agency.get_instance()
+        return ingest(editor_spec,
+                      lambda editor_id, record: Editor(editor_id=editor_id,
+                                                       name=record['name'],
+                                                       address=record.get('address')),
+                      agency.add_editor,
+                      lambda editor: editor.editor_id,
+                      agency.ids.allocate,
+                      transaction=agency.batch), 200
 
 @editor_ns.route('/<int:editor_id>')
 class EditorID(Resource):
     @editor_ns.doc(description="Get an editor information")
-    @editor_ns.marshal_with(editor_model, envelope='editor')
+    @encoded_with(editor_ns, editor_model, envelope='editor')
     def get(self, editor_id):
         search_result = Agency.get_instance().get_editor(editor_id)
         if not search_result:
@@ -48,16 +95,19 @@ class EditorID(Resource):
     @editor_ns.doc(editor_model, description="Update an editor information")
     @editor_ns.marshal_list_with(editor_model, envelope='editors')
     def post(self, editor_id):
-        targeted_editor = Agency.get_instance().get_editor(editor_id)
+        agency = Agency.get_instance()
+        targeted_editor = agency.get_editor(editor_id)
         if not targeted_editor:
             return jsonify(f"Editor with ID {editor_id} was not found"),404
 
-        if 'name' in editor_ns.payload:
-            targeted_editor.name = editor_ns.payload['name']
-        if 'address' in editor_ns.payload:
-            targeted_editor.address = editor_ns.payload['address']
+        agency.update_editor(targeted_editor,
+                             name=editor_ns.payload.get('name'),
+                             address=editor_ns.payload.get('address'))
         if 'editor_id' in editor_ns.payload:
-            targeted_editor.editor_id = editor_ns.payload['editor_id']
+            try:
+                agency.change_editor_id(targeted_editor, editor_ns.payload['editor_id'])
+            except ValueError as e:
+                return {"message": str(e)}, 409
         return targeted_editor.serialize()
 
 @editor_ns.route('/<int:editor_id>')
@@ -69,23 +119,25 @@ class EditorID(Resource):
             return {"message":f"Editor with ID {editor_id} was not found"}, 404
         
         else:
-            for issue_id in targeted_editor.get_editor_issues_ids():
-                issue = agency.get_issue(issue_id)
-                if issue is None:
-                    continue
-                other_editor = agency.get_any_other_editor(targeted_editor, issue.newspaper)
-                if other_editor:
-                    targeted_editor.reassign_issue(issue, other_editor)
-
-            agency.remove_editor(targeted_editor)
-            return {"message":f"Editor with ID {editor_id} was deleted"}, 200
+            # the editor's issues go to other editors of their newspapers
+            reassigned = agency.remove_editor(targeted_editor)
+            return {"message":f"Editor with ID {editor_id} was deleted", "reassigned_issues": reassigned}, 200
 
 @editor_ns.route('/<int:editor_id>/issues')
 class EditorIssues(Resource):
+    @editor_ns.doc(description="List the issues the editor is responsible for")
+    @editor_ns.expect(editor_issue_page_parser)
+    @encoded_with(editor_ns, editor_issue_page_model)
     def get(self, editor_id):
         # get editor issues
-        editor = Agency.get_instance().get_editor(editor_id)
+        agency = Agency.get_instance()
+        editor = agency.get_editor(editor_id)
         if not editor:
-            return jsonify(f"Editor with ID {editor_id} was not found"),404
-        editor_issue_ids = editor.get_editor_issues_ids()
-        return {"message": f"Editor with ID {editor_id} was responsible for the following issues", "issues": editor_issue_ids}, 200
\ No newline at end of file
+            editor_ns.abort(404, f"Editor with ID {editor_id} was not found")
+        try:
+            issues, next_cursor = paginate(agency.get_editor_issues(editor), editor_issue_page_parser.parse_args())
+        except ValueError as e:
+            editor_ns.abort(400, str(e))
+        return {"message": f"Editor with ID {editor_id} was responsible for the following issues",
+                "issues": [dict(issue.serialize(issue_summary_fields), paper_id=issue.paper_id) for issue in issues],
+                "next": next_cursor}, 200
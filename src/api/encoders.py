@@ -0,0 +1,206 @@
+import json
+from functools import wraps
+from http import HTTPStatus
+from json.encoder import encode_basestring_ascii
+from math import isfinite
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from flask import Response, current_app, request
+from flask_restx import fields, marshal
+from flask_restx.inputs import boolean
+from flask_restx.marshalling import marshal_with
+from flask_restx.utils import merge, unpack
+
+from .projection import to_mask
+
+_dumps = json.JSONEncoder(separators=(',', ':')).encode
+_str = encode_basestring_ascii
+
+# keys that marshal would look up as attributes of a dict when they are missing
+_DICT_ATTRIBUTES = frozenset(dir(dict))
+
+
+def _float(value) -> str:
+    value = float(value)
+    return repr(value) if isfinite(value) else _dumps(value)
+
+
+def _bool(value) -> str:
+    return 'true' if boolean(value) else 'false'
+
+
+# the JSON of a formatted non-null value, per field type
+_SCALARS = {
+    fields.Integer: lambda value: str(int(value)),
+    fields.Float: _float,
+    fields.String: lambda value: _str(str(value)),
+    fields.Boolean: _bool,
+    fields.Raw: _dumps,
+}
+
+
+class _Unsupported(Exception):
+    # a model with fields the encoders do not know; it is marshalled instead
+    pass
+
+
+class _Fallback(Exception):
+    # data that marshal handles differently from what the encoder expects
+    pass
+
+
+def _null(field) -> str:
+    # the JSON of a missing value (Raw.output)
+    if callable(field.default):
+        raise _Unsupported()
+    default = field.default
+    return _dumps(field.format(default) if default else default)
+
+
+def _scalar(field) -> Callable[[object], str]:
+    format = _SCALARS.get(type(field))
+    if format is None or field.mask is not None:
+        raise _Unsupported()
+    null = _null(field)
+
+    def scalar(value):
+        return null if value is None else format(value)
+    return scalar
+
+
+def _nested(field) -> Callable[[object], str]:
+    if type(field) is not fields.Nested or field.mask is not None:
+        raise _Unsupported()
+    encoder = compile_encoder(field.nested, field.skip_none)
+    if field.allow_null:
+        missing = 'null'
+    elif field.default is not None:
+        missing = _dumps(field.default)
+    else:
+        missing = encoder(None)
+
+    def nested(value):
+        return missing if value is None else encoder(value)
+    return nested
+
+
+def _list(field) -> Callable[[object], str]:
+    if field.mask is not None or callable(field.default):
+        raise _Unsupported()
+    item = _nested(field.container) if type(field.container) is fields.Nested else _scalar(field.container)
+    missing = _dumps(field.default)
+
+    def items(value):
+        if value is None:
+            return missing
+        if type(value) is dict or type(value) is str:
+            raise _Fallback()
+        return '[' + ','.join([item(element) for element in value]) + ']'
+    return items
+
+
+def _field(field) -> Callable[[object], str]:
+    if type(field) is fields.List:
+        return _list(field)
+    if type(field) is fields.Nested:
+        return _nested(field)
+    return _scalar(field)
+
+
+def _columns(model, only: Optional[FrozenSet[str]]) -> List[Tuple[str, str, Callable[[object], str]]]:
+    # (JSON key, dict key, value encoder) for each field of the model that is encoded
+    if getattr(model, '__mask__', None):
+        raise _Unsupported()
+    columns = []
+    for name, field in getattr(model, 'resolved', model).items():
+        if only is not None and name not in only:
+            continue
+        if isinstance(field, dict):
+            raise _Unsupported()
+        if isinstance(field, type):
+            field = field()
+        attribute = field.attribute if field.attribute is not None else name
+        if not isinstance(attribute, str) or '.' in attribute or attribute in _DICT_ATTRIBUTES:
+            raise _Unsupported()
+        columns.append((_str(name) + ':', attribute, _field(field)))
+    return columns
+
+
+_encoders: Dict[Tuple[int, bool, Optional[FrozenSet[str]]], Tuple[object, Callable[[object], str]]] = {}
+
+
+def compile_encoder(model, skip_none: bool = False, only: Optional[FrozenSet[str]] = None) -> Callable[[object], str]:
+    # A function that encodes what `marshal(data, model)` returns as compact JSON, without
+    # building the marshalled dicts. It is built once per model (and field subset `only`) from
+    # one encoder per field; data that is not a dict, and models with fields it does not know,
+    # go through marshal.
+    key = (id(model), skip_none, only)
+    cached = _encoders.get(key)
+    if cached is not None:
+        return cached[1]
+
+    mask = to_mask(only)
+
+    def slow(data):
+        return _dumps(marshal(data, model, skip_none=skip_none, mask=mask))
+
+    try:
+        columns = _columns(model, only)
+    except _Unsupported:
+        encoder = slow
+    else:
+        def encoder(data):
+            if type(data) is not dict:
+                if type(data) is list or type(data) is tuple:
+                    return '[' + ','.join([encoder(item) for item in data]) + ']'
+                return slow(data)
+            get = data.get
+            try:
+                parts = [(json_key, value(get(attribute))) for json_key, attribute, value in columns]
+            except _Fallback:
+                return slow(data)
+            if skip_none:
+                # marshal leaves out the nulls and empty objects
+                parts = [(json_key, part) for json_key, part in parts if part != 'null' and part != '{}']
+            return '{' + ','.join([json_key + part for json_key, part in parts]) + '}'
+    _encoders[key] = (model, encoder)
+    return encoder
+
+
+def encode(data, model, envelope: Optional[str] = None, skip_none: bool = False,
+           only: Optional[FrozenSet[str]] = None) -> str:
+    body = compile_encoder(model, skip_none, only)(data)
+    return '{' + _str(envelope) + ':' + body + '}' if envelope else body
+
+
+def encoded(data, model, envelope: Optional[str] = None, status: int = HTTPStatus.OK, headers=None,
+            skip_none: bool = False, only: Optional[FrozenSet[str]] = None) -> Response:
+    # the response `marshal(data, model, envelope)` would give, encoded in one pass
+    return Response(encode(data, model, envelope, skip_none, only) + '\n', status=status, headers=headers,
+                    mimetype='application/json')
+
+
+def encoded_with(namespace, model, as_list: bool = False, code: int = HTTPStatus.OK,
+                 description: Optional[str] = None, **kwargs):
+    # Namespace.marshal_with, documented the same way, with the response encoded by the
+    # compiled encoder of the model. Requests with an X-Fields mask are marshalled as before.
+    envelope, skip_none = kwargs.get('envelope'), kwargs.get('skip_none', False)
+
+    def decorator(view):
+        doc = {"responses": {str(code): (description, [model], kwargs) if as_list else (description, model, kwargs)},
+               "__mask__": kwargs.get("mask", True)}
+        view.__apidoc__ = merge(getattr(view, "__apidoc__", {}), doc)
+        marshalled = marshal_with(model, ordered=namespace.ordered, **kwargs)(view)
+        compile_encoder(model, skip_none)
+
+        @wraps(view)
+        def wrapper(*args, **view_kwargs):
+            if kwargs.get('mask') or request.headers.get(current_app.config['RESTX_MASK_HEADER']):
+                return marshalled(*args, **view_kwargs)
+            response = view(*args, **view_kwargs)
+            if isinstance(response, Response):
+                return response
+            data, status, headers = unpack(response)
+            return encoded(data, model, envelope, status, headers, skip_none)
+        return wrapper
+    return decorator
@@ -0,0 +1,50 @@
+import hashlib
+import os
+from functools import wraps
+from typing import Callable, Hashable, Optional
+
+from flask import Response, request
+
+# versions restart after a restart of the process, so tags from an earlier run must not match
+_EPOCH = os.urandom(8).hex()
+
+
+def make_etag(stamp: Hashable) -> str:
+    # the tag covers the path and query string, since they select the representation
+    source = repr((_EPOCH, request.path, request.query_string, stamp)).encode()
+    return hashlib.blake2b(source, digest_size=12).hexdigest()
+
+
+def _with_etag(response, etag: str):
+    if isinstance(response, Response):
+        if 200 <= response.status_code < 300:
+            response.set_etag(etag)
+        return response
+    if isinstance(response, tuple):
+        data, code = response[0], response[1] if len(response) > 1 else 200
+        headers = dict(response[2]) if len(response) > 2 else {}
+    else:
+        data, code, headers = response, 200, {}
+    if 200 <= code < 300:
+        headers['ETag'] = f'"{etag}"'
+    return data, code, headers
+
+
+def conditional(stamp: Callable[..., Optional[Hashable]]):
+    # Sends a strong ETag derived from `stamp` (entity versions) and answers a matching
+    # If-None-Match with 304 before the view runs. `stamp` gets the view arguments and
+    # returns None when the entity does not exist, leaving the 404 to the view.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(resource, *args, **kwargs):
+            version = stamp(*args, **kwargs)
+            if version is None:
+                return view(resource, *args, **kwargs)
+            etag = make_etag(version)
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+                response.set_etag(etag)
+                return response
+            return _with_etag(view(resource, *args, **kwargs), etag)
+        return wrapper
+    return decorator
@@ -0,0 +1,52 @@
+from flask_restx import Namespace, inputs, reqparse, Resource, fields
+
+from ..model.agency import Agency
+
+# deletes that unlink more records than this run as a background job by default
+BACKGROUND_CASCADE_SIZE = 10000
+
+jobs_ns = Namespace("jobs", description="Background jobs, such as large cascading deletes")
+
+job_model = jobs_ns.model('JobModel', {
+    'job_id': fields.Integer(help='The unique identifier of the job'),
+    'kind': fields.String(help='What the job does, e.g. remove_newspaper'),
+    'target': fields.Integer(help='The ID of the entity the job works on'),
+    'status': fields.String(help='pending, running, done or failed'),
+    'done': fields.Integer(help='The number of records processed so far'),
+    'total': fields.Integer(help='The number of records to process'),
+    'result': fields.Raw(help='The outcome of a finished job'),
+    'error': fields.String(help='Why the job failed')
+    })
+
+cascade_parser = reqparse.RequestParser()
+cascade_parser.add_argument('background', type=inputs.boolean, location='args',
+                            help=f'Run the delete as a background job (by default when it unlinks more than '
+                                 f'{BACKGROUND_CASCADE_SIZE} records)')
+
+
+def run_in_background(size: int) -> bool:
+    background = cascade_parser.parse_args()['background']
+    return size > BACKGROUND_CASCADE_SIZE if background is None else background
+
+
+def accepted(message: str, job):
+    return {"message": message, "job": job.serialize()}, 202, {"Location": f"/jobs/{job.job_id}"}
+
+
+@jobs_ns.route('/')
+class JobsAPI(Resource):
+    @jobs_ns.doc(description="List the running and recently finished jobs of every process sharing the agency")
+    @jobs_ns.marshal_list_with(job_model, envelope='jobs')
+    def get(self):
+        return [job.serialize() for job in Agency.get_instance().jobs]
+
+
+@jobs_ns.route('/<int:job_id>')
+class JobID(Resource):
+    @jobs_ns.doc(description="Get the progress of a job")
+    @jobs_ns.marshal_with(job_model, envelope='job')
+    def get(self, job_id):
+        job = Agency.get_instance().jobs.get(job_id)
+        if job is None:
+            jobs_ns.abort(404, f"Job with ID {job_id} was not found")
+        return job.serialize()
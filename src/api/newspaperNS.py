@@ -1,11 +1,20 @@
-from flask import jsonify
-from flask_restx import Namespace, reqparse, Resource, fields
+from datetime import date
+
+from flask import current_app, jsonify, request
+from flask_restx import Namespace, inputs, reqparse, Resource, fields
 
 from ..model.agency import Agency
 from ..model.newspaper import Newspaper
 from ..model.issue import Issue
+from ..model.delivery import DEFAULT_BATCH_SIZE
+from .bulk import ingest
+from .pagination import page_parser, paginate
+from .streaming import streamable
+from .projection import projection_parser, parse_projection
+from .encoders import encoded, encoded_with
+from .etag import conditional
+from .jobsNS import cascade_parser, run_in_background, accepted
 
-from uuid import uuid4
 
 
 newspaper_ns = Namespace("newspaper", description="Newspaper related operations")
@@ -15,9 +24,9 @@ issue_model = newspaper_ns.model("IssueModel",{
             help="The date of publication of the issue, e.g. 2021-09-01"),
     "released": fields.Boolean(required=False,
             help="The status of the issue, e.g. True or False"),
-    "page": fields.Integer(required=False,
+    "page": fields.Integer(required=False, attribute="pages",
             help="The number of pages in the issue, e.g. page 32"),
-    "editor_id": fields.Integer(required=False,
+    "editor_id": fields.Integer(required=False, attribute="editor",
             help="The editor of the issue, e.g. 24123"),
     "issue_id": fields.Integer(required=False,
             help="The unique identifier of the issue"),
@@ -38,6 +47,134 @@ paper_model = newspaper_ns.model('NewspaperModel', {
             help='The list of subscribers to the newspaper')
    })
 
+# a projection with depth=0 lists the issues by ID
+paper_projected_model = newspaper_ns.clone('NewspaperProjectedModel', paper_model, {
+    'issues': fields.List(fields.Integer, required=False,
+            help='The IDs of the issues of the newspaper')
+   })
+
+# what the issue lists return; the recipients of each issue are left out
+issue_summary_fields = ('issue_id', 'release_date', 'pages', 'editor', 'released')
+paper_summary_fields = ('paper_id', 'name', 'frequency', 'price')
+
+paper_projection_parser = projection_parser(max_depth=1)
+
+bulk_delivery_model = newspaper_ns.model('BulkDeliveryModel', {
+    'only_missing': fields.Boolean(required=False, default=False,
+            help='Only deliver to subscribers that have not received the issue yet'),
+    'subscriber_ids': fields.List(fields.Integer, required=False,
+            help='Restrict the delivery to these subscribers of the newspaper'),
+    'batch_size': fields.Integer(required=False, default=DEFAULT_BATCH_SIZE,
+            help='The number of subscribers handled per batch')
+    })
+
+bulk_delivery_result_model = newspaper_ns.model('BulkDeliveryResultModel', {
+    'message': fields.String,
+    'issue_id': fields.Integer,
+    'targeted': fields.Integer,
+    'delivered': fields.Integer,
+    'already_delivered': fields.Integer,
+    'batches': fields.Integer
+    })
+
+bulk_result_model = newspaper_ns.model('BulkResultModel', {
+    'created': fields.Integer(help='The number of created entities'),
+    'ids': fields.List(fields.Integer, help='The IDs assigned to the created entities, in input order'),
+    'errors': fields.List(fields.Raw, help='The rejected rows with their error messages')
+    })
+
+newspaper_spec = {'name': ((str,), True), 'frequency': ((int,), True), 'price': ((int, float), True)}
+
+paper_page_model = newspaper_ns.model('NewspaperPageModel', {
+    'newspapers': fields.List(fields.Nested(paper_model)),
+    'next': fields.String(help='The cursor of the next page, null on the last page')
+    })
+
+issue_page_model = newspaper_ns.model('IssuePageModel', {
+    'issue newspaper': fields.List(fields.Nested(issue_model)),
+    'next': fields.String(help='The cursor of the next page, null on the last page')
+    })
+
+paper_page_parser = page_parser()
+
+issue_page_parser = page_parser()
+issue_page_parser.add_argument('released', type=inputs.boolean, location='args',
+            help='Only list released (true) or unreleased (false) issues')
+issue_page_parser.add_argument('release_date_from', type=str, location='args',
+            help='Only list issues released on or after this date, e.g. 2021-09-01')
+issue_page_parser.add_argument('release_date_to', type=str, location='args',
+            help='Only list issues released on or before this date, e.g. 2021-09-30')
+
+def issue_filter(args):
+    released, date_from, date_to = args['released'], args['release_date_from'], args['release_date_to']
+    if released is None and not date_from and not date_to:
+        return None
+
+    def where(issue):
+        if released is not None and bool(issue.released) != released:
+            return False
+        if (date_from or date_to) and not issue.release_date:
+            return False
+        if date_from and issue.release_date < date_from:
+            return False
+        if date_to and issue.release_date > date_to:
+            return False
+        return True
+    return where
+
+
+def paper_issues(paper_id):
+    paper = Agency.get_instance().get_newspaper(paper_id)
+    if not paper:
+        return None
+    return paper.issues, issue_filter(issue_page_parser.parse_args())
+
+
+def paper_stamp(paper_id, depth_from_args: bool = False):
+    paper = Agency.get_instance().get_newspaper(paper_id)
+    if not paper:
+        return None
+    depth = paper_projection_parser.parse_args()['depth'] if depth_from_args else 0
+    return paper.stamp(depth)
+
+
+calendar_model = newspaper_ns.model('CalendarModel', {
+    'start': fields.String(required=True, help='The first release date, e.g. 2024-01-01'),
+    'end': fields.String(required=True, help='The last possible release date (inclusive), e.g. 2024-03-31'),
+    'page': fields.Integer(required=False, help='The number of pages of every issue'),
+    'editor_id': fields.Integer(required=False, help='The editor assigned to every issue')
+    })
+
+calendar_result_model = newspaper_ns.model('CalendarResultModel', {
+    'paper_id': fields.Integer,
+    'created': fields.Integer(help='The number of issues added'),
+    'skipped': fields.Integer(help='The number of dates that already had an issue'),
+    'first_release_date': fields.String,
+    'last_release_date': fields.String,
+    'error': fields.String(help='Why no calendar was generated for the newspaper')
+    })
+
+calendars_result_model = newspaper_ns.model('CalendarsResultModel', {
+    'created': fields.Integer,
+    'skipped': fields.Integer,
+    'newspapers': fields.List(fields.Nested(calendar_result_model))
+    })
+
+def calendar_arguments():
+    # (start, end, pages, editor) from the payload
+    payload = newspaper_ns.payload
+    try:
+        start, end = date.fromisoformat(payload['start']), date.fromisoformat(payload['end'])
+    except (TypeError, ValueError) as e:
+        newspaper_ns.abort(400, f'Invalid calendar dates: {e}')
+    editor = None
+    if payload.get('editor_id') is not None:
+        editor = Agency.get_instance().get_editor(payload['editor_id'])
+        if editor is None:
+            newspaper_ns.abort(404, f"Editor with ID {payload['editor_id']} was not found")
+    return start, end, payload.get('page'), editor
+
+
 stats_model = newspaper_ns.model('StatsModel', {
     'message': fields.String,
     'number_subscribers': fields.Integer,
@@ -52,52 +189,100 @@ class NewspaperAPI(Resource):
     @newspaper_ns.expect(paper_model, validate=True)
     @newspaper_ns.marshal_with(paper_model, envelope='newspaper')
     def post(self):
-        paper_id = int(uuid4().int >> 64)
+        paper_id = Agency.get_instance().ids.next_id()
         new_paper = Newspaper(paper_id=paper_id,
                               name=newspaper_ns.payload['name'],
                               frequency=newspaper_ns.payload['frequency'],
                               price=newspaper_ns.payload['price'],)
         Agency.get_instance().add_newspaper(new_paper)
 
-        return new_paper
+        return new_paper.serialize(depth=1)
 
-    @newspaper_ns.doc(paper_model, description="List all newspapers in the agency")
-    @newspaper_ns.marshal_list_with(paper_model, envelope='newspapers')
+    @newspaper_ns.doc(paper_model, description="List all newspapers in the agency (stream=json|ndjson streams the whole collection)")
+    @streamable(paper_model, 'newspapers',
+                lambda: (Agency.get_instance().all_newspapers(), None), Newspaper.serialize_paper_id,
+                key=lambda paper: paper.paper_id)
+    @newspaper_ns.expect(paper_page_parser)
+    @encoded_with(newspaper_ns, paper_page_model)
     def get(self): # List all newspapers in the agency
-        return [paper.serialize_paper_id() for paper in Agency.get_instance().all_newspapers()]
+        agency = Agency.get_instance()
+        try:
+            papers, next_cursor = paginate(agency.all_newspapers(), paper_page_parser.parse_args())
+        except ValueError as e:
+            newspaper_ns.abort(400, str(e))
+        return {"newspapers": [agency.cache.get(('paper summary', paper.paper_id), paper.version, paper.serialize_paper_id)
+                               for paper in papers],
+                "next": next_cursor}
+
+@newspaper_ns.route('/bulk')
+class NewspaperBulk(Resource):
+    @newspaper_ns.doc(description="Add newspapers from a streamed NDJSON body or a JSON array of newspapers")
+    @newspaper_ns.response(200, 'Success', bulk_result_model)
+    def post(self):
+        agency = Agency.get_instance()
+        return ingest(newspaper_spec,
+                      lambda paper_id, record: Newspaper(paper_id=paper_id,
+                                                         name=record['name'],
+                                                         frequency=record['frequency'],
+                                                         price=record['price']),
+                      agency.add_newspaper,
+                      lambda paper: paper.paper_id,
+                      agency.ids.allocate,
+                      transaction=agency.batch), 200
+
+@newspaper_ns.route('/calendar')
+class NewspapersCalendar(Resource):
+    @newspaper_ns.doc(description="Generate the issues of every newspaper between two dates, one every `frequency` days")
+    @newspaper_ns.expect(calendar_model, validate=True)
+    @newspaper_ns.marshal_with(calendars_result_model)
+    def post(self):
+        start, end, pages, editor = calendar_arguments()
+        return Agency.get_instance().add_issue_calendars(start, end, pages=pages, editor=editor)
 
 @newspaper_ns.route('/<int:paper_id>')
 class NewspaperID(Resource):
-    @newspaper_ns.doc(description="Get a new newspaper")
-    @newspaper_ns.marshal_with(paper_model, envelope='newspaper')
+    @newspaper_ns.doc(description="Get a new newspaper (a summary unless fields or depth are given)")
+    @conditional(lambda paper_id: paper_stamp(paper_id, depth_from_args=True))
+    @newspaper_ns.expect(paper_projection_parser)
+    @newspaper_ns.response(200, 'Success', paper_model)
     def get(self, paper_id): # Get a newspaper's information
         targeted_paper = Agency.get_instance().get_newspaper(paper_id)
         if not targeted_paper:
-            return jsonify(f"Newspaper with ID {paper_id} was not found"), 404
-        return targeted_paper.serialize_paper_id()
+            return {"message": f"Newspaper with ID {paper_id} was not found"}, 404
+        try:
+            fields, depth = parse_projection(paper_projection_parser, paper_model)
+        except ValueError as e:
+            return {"message": str(e)}, 400
+        if fields is None and not depth:
+            fields = set(paper_summary_fields)
+        return encoded(targeted_paper.serialize(fields, depth), paper_model if depth else paper_projected_model,
+                       envelope='newspaper', only=frozenset(fields) if fields is not None else None)
 
     @newspaper_ns.doc(parser=paper_model, description="Update a newspaper")
     @newspaper_ns.expect(paper_model, validate=True)
     @newspaper_ns.marshal_with(paper_model, envelope='newspaper')
     def post(self, paper_id):
-        targeted_paper = Agency.get_instance().get_newspaper(paper_id)
+        agency = Agency.get_instance()
+        targeted_paper = agency.get_newspaper(paper_id)
         if not targeted_paper:
             return jsonify(f"Newspaper with ID {paper_id} was not found"), 404
 
-        if 'name' in newspaper_ns.payload:
-            targeted_paper.name = newspaper_ns.payload['name']
-        if 'frequency' in newspaper_ns.payload:
-            targeted_paper.frequency = newspaper_ns.payload['frequency']
-        if 'price' in newspaper_ns.payload:
-            targeted_paper.price = newspaper_ns.payload['price']
+        agency.update_newspaper(targeted_paper,
+                                name=newspaper_ns.payload.get('name'),
+                                frequency=newspaper_ns.payload.get('frequency'),
+                                price=newspaper_ns.payload.get('price'))
 
-        return targeted_paper.serialize()
-    @newspaper_ns.doc(description="Delete a new newspaper")
+        return targeted_paper.serialize(depth=1)
+    @newspaper_ns.doc(description="Delete a newspaper with its issues, subscriptions and deliveries")
+    @newspaper_ns.expect(cascade_parser)
     def delete(self, paper_id):
         agency = Agency.get_instance()
         targeted_paper = agency.get_newspaper(paper_id)
         if not targeted_paper:
             return jsonify(f"Newspaper with ID {paper_id} was not found"), 404
+        elif run_in_background(len(targeted_paper.subscribers) + len(targeted_paper.issues)):
+            job = agency.remove_newspaper_in_background(targeted_paper)
+            return accepted(f"Newspaper with ID {paper_id} is being deleted", job)
         else:
             agency.remove_newspaper(targeted_paper)
             return {"message": f"Newspaper with ID {paper_id} was deleted"}, 200
@@ -106,8 +291,9 @@ class NewspaperID(Resource):
 class NewspaperIssue(Resource):
     @newspaper_ns.doc(parser=issue_model,description="Add a new issue to a newspaper")
     def post(self, paper_id):
-        issue_id = int(uuid4().int >> 64)
-        targeted_paper = Agency.get_instance().get_newspaper(paper_id)
+        agency = Agency.get_instance()
+        issue_id = agency.ids.next_id()
+        targeted_paper = agency.get_newspaper(paper_id)
 
         if not targeted_paper:
             return jsonify(f"Newspaper with ID {paper_id} was not found"), 404
@@ -124,45 +310,73 @@ class NewspaperIssue(Resource):
             editor=editor_id,
             issue_id=issue_id)
 
-        targeted_paper.add_issue(new_issue)
+        agency.add_newspaper_issue(targeted_paper, new_issue)
 
         return new_issue.serialize(), 201
 
-    @newspaper_ns.doc(description="Get all issues for a newspaper")
-    @newspaper_ns.marshal_with(issue_model, envelope='issue newspaper')
+    @newspaper_ns.doc(description="Get all issues for a newspaper (stream=json|ndjson streams all matching issues)")
+    @streamable(issue_model, 'issue newspaper', paper_issues, lambda issue: issue.serialize(issue_summary_fields),
+                key=lambda issue: issue.issue_id)
+    @newspaper_ns.expect(issue_page_parser)
+    @encoded_with(newspaper_ns, issue_page_model)
     def get(self, paper_id):
         search_result = Agency.get_instance().get_newspaper(paper_id)
         if not search_result:
             return jsonify(f"Newspaper with ID {paper_id} was not found"), 404
-        return search_result.issues
+
+        args = issue_page_parser.parse_args()
+        try:
+            issues, next_cursor = paginate(search_result.issues, args, issue_filter(args))
+        except ValueError as e:
+            newspaper_ns.abort(400, str(e))
+        return {"issue newspaper": [issue.serialize(issue_summary_fields) for issue in issues], "next": next_cursor}
+
+@newspaper_ns.route('/<int:paper_id>/calendar')
+class NewspaperCalendar(Resource):
+    @newspaper_ns.doc(description="Generate the issues of the newspaper between two dates, one every `frequency` days; "
+                                  "dates that already have an issue are skipped")
+    @newspaper_ns.expect(calendar_model, validate=True)
+    @newspaper_ns.marshal_with(calendar_result_model)
+    def post(self, paper_id):
+        agency = Agency.get_instance()
+        targeted_paper = agency.get_newspaper(paper_id)
+        if not targeted_paper:
+            newspaper_ns.abort(404, f"Newspaper with ID {paper_id} was not found")
+        start, end, pages, editor = calendar_arguments()
+        try:
+            return agency.add_issue_calendar(targeted_paper, start, end, pages=pages, editor=editor)
+        except ValueError as e:
+            newspaper_ns.abort(400, str(e))
 
 @newspaper_ns.route('/<int:paper_id>/issue/<int:issue_id>')
 class NewspaperIssueID(Resource):
     @newspaper_ns.doc(description="Get information of a newspaper issue")
-    @newspaper_ns.marshal_with(issue_model, envelope='issue newspaper')
+    @encoded_with(newspaper_ns, issue_model, envelope='issue newspaper')
     def get(self, paper_id, issue_id):
-        targeted_paper = Agency.get_instance().get_newspaper(paper_id)
+        agency = Agency.get_instance()
+        targeted_paper = agency.get_newspaper(paper_id)
         if not targeted_paper:
             return jsonify(f"Newspaper with ID {paper_id} was not found"), 404
-        for issue in targeted_paper.issues:
-            if issue.issue_id == issue_id:
-                return issue.serialize()
-        return jsonify(f"Newspaper issue with ID {issue_id} was not found"), 404
+        targeted_issue = agency.get_newspaper_issue(targeted_paper, issue_id)
+        if not targeted_issue:
+            return jsonify(f"Newspaper issue with ID {issue_id} was not found"), 404
+        return targeted_issue.serialize()
 
 @newspaper_ns.route('/<int:paper_id>/issue/<int:issue_id>/release')
 class NewspaperIssueRelease(Resource):
     @newspaper_ns.doc(description="Release an issue of the newspaper")
     @newspaper_ns.marshal_with(issue_model, envelope="issue newspaper")
     def post(self, paper_id, issue_id):
-        targeted_paper = Agency.get_instance().get_newspaper(paper_id)
+        agency = Agency.get_instance()
+        targeted_paper = agency.get_newspaper(paper_id)
         if not targeted_paper:
             return {"message": f"Newspaper with ID {paper_id} was not found"}, 404
-        for issue in targeted_paper.issues:
-            if issue.issue_id == issue_id:
-                issue.released = True
-                return issue.serialize(), 200
+        targeted_issue = agency.get_newspaper_issue(targeted_paper, issue_id)
+        if not targeted_issue:
+            return {"message": f"Newspaper issue with ID {issue_id} was not found"}, 404
 
-        return {"message": f"Newspaper issue with ID {issue_id} was not found"}, 404
+        agency.release_issue(targeted_paper, targeted_issue)
+        return targeted_issue.serialize(), 200
 
 @newspaper_ns.route('/<int:paper_id>/issue/<int:issue_id>/editor/<int:editor_id>')
 class NewspaperIssueEditor(Resource):
@@ -174,11 +388,7 @@ class NewspaperIssueEditor(Resource):
         if not targeted_paper:
             return {"message": f"Newspaper with ID {paper_id} was not found"}, 404
 
-        targeted_issue = None
-        for issue in targeted_paper.issues:
-            if issue.issue_id == issue_id:
-                targeted_issue = issue
-                break
+        targeted_issue = agency.get_newspaper_issue(targeted_paper, issue_id)
 
         if not targeted_issue:
             return {"message": f"Newspaper issue with ID {issue_id} was not found"}, 404
@@ -191,6 +401,37 @@ class NewspaperIssueEditor(Resource):
 
         return {"message": "Editor assigned successfully", "editor_id": specific_editor.editor_id}, 200
 
+@newspaper_ns.route('/<int:paper_id>/issue/<int:issue_id>/deliver')
+class NewspaperIssueDeliverAll(Resource):
+    @newspaper_ns.doc(description="Deliver a released issue to all (or the selected) subscribers of the newspaper")
+    @newspaper_ns.expect(bulk_delivery_model, validate=False)
+    @newspaper_ns.response(200, 'Success', bulk_delivery_result_model)
+    def post(self, paper_id, issue_id):
+        agency = Agency.get_instance()
+        targeted_paper = agency.get_newspaper(paper_id)
+        if not targeted_paper:
+            return {"message": f"Newspaper with ID {paper_id} was not found"}, 404
+
+        targeted_issue = agency.get_newspaper_issue(targeted_paper, issue_id)
+        if not targeted_issue:
+            return {"message": f"Newspaper issue with ID {issue_id} was not found"}, 404
+
+        payload = request.get_json(silent=True) or {}
+
+        def log_progress(done, total):
+            current_app.logger.info("Delivering issue %s: batch %s/%s", issue_id, done, total)
+
+        try:
+            result = agency.deliver_issue_to_subscribers(targeted_paper, targeted_issue,
+                                                         only_missing=payload.get('only_missing', False),
+                                                         subscriber_ids=payload.get('subscriber_ids'),
+                                                         batch_size=payload.get('batch_size', DEFAULT_BATCH_SIZE),
+                                                         progress=log_progress)
+        except ValueError as e:
+            return {"message": str(e)}, 409
+
+        return {"message": "Issue delivered successfully", **result}, 200
+
 @newspaper_ns.route('/<int:paper_id>/issue/<int:issue_id>/deliver/<int:subscriber_id>')
 class NewspaperIssueDeliver(Resource):
     @newspaper_ns.doc(description="Deliver an issue to a subscriber")
@@ -200,11 +441,7 @@ class NewspaperIssueDeliver(Resource):
         if not targeted_paper:
             return {"message": f"Newspaper with ID {paper_id} was not found"}, 404
 
-        targeted_issue = None
-        for issue in targeted_paper.issues:
-            if issue.issue_id == issue_id:
-                targeted_issue = issue
-                break
+        targeted_issue = agency.get_newspaper_issue(targeted_paper, issue_id)
 
         if not targeted_issue:
             return {"message": f"Newspaper issue with ID {issue_id} was not found"}, 404
@@ -213,14 +450,15 @@ class NewspaperIssueDeliver(Resource):
         if not targeted_subscriber:
             return {"message": f"Subscriber with ID {subscriber_id} was not found"}, 404
 
-        targeted_issue.deliver_issue_id_to_subscriber(targeted_subscriber)
+        agency.deliver_issue(targeted_paper, targeted_issue, targeted_subscriber)
 
         return {"message": "Issue delivered successfully", "subscriber_id": targeted_subscriber.subscriber_id}, 200
 
 @newspaper_ns.route('/<int:paper_id>/stats')
 class NewspaperStats(Resource):
     @newspaper_ns.doc(description="Return information about the specific newspaper (number of subscribers, monthly and annual revenue)")
-    @newspaper_ns.marshal_with(stats_model, envelope='stats newspaper')
+    @conditional(paper_stamp)
+    @encoded_with(newspaper_ns, stats_model, envelope='stats newspaper')
     def get(self, paper_id):
         targeted_paper = Agency.get_instance().get_newspaper(paper_id)
         if not targeted_paper:
@@ -228,7 +466,7 @@ class NewspaperStats(Resource):
 
         number_subscribers = targeted_paper.calculate_subscribers()
         monthly_revenue = targeted_paper.calculate_monthly_revenue()
-        annual_revenue = monthly_revenue * 12
+        annual_revenue = targeted_paper.calculate_annual_revenue()
 
         return {"message": "Statistics for the newspaper",
                 "number_subscribers": number_subscribers,
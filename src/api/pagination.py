@@ -0,0 +1,38 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from typing import Callable, Optional
+
+from flask_restx import reqparse
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def page_parser() -> reqparse.RequestParser:
+    parser = reqparse.RequestParser()
+    parser.add_argument('limit', type=int, default=DEFAULT_PAGE_SIZE, location='args',
+                        help=f'The maximum number of entries to return (at most {MAX_PAGE_SIZE})')
+    parser.add_argument('after', type=str, location='args',
+                        help='The cursor returned as "next" by the previous page')
+    return parser
+
+
+def encode_cursor(seq: Optional[int]) -> Optional[str]:
+    if seq is None:
+        return None
+    return urlsafe_b64encode(str(seq).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token: Optional[str]) -> Optional[int]:
+    if not token:
+        return None
+    try:
+        return int(urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode())
+    except ValueError:
+        raise ValueError(f'Invalid cursor {token!r}')
+
+
+def paginate(registry, args, where: Optional[Callable] = None):
+    # returns (entities of the requested page, cursor of the next page or None)
+    limit = min(max(args['limit'], 1), MAX_PAGE_SIZE)
+    items, next_seq = registry.page(decode_cursor(args['after']), limit, where)
+    return items, encode_cursor(next_seq)
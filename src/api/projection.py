@@ -0,0 +1,31 @@
+from typing import Optional, Set, Tuple
+
+from flask_restx import reqparse
+
+
+def projection_parser(max_depth: int) -> reqparse.RequestParser:
+    parser = reqparse.RequestParser()
+    parser.add_argument('fields', type=str, location='args',
+                        help='Comma separated list of the fields to return, e.g. name,address')
+    parser.add_argument('depth', type=int, default=0, choices=tuple(range(max_depth + 1)), location='args',
+                        help=f'How deep related entities are embedded (0 = IDs only, up to {max_depth})')
+    return parser
+
+
+def parse_projection(parser: reqparse.RequestParser, model) -> Tuple[Optional[Set[str]], int]:
+    # returns the requested field names (None for all) and depth; unknown fields raise ValueError
+    args = parser.parse_args()
+    if not args['fields']:
+        return None, args['depth']
+    fields = {field.strip() for field in args['fields'].split(',') if field.strip()}
+    unknown = fields - set(model.keys())
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return fields, args['depth']
+
+
+def to_mask(fields: Optional[Set[str]]) -> Optional[str]:
+    # flask-restx field mask matching the projection, so that marshal leaves out the other fields
+    if fields is None:
+        return None
+    return '{' + ','.join(sorted(fields)) + '}'
@@ -0,0 +1,52 @@
+from flask_restx import Namespace, reqparse, Resource, fields
+
+from ..model.agency import Agency
+from .pagination import MAX_PAGE_SIZE
+
+scheduler_ns = Namespace("scheduler", description="Automatic release of issues on their release date")
+
+scheduler_model = scheduler_ns.model('SchedulerModel', {
+    'running': fields.Boolean(help='Whether the scheduler runs in this process'),
+    'workers': fields.Integer(help='The number of issues released at the same time'),
+    'deliver': fields.Boolean(help='Whether released issues are delivered to the subscribers'),
+    'pending': fields.Integer(help='The number of issues waiting for their release date'),
+    'next_due_at': fields.String(help='When the next issue is due'),
+    'caught_up': fields.Integer(help='The number of issues that were overdue when the scheduler started'),
+    'released': fields.Integer(help='The number of issues released by the scheduler'),
+    'delivered': fields.Integer(help='The number of deliveries made by the scheduler'),
+    'failed': fields.Integer(help='The number of releases that failed')
+    })
+
+release_model = scheduler_ns.model('ScheduledReleaseModel', {
+    'issue_id': fields.Integer,
+    'paper_id': fields.Integer,
+    'due_at': fields.String(help='When the issue is released (UTC)')
+    })
+
+queue_parser = reqparse.RequestParser()
+queue_parser.add_argument('limit', type=int, default=100, location='args',
+                          help=f'The number of releases to list, soonest first (at most {MAX_PAGE_SIZE})')
+
+
+@scheduler_ns.route('/')
+class SchedulerAPI(Resource):
+    @scheduler_ns.doc(description="The state of the release scheduler")
+    @scheduler_ns.marshal_with(scheduler_model)
+    def get(self):
+        scheduler = Agency.get_instance().scheduler
+        if scheduler is None:
+            return {"running": False, "pending": 0}
+        return scheduler.status()
+
+
+@scheduler_ns.route('/queue')
+class SchedulerQueue(Resource):
+    @scheduler_ns.doc(description="The pending releases, soonest first")
+    @scheduler_ns.expect(queue_parser)
+    @scheduler_ns.marshal_list_with(release_model, envelope='releases')
+    def get(self):
+        scheduler = Agency.get_instance().scheduler
+        if scheduler is None:
+            return []
+        limit = min(max(queue_parser.parse_args()['limit'], 1), MAX_PAGE_SIZE)
+        return scheduler.pending(limit)
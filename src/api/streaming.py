@@ -0,0 +1,88 @@
+import json
+from functools import wraps
+from typing import Callable, Optional
+
+from flask import Response, request, stream_with_context
+from ..model.agency import Agency
+from .pagination import decode_cursor
+from .encoders import compile_encoder
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_CHUNK = 500
+
+
+def requested_stream_format() -> Optional[str]:
+    # ?stream=ndjson|json (or true), or an Accept header that prefers NDJSON
+    mode = request.args.get('stream', '').lower()
+    if mode == 'ndjson':
+        return 'ndjson'
+    if mode in ('json', 'true', '1'):
+        return 'json'
+    if request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE:
+        return 'ndjson'
+    return None
+
+
+def _encode(items, model, serialize: Callable, envelope: str, key: Optional[Callable]):
+    encode = compile_encoder(model)
+    if key is None:
+        for item in items:
+            yield encode(serialize(item))
+        return
+    # reuse the encoded element while the entity version is unchanged
+    cache = Agency.get_instance().cache
+    for item in items:
+        yield cache.get_encoded((envelope, key(item)), item.version, lambda: serialize(item), encode).decode()
+
+
+def _locked_pages(registry, after, where, model, serialize: Callable, envelope: str, key: Optional[Callable]):
+    # every chunk is read and encoded under the agency's read lock; writers get their turn in between
+    lock = Agency.get_instance().lock
+    while True:
+        with lock.read():
+            items, after = registry.page(after, STREAM_CHUNK, where)
+            encoded = list(_encode(items, model, serialize, envelope, key))
+        yield from encoded
+        if after is None:
+            return
+
+
+def _json_array(envelope: str, encoded):
+    yield '{' + json.dumps(envelope) + ':['
+    for position, element in enumerate(encoded):
+        yield element if position == 0 else ',' + element
+    yield ']}'
+
+
+def _ndjson(encoded):
+    for element in encoded:
+        yield element + '\n'
+
+
+def streamable(model, envelope: str, source: Callable, serialize: Callable = lambda item: item,
+               key: Optional[Callable] = None):
+    # Lets a list endpoint answer with the whole collection as a streamed JSON array or NDJSON,
+    # encoding one element at a time. `source` gets the view arguments and returns
+    # (registry, filter) or None if the parent entity does not exist.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(resource, *args, **kwargs):
+            stream_format = requested_stream_format()
+            if stream_format is None:
+                return view(resource, *args, **kwargs)
+
+            found = source(*args, **kwargs)
+            if found is None:
+                return {"message": "The requested collection was not found"}, 404
+            registry, where = found
+            try:
+                after = decode_cursor(request.args.get('after'))
+            except ValueError as e:
+                return {"message": str(e)}, 400
+
+            encoded = _locked_pages(registry, after, where, model, serialize, envelope, key)
+            if stream_format == 'ndjson':
+                return Response(stream_with_context(_ndjson(encoded)), mimetype=NDJSON_MIMETYPE)
+            return Response(stream_with_context(_json_array(envelope, encoded)), mimetype='application/json')
+        return wrapper
+    return decorator
@@ -1,13 +1,20 @@
 from flask import jsonify
-from flask_restx import Namespace, Resource, fields
+from flask_restx import Namespace, inputs, reqparse, Resource, fields
 
 from ..model.agency import Agency
 from ..model.subscriber import Subscriber
 from .newspaperNS import issue_model
-from .newspaperNS import paper_model
+from .newspaperNS import paper_projected_model
+from .newspaperNS import bulk_result_model
+from .bulk import ingest
+from .pagination import page_parser, paginate
+from .streaming import streamable
+from .projection import projection_parser, parse_projection
+from .encoders import encoded, encoded_with
+from .etag import conditional
+from .jobsNS import cascade_parser, run_in_background, accepted
 
 
-from uuid import uuid4
 
 subscriber_ns = Namespace("subscriber", description="Subscriber related operations")
 
@@ -18,10 +25,24 @@ subscriber_model = subscriber_ns.model('SubscriberModel', {
             help='The name of the subscriber, e.g. John Doe'),
     'address': fields.String(required=True,
             help='The address of the subscriber, e.g. 1234 Elm Street'),
-    'newspapers': fields.List(fields.Nested(paper_model), required=False,
-            help='The newspapers that the subscriber is subscribed to'),
-    'delivered_issues': fields.List(fields.Nested(issue_model), required=False,
-            help='The issues that the subscriber is subscribed to')
+    'newspapers': fields.List(fields.Integer, required=False,
+            help='The IDs of the newspapers that the subscriber is subscribed to'),
+    'delivered_issues': fields.List(fields.Integer, required=False,
+            help='The IDs of the issues delivered to the subscriber')
+    })
+
+subscriber_expanded_model = subscriber_ns.clone('SubscriberExpandedModel', subscriber_model, {
+    'newspapers': fields.List(fields.Nested(paper_projected_model), required=False,
+            help='The newspapers that the subscriber is subscribed to (with depth=1 or 2)')
+    })
+
+subscriber_projection_parser = projection_parser(max_depth=2)
+
+paper_issues_model = subscriber_ns.model('PaperIssuesModel', {
+    'paper_id': fields.Integer(required=True,
+            help='The unique identifier of a newspaper'),
+    'number_of_issues': fields.Integer(required=True,
+            help='The number of issues of this newspaper delivered to the subscriber')
     })
 
 subscriber_stats_model = subscriber_ns.model('SubscriberStatsModel', {
@@ -32,58 +53,154 @@ subscriber_stats_model = subscriber_ns.model('SubscriberStatsModel', {
     'number_of_subscriptions': fields.Integer(required=True,
             help='The number of subscriptions'),
     'number_of_issues': fields.Integer(required=True,
-            help='The number of issues delivered')
+            help='The number of issues delivered'),
+    'issues_per_paper': fields.List(fields.Nested(paper_issues_model), required=True,
+            help='The number of issues delivered for each newspaper')
     })
 
+subscriber_page_model = subscriber_ns.model('SubscriberPageModel', {
+    'subscribers': fields.List(fields.Nested(subscriber_model)),
+    'next': fields.String(help='The cursor of the next page, null on the last page')
+    })
+
+subscriber_page_parser = page_parser()
+subscriber_page_parser.add_argument('paper_id', type=int, location='args',
+            help='Only list the subscribers of this newspaper')
+
+def listed_subscribers():
+    agency = Agency.get_instance()
+    paper_id = subscriber_page_parser.parse_args()['paper_id']
+    if paper_id is None:
+        return agency.all_subscribers(), None
+    newspaper = agency.get_newspaper(paper_id)
+    if not newspaper:
+        return None
+    return newspaper.subscribers, None
+
+def subscriber_stamp(subscriber_id, depth_from_args: bool = False):
+    # the stats depend on the prices of the subscribed papers, hence their versions too
+    subscriber = Agency.get_instance().get_subscriber(subscriber_id)
+    if not subscriber:
+        return None
+    depth = subscriber_projection_parser.parse_args()['depth'] if depth_from_args else 1
+    return subscriber.stamp(depth)
+
+subscriber_spec = {'name': ((str,), True), 'address': ((str,), True)}
+
 missing_issues_model = subscriber_ns.model('MissingIssuesModel', {
     'issue_id': fields.Integer(required=True,
-            help='The unique identifier of an issue')
+            help='The unique identifier of an issue'),
+    'paper_id': fields.Integer(required=True,
+            help='The newspaper the issue belongs to')
+    })
+
+missing_issues_page_model = subscriber_ns.model('MissingIssuesPageModel', {
+    'count': fields.Integer(required=True,
+            help='The total number of undelivered issues'),
+    'offset': fields.Integer(required=False),
+    'limit': fields.Integer(required=False),
+    'missing_issues': fields.List(fields.Nested(missing_issues_model), required=False,
+            help='The undelivered issues on this page')
     })
 
+missing_issues_parser = reqparse.RequestParser()
+missing_issues_parser.add_argument('offset', type=int, default=0, location='args',
+            help='The number of undelivered issues to skip')
+missing_issues_parser.add_argument('limit', type=int, default=100, location='args',
+            help='The maximum number of undelivered issues to return')
+missing_issues_parser.add_argument('count_only', type=inputs.boolean, default=False, location='args',
+            help='Only return the number of undelivered issues')
+
 @subscriber_ns.route('/')
 class SubscriberAPI(Resource):
     def post (self):
-        subscriber_id = int(uuid4().int >> 64)
+        subscriber_id = Agency.get_instance().ids.next_id()
         new_subscriber = Subscriber(subscriber_id=subscriber_id,
                                     name=subscriber_ns.payload['name'],
                                     address=subscriber_ns.payload['address'])
         Agency.get_instance().add_subscriber(new_subscriber)
         return new_subscriber.serialize()
 
-    @subscriber_ns.doc(subscriber_model, description="List all subscribers in the agency")
-    @subscriber_ns.marshal_list_with(subscriber_model, envelope='subscribers')
+    @subscriber_ns.doc(subscriber_model, description="List all subscribers in the agency (stream=json|ndjson streams the whole collection)")
+    @streamable(subscriber_model, 'subscribers', listed_subscribers, Subscriber.serialize_subscriber_id,
+                key=lambda subscriber: subscriber.subscriber_id)
+    @subscriber_ns.expect(subscriber_page_parser)
+    @encoded_with(subscriber_ns, subscriber_page_model)
     def get(self):
-        return [subscriber.serialize_subscriber_id() for subscriber in Agency.get_instance().all_subscribers()]
+        agency = Agency.get_instance()
+        args = subscriber_page_parser.parse_args()
+        subscribers = agency.all_subscribers()
+        if args['paper_id'] is not None:
+            newspaper = agency.get_newspaper(args['paper_id'])
+            if not newspaper:
+                subscriber_ns.abort(404, f"Newspaper with ID {args['paper_id']} was not found")
+            subscribers = newspaper.subscribers
+        try:
+            page, next_cursor = paginate(subscribers, args)
+        except ValueError as e:
+            subscriber_ns.abort(400, str(e))
+        return {"subscribers": [subscriber.serialize_subscriber_id() for subscriber in page], "next": next_cursor}
+
+@subscriber_ns.route('/bulk')
+class SubscriberBulk(Resource):
+    @subscriber_ns.doc(description="Create subscribers from a streamed NDJSON body or a JSON array of subscribers")
+    @subscriber_ns.response(200, 'Success', bulk_result_model)
+    def post(self):
+        agency = Agency.get_instance()
+        return ingest(subscriber_spec,
+                      lambda subscriber_id, record: Subscriber(subscriber_id=subscriber_id,
+                                                               name=record['name'],
+                                                               address=record['address']),
+                      agency.add_subscriber,
+                      lambda subscriber: subscriber.subscriber_id,
+                      agency.ids.allocate,
+                      transaction=agency.batch), 200
 
 @subscriber_ns.route('/<int:subscriber_id>')
 class SubscriberID(Resource): 
-    @subscriber_ns.doc(subscriber_model, description="Get a subscriber")
-    @subscriber_ns.marshal_with(subscriber_model, envelope='subscriber')
+    @subscriber_ns.doc(description="Get a subscriber")
+    @conditional(lambda subscriber_id: subscriber_stamp(subscriber_id, depth_from_args=True))
+    @subscriber_ns.expect(subscriber_projection_parser)
+    @subscriber_ns.response(200, 'Success', subscriber_expanded_model)
     def get(self, subscriber_id):
-        targeted_subscriber = Agency.get_instance().get_subscriber(subscriber_id)
+        agency = Agency.get_instance()
+        targeted_subscriber = agency.get_subscriber(subscriber_id)
         if not targeted_subscriber:
-            return jsonify(f"Subscriber with ID {subscriber_id} was not found"),404
-        return targeted_subscriber.serialize()
+            return {"message": f"Subscriber with ID {subscriber_id} was not found"}, 404
+        try:
+            fields, depth = parse_projection(subscriber_projection_parser, subscriber_model)
+        except ValueError as e:
+            return {"message": str(e)}, 400
+        serialized = agency.cache.get(('subscriber', subscriber_id, frozenset(fields or ()), depth),
+                                      targeted_subscriber.stamp(depth),
+                                      lambda: targeted_subscriber.serialize(fields, depth))
+        return encoded(serialized,
+                       subscriber_expanded_model if depth else subscriber_model,
+                       envelope='subscriber', only=frozenset(fields) if fields is not None else None)
 
     @subscriber_ns.doc(description="Update a subscriber")
     @subscriber_ns.expect(subscriber_model, validate=True)
     @subscriber_ns.marshal_with(subscriber_model, envelope='subscriber')
     def post(self, subscriber_id):
-        targeted_subscriber = Agency.get_instance().get_subscriber(subscriber_id)
+        agency = Agency.get_instance()
+        targeted_subscriber = agency.get_subscriber(subscriber_id)
         if not targeted_subscriber:
             return jsonify(f"Subscriber with ID {subscriber_id} was not found"),404
 
-        if 'name' in subscriber_ns.payload:
-            targeted_subscriber.name = subscriber_ns.payload['name']
-        if 'address' in subscriber_ns.payload:
-            targeted_subscriber.address = subscriber_ns.payload['address']
+        agency.update_subscriber(targeted_subscriber,
+                                 name=subscriber_ns.payload.get('name'),
+                                 address=subscriber_ns.payload.get('address'))
         return targeted_subscriber.serialize()
 
-    @subscriber_ns.doc(description="Delete a subscriber")
+    @subscriber_ns.doc(description="Delete a subscriber with its subscriptions and deliveries")
+    @subscriber_ns.expect(cascade_parser)
     def delete(self, subscriber_id):
         targeted_subscriber = Agency.get_instance().get_subscriber(subscriber_id)
         if not targeted_subscriber:
             return {"message":f"Subscriber with ID {subscriber_id} was not found"},404
+        elif run_in_background(targeted_subscriber.calculate_subscriptions()):
+            job = Agency.get_instance().remove_subscriber_in_background(targeted_subscriber)
+            return accepted(f"Subscriber with ID {subscriber_id} is being deleted", job)
         else:
             Agency.get_instance().remove_subscriber(targeted_subscriber)
             return {"message":f"Subscriber with ID {subscriber_id} was deleted"}, 200
@@ -98,13 +215,16 @@ class Subscribe(Resource):
         targeted_newspaper = Agency.get_instance().get_newspaper(paper_id)
         if not targeted_newspaper:
             return jsonify(f"Newspaper with ID {paper_id} was not found"),404
-        targeted_subscriber.subscribe_to_newspaper(targeted_newspaper)
-        return targeted_subscriber.serialize()
+        Agency.get_instance().subscribe(targeted_subscriber, targeted_newspaper)
+        return Agency.get_instance().cache.get(('subscriber', subscriber_id, frozenset(), 0),
+                                               targeted_subscriber.stamp(),
+                                               targeted_subscriber.serialize)
 
 @subscriber_ns.route('/<int:subscriber_id>/stats')
 class SubscriberStats(Resource):
     @subscriber_ns.doc(description="Return information about the specific subscriber (number of subscriptions, monthly and annual cost)")
-    @subscriber_ns.marshal_with(subscriber_stats_model, envelope='stats subscriber')
+    @conditional(subscriber_stamp)
+    @encoded_with(subscriber_ns, subscriber_stats_model, envelope='stats subscriber')
     def get(self, subscriber_id):
         targeted_subscriber = Agency.get_instance().get_subscriber(subscriber_id)
         if not targeted_subscriber:
@@ -112,28 +232,35 @@ class SubscriberStats(Resource):
 
         number_of_subscriptions = targeted_subscriber.calculate_subscriptions()
         monthly_cost = targeted_subscriber.calculate_monthly_cost()
-        annual_cost = monthly_cost * 12
+        annual_cost = targeted_subscriber.calculate_annual_cost()
         number_of_issues = targeted_subscriber.calculate_issues()
+        issues_per_paper = [{"paper_id": paper_id, "number_of_issues": count}
+                            for paper_id, count in targeted_subscriber.calculate_issues_per_paper().items()]
 
         return {"message": "Statistics for the subscriber",
                 "number_of_subscriptions": number_of_subscriptions,
                 "monthly_cost": monthly_cost,
                 "annual_cost": annual_cost,
-                "number_of_issues" : number_of_issues}, 200
+                "number_of_issues" : number_of_issues,
+                "issues_per_paper": issues_per_paper}, 200
 
 @subscriber_ns.route('/<int:subscriber_id>/missingissues')
 class MissingIssues(Resource):
     @subscriber_ns.doc(description="Check if there are any undelivered issues of the subscribed newspapers.")
-    @subscriber_ns.marshal_list_with(missing_issues_model, envelope='missing_issues')
+    @subscriber_ns.expect(missing_issues_parser)
+    @encoded_with(subscriber_ns, missing_issues_page_model, skip_none=True)
     def get(self, subscriber_id):
         targeted_subscriber = Agency.get_instance().get_subscriber(subscriber_id)
         if not targeted_subscriber:
             return jsonify(f"Subscriber with ID {subscriber_id} was not found"), 404
 
-        missing_issues = []
-        for newspaper in targeted_subscriber.newspapers:
-            for issue in newspaper.issues:
-                if issue not in targeted_subscriber.delivered_issues:
-                    missing_issues.append(issue)
+        args = missing_issues_parser.parse_args()
+        count = targeted_subscriber.calculate_missing_issues()
+        if args['count_only']:
+            return {"count": count}, 200
 
-        return [issue.serialize() for issue in missing_issues], 200
\ No newline at end of file
+        offset, limit = max(args['offset'], 0), max(args['limit'], 0)
+        return {"count": count,
+                "offset": offset,
+                "limit": limit,
+                "missing_issues": targeted_subscriber.missing_issues(offset, limit)}, 200
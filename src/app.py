@@ -1,15 +1,27 @@
-from flask import Flask
+import atexit
+import os
+
+from flask import Flask, g, request
 from flask_restx import Api
 
 from .api.newspaperNS import newspaper_ns
 from .api.editorNS import editor_ns
 from .api.subscriberNS import subscriber_ns
+from .api.analyticsNS import analytics_ns
+from .api.jobsNS import jobs_ns
+from .api.schedulerNS import scheduler_ns
 
-from .model.agency import Agency
+from .model.agency import Agency, NotRegistered
+from .model.persistence import Persistence
+from .model.scheduler import ReleaseScheduler, DEFAULT_WORKERS as SCHEDULER_WORKERS
+from .model.sqlite_repository import SqliteRepository
 
 agency = Agency()
 
-def create_app():
+# requests with these methods only read the agency and share its lock
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+def create_app(data_dir: str = None, database: str = None, scheduler: str = None):
     paperroute_app = Flask(__name__)
     # need to extend this class for custom objects, so that they can be jsonified
     paperroute_api = Api(paperroute_app, title="PaperBack: An App for Newspaper Issue and Subscription Management")
@@ -18,6 +30,67 @@ def create_app():
     paperroute_api.add_namespace(newspaper_ns)
     paperroute_api.add_namespace(editor_ns)
     paperroute_api.add_namespace(subscriber_ns)
+    paperroute_api.add_namespace(analytics_ns)
+    paperroute_api.add_namespace(jobs_ns)
+    paperroute_api.add_namespace(scheduler_ns)
+
+    @paperroute_api.errorhandler(NotRegistered)
+    def entity_removed(error):
+        # another request removed the entity between its lookup and the change
+        return {"message": str(error)}, 409
+
+    # A read request holds the read lock until its response is built, so it sees no
+    # half-applied change; streamed bodies lock each chunk themselves. Writes lock
+    # inside the Agency methods.
+    @paperroute_app.before_request
+    def lock_for_reading():
+        shared = Agency.get_instance()
+        shared.sync()
+        if request.method in READ_METHODS:
+            g.read_lock = shared.lock
+            g.read_lock.acquire_read()
+
+    def release_read_lock():
+        lock = g.pop('read_lock', None)
+        if lock is not None:
+            lock.release_read()
+
+    @paperroute_app.after_request
+    def unlock_after_reading(response):
+        release_read_lock()
+        return response
+
+    @paperroute_app.teardown_request
+    def unlock_on_error(error=None):
+        release_read_lock()
+
+    # the agency is kept in an SQLite database, or in memory; with a data directory the
+    # in-memory agency is restored on startup and every change is logged
+    data_dir = data_dir or os.environ.get('NSMS_DATA_DIR')
+    database = database or os.environ.get('NSMS_DATABASE')
+    if data_dir and database:
+        raise ValueError('NSMS_DATA_DIR and NSMS_DATABASE cannot be used together')
+    if database and Agency.singleton_instance is None:
+        Agency.singleton_instance = Agency(SqliteRepository(database))
+    shared_agency = Agency.get_instance()
+    if data_dir and shared_agency.persistence is None:
+        persistence = Persistence(data_dir)
+        recovery = persistence.open(shared_agency)
+        atexit.register(persistence.close)
+        paperroute_app.logger.info("Recovered %s log records after snapshot %s in %.3fs",
+                                   recovery["replayed"], recovery["snapshot_lsn"], recovery["seconds"])
+
+    # issues are released on their release date with scheduler "release", and also
+    # delivered to their subscribers with "deliver"
+    scheduler = scheduler or os.environ.get('NSMS_SCHEDULER')
+    if scheduler not in (None, '', 'release', 'deliver'):
+        raise ValueError(f'NSMS_SCHEDULER must be release or deliver, not {scheduler!r}')
+    if scheduler and shared_agency.scheduler is None:
+        workers = int(os.environ.get('NSMS_SCHEDULER_WORKERS', SCHEDULER_WORKERS))
+        release_scheduler = ReleaseScheduler(shared_agency, workers=workers, deliver=scheduler == 'deliver').start()
+        atexit.register(release_scheduler.stop)
+        paperroute_app.logger.info("Scheduled %s releases, %s of them overdue",
+                                   len(release_scheduler), release_scheduler.caught_up)
 
     return paperroute_app
 
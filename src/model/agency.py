@@ -1,105 +1,475 @@
-from typing import List, Union, Optional
+import threading
+from contextlib import ExitStack, contextmanager
+from itertools import islice
+from datetime import date
+from typing import Callable, Iterable, List, Union, Optional
 
 from .newspaper import Newspaper
 from .editor import Editor
 from .subscriber import Subscriber
 from .issue import Issue
+from .registry import Registry
+from .issue_index import IssueIndex
+from .ledger import DeliveryLedger
+from .repository import Repository, MemoryRepository
+from .locking import ReadWriteLock
+from .cache import SerializationCache
+from .analytics import Analytics
+from .jobs import Job, Jobs
+from .ids import IdAllocator
+from .delivery import deliver_to_subscribers
+from .issue_calendar import build_calendar
+from .persistence import issue_record
+
+
+# dependents unlinked per write by a background cascade
+CASCADE_BATCH_SIZE = 1000
+
+
+class NotRegistered(ValueError):
+    # an entity passed to a mutation is not (or no longer) part of the agency
+    pass
 
 
 class Agency(object):
     singleton_instance = None
+    _instance_lock = threading.Lock()
 
-    def __init__(self):
-        self.newspapers: List[Newspaper] = []
-        self.editors: List[Editor] = []
-        self.subscriber: List[Subscriber] = []
-        self.issues: List[Issue] = []
+    def __init__(self, repository: Repository = None):
+        self.repository: Repository = repository if repository is not None else MemoryRepository()
+        self.newspapers: Registry[Newspaper] = self.repository.newspapers
+        self.editors: Registry[Editor] = self.repository.editors
+        self.subscriber: Registry[Subscriber] = self.repository.subscribers
+        self.issues: IssueIndex = self.repository.issues
+        self.deliveries: DeliveryLedger = self.repository.deliveries
+        self.cache: SerializationCache = SerializationCache()
+        # the IDs of new entities
+        self.ids: IdAllocator = IdAllocator(self.repository.claim_worker())
+        # columnar figures for the agency-wide summaries, updated by the mutations below
+        self.analytics: Analytics = Analytics()
+        self.jobs: Jobs = Jobs(repository=self.repository, ids=self.ids)
+        # set by Persistence.open; every mutation below is then written to its log
+        self.persistence = None
+        # set by ReleaseScheduler.start; it is told about the issues waiting for release
+        self.scheduler = None
+        # Readers share the lock, every mutation below holds it exclusively. It is one coarse
+        # lock for the whole agency, not one per entity: writes to unrelated papers and
+        # subscribers wait for each other too. Every mutation also updates agency-wide state
+        # (the registries, issue index, ledger, analytics and the order of the log records),
+        # and SQLite takes one writer at a time anyway. Mutations get entities that the
+        # caller looked up before taking the lock, so they first check that those are
+        # still registered.
+        self.lock = ReadWriteLock()
 
 
     @staticmethod
     def get_instance():
         if Agency.singleton_instance is None:
-            Agency.singleton_instance = Agency()
+            with Agency._instance_lock:
+                if Agency.singleton_instance is None:
+                    Agency.singleton_instance = Agency()
 
         return Agency.singleton_instance
+
+    def _registered(self, entity) -> bool:
+        if isinstance(entity, Newspaper):
+            return entity in self.newspapers
+        if isinstance(entity, Editor):
+            return entity in self.editors
+        if isinstance(entity, Subscriber):
+            return entity in self.subscriber
+        return entity in self.issues
+
+    @contextmanager
+    def _writing(self, *entities):
+        # checked inside the transaction, which has seen the changes of other processes
+        with self.lock.write(), self.repository.transaction():
+            for entity in entities:
+                if entity is None or not self._registered(entity):
+                    kind = 'Entity' if entity is None else type(entity).__name__
+                    raise NotRegistered(f'{kind} is not registered in the agency')
+            yield
+        # the log is waited for outside the lock, so that concurrent writes share a disk sync
+        if self.persistence is not None and not self.lock.writing():
+            self.persistence.wait()
+
+    def sync(self):
+        # picks up the changes of other processes that share the repository
+        if self.repository.stale():
+            with self.lock.write():
+                self.repository.refresh()
+                self.analytics.invalidate()
+
+    def get_analytics(self) -> Analytics:
+        # call with the read lock held, so that the figures are consistent
+        self.analytics.ensure_built(self)
+        return self.analytics
+
+    def _schedule(self, paper: Newspaper, issue: Issue):
+        if self.scheduler is not None and not issue.released:
+            self.scheduler.schedule(paper.paper_id, issue)
+
+    def _unschedule(self, issue: Issue):
+        if self.scheduler is not None:
+            self.scheduler.unschedule(issue.issue_id)
+
+    def _forget_deliveries(self, issue_ids: Iterable[int]):
+        # drops the deliveries of these issues; their recipients serialize differently afterwards
+        recipients = set()
+        for issue_id in issue_ids:
+            recipients.update(self.deliveries.subscribers_of(issue_id))
+            self.deliveries.forget_issue(issue_id)
+        for subscriber_id in recipients:
+            subscriber = self.subscriber.get(subscriber_id)
+            if subscriber is not None:
+                subscriber.touch()
+
+    def _log(self, op: str, **fields):
+        if self.persistence is not None:
+            self.persistence.record(op, **fields)
+
+    def _cascade_in_background(self, kind: str, entity, key: int, dependents: Callable[[], Iterable],
+                               unlink: Callable, remove: Callable, total: int) -> Job:
+        # Unlinks the dependents of an entity a batch per write, so that readers and other
+        # writers get their turn in between, then removes the entity (and whatever was
+        # linked to it meanwhile). Every batch leaves a consistent agency behind.
+        def run(job: Job) -> dict:
+            job.total = total
+            while True:
+                with self.batch():
+                    if not self._registered(entity):
+                        return {"removed": False}
+                    batch = list(islice(dependents(), CASCADE_BATCH_SIZE))
+                    for dependent in batch:
+                        unlink(dependent)
+                if not batch:
+                    break
+                job.advance(len(batch))
+            try:
+                remove(entity)
+            except NotRegistered:
+                return {"removed": False}
+            return {"removed": True}
+        return self.jobs.submit(kind, key, run)
+
+    def batch(self):
+        # mutations inside the block are stored in one transaction and wait for the log once,
+        # after the lock is released
+        stack = ExitStack()
+        if self.persistence is not None:
+            stack.enter_context(self.persistence.batch())
+        stack.enter_context(self.lock.write())
+        stack.enter_context(self.repository.transaction())
+        return stack
+
 # Newspaper related methods
     def add_newspaper(self, new_paper: Newspaper, paper_id: int = None):
-        if any(existing_newspaper.paper_id == new_paper.paper_id for existing_newspaper in self.newspapers):
-            raise ValueError(f'A newspaper with ID {new_paper.paper_id} already exists')
-        self.newspapers.append(new_paper)
+        with self._writing():
+            self.newspapers.add(new_paper)
+            for issue in new_paper.issues:
+                self.issues.add(issue, new_paper)
+                issue.ledger = self.deliveries
+                if issue.released:
+                    self.deliveries.owe(new_paper.paper_id, issue.issue_id, new_paper.subscriber_ids())
+            new_paper.index = self.issues
+            new_paper.ledger = self.deliveries
+            self.analytics.add_newspaper(new_paper, self.deliveries)
+            self._log('add_newspaper', paper_id=new_paper.paper_id, name=new_paper.name,
+                      frequency=new_paper.frequency, price=new_paper.price)
+            for issue in new_paper.issues:
+                self._schedule(new_paper, issue)
+                self._log('add_issue', paper_id=new_paper.paper_id, issue=issue_record(issue))
 
     def get_newspaper(self, paper_id: Union[int,str]) -> Optional[Newspaper]:
-        for paper in self.newspapers:
-            if paper.paper_id == paper_id:
-                return paper
-        return None
+        return self.newspapers.get(paper_id)
 
-    def all_newspapers(self) -> List[Newspaper]:
+    def all_newspapers(self) -> Registry[Newspaper]:
         return self.newspapers
 
+    def update_newspaper(self, paper: Newspaper, name: str = None, frequency: int = None, price: float = None):
+        with self._writing(paper):
+            paper.update(name=name, frequency=frequency, price=price)
+            self.analytics.update_newspaper(paper)
+            if price is not None:
+                self.analytics.repriced()
+            changes = {key: value for key, value in (("name", name), ("frequency", frequency), ("price", price))
+                       if value is not None}
+            self._log('update_newspaper', paper_id=paper.paper_id, changes=changes)
 
     def remove_newspaper(self, paper: Newspaper):
-        for paper in self.newspapers:
-            if paper.paper_id == paper.paper_id:
-                self.newspapers.remove(paper)
+        # Unlinks the paper from its subscribers and editors and drops its issues with their
+        # deliveries, found through the reverse indexes: the cost is proportional to the
+        # number of those records.
+        with self._writing(paper):
+            for subscriber in list(paper.subscribers):
+                subscriber.unsubscribe_from_newspaper(paper)
+                self.analytics.update_subscriber(subscriber)
+            for editor in list(paper.editors):
+                editor.remove_newspaper(paper)
+                paper.remove_editor(editor)
+            self._forget_deliveries(issue.issue_id for issue in paper.issues)
+            for issue in paper.issues:
+                self._unschedule(issue)
+            self.newspapers.remove(paper)
+            self.issues.remove_newspaper(paper)
+            paper.index = None
+            paper.ledger = None
+            self.analytics.remove_newspaper(paper)
+            self._log('remove_newspaper', paper_id=paper.paper_id)
+
+    def remove_newspaper_in_background(self, paper: Newspaper) -> Job:
+        # for papers with many subscribers or issues; see _cascade_in_background
+        def unlink(dependent):
+            if isinstance(dependent, Subscriber):
+                self.unsubscribe(dependent, paper)
+            else:
+                self.remove_newspaper_issue(paper, dependent)
+        return self._cascade_in_background(
+            'remove_newspaper', paper, paper.paper_id,
+            lambda: (dependent for collection in (paper.subscribers, paper.issues) for dependent in collection),
+            unlink, self.remove_newspaper, len(paper.subscribers) + len(paper.issues))
 # Editor related methods
     def add_editor(self, new_editor: Editor):
-        self.editors.append(new_editor)
+        with self._writing():
+            self.editors.add(new_editor)
+            new_editor.index = self.issues
+            for paper in new_editor._papers():
+                paper.add_editor(new_editor)
+            self._log('add_editor', editor_id=new_editor.editor_id, name=new_editor.name, address=new_editor.address)
 
     def get_editor(self, editor_id: Union[int,str]) -> Optional[Editor]:
-        for editor in self.editors:
-            if editor.editor_id == editor_id:
-                return editor
-        return None
+        return self.editors.get(editor_id)
 
-    def remove_editor(self, editor: Editor):
-        for editor in self.editors:
-            if editor.editor_id == editor.editor_id:
-                self.editors.remove(editor)
+    def change_editor_id(self, editor: Editor, editor_id: int):
+        with self._writing(editor):
+            old_id = editor.editor_id
+            editor.editor_id = editor_id
+            try:
+                self.editors.rekey(editor, old_id)
+            except ValueError:
+                editor.editor_id = old_id
+                raise
+            for paper in editor._papers():
+                paper.editors.rekey(editor, old_id)
+            for issue in list(self.issues.of_editor(old_id)):
+                self.issues.set_editor(issue, editor_id)
+            editor.touch()
+            self._log('change_editor_id', editor_id=old_id, new_editor_id=editor_id)
+
+    def update_editor(self, editor: Editor, name: str = None, address: str = None):
+        with self._writing(editor):
+            editor.update(name=name, address=address)
+            changes = {key: value for key, value in (("name", name), ("address", address)) if value is not None}
+            self._log('update_editor', editor_id=editor.editor_id, changes=changes)
+
+    def remove_editor(self, editor: Editor) -> int:
+        # Hands each of the editor's issues to another editor of the same newspaper (or
+        # leaves it without an editor) in the same write, at a cost proportional to the
+        # editor's issues and newspapers. Returns the number of reassigned issues.
+        with self._writing(editor):
+            replacements = {}
+            reassigned = 0
+            for issue in list(self.issues.of_editor(editor.editor_id)):
+                paper = self.issues.newspaper_of(issue)
+                key = None if paper is None else paper.paper_id
+                if key not in replacements:
+                    replacements[key] = None if paper is None else self.get_any_other_editor_same_newspaper(editor, paper)
+                other_editor = replacements[key]
+                if other_editor is not None:
+                    editor.reassign_issue(issue, other_editor, paper)
+                    reassigned += 1
+                else:
+                    self.issues.set_editor(issue, None)
+            for paper in editor._papers():
+                paper.remove_editor(editor)
+            self.editors.remove(editor)
+            editor.index = None
+            self._log('remove_editor', editor_id=editor.editor_id)
+            return reassigned
 
 # Issue related methods
     def add_issue(self,new_issue: Issue, issue_id: int = None):
-        self.issue_id = issue_id
-        self.issues.append(new_issue)
+        with self._writing():
+            self.issues.add(new_issue)
+            new_issue.ledger = self.deliveries
+
+    def add_newspaper_issue(self, paper: Newspaper, issue: Issue):
+        with self._writing(paper):
+            paper.add_issue(issue)
+            self.analytics.update_newspaper(paper)
+            if issue.released:
+                self.analytics.released(paper)
+            self._schedule(paper, issue)
+            self._log('add_issue', paper_id=paper.paper_id, issue=issue_record(issue))
+
+    def add_issue_calendar(self, paper: Newspaper, start: date, end: date,
+                           allocate_ids: Callable[[int], List[int]] = None, pages: int = None,
+                           editor: Editor = None) -> dict:
+        # Adds an issue every `frequency` days from start to end (see build_calendar), in
+        # bulk and logged as one record. Returns a summary.
+        with self._writing(paper, *([editor] if editor is not None else [])):
+            issues, skipped = build_calendar(paper, start, end, allocate_ids or self.ids.allocate, pages,
+                                             editor.editor_id if editor is not None else None)
+            if issues:
+                paper.add_issues(issues)
+                if editor is not None:
+                    editor.add_newspaper(paper)
+                    editor.touch()
+                self.analytics.update_newspaper(paper)
+                for issue in issues:
+                    self._schedule(paper, issue)
+            self._log('add_issue_calendar', paper_id=paper.paper_id, start=start.isoformat(), end=end.isoformat(),
+                      pages=pages, editor_id=editor.editor_id if editor is not None else None,
+                      issue_ids=[issue.issue_id for issue in issues])
+            return {"paper_id": paper.paper_id,
+                    "created": len(issues),
+                    "skipped": skipped,
+                    "first_release_date": issues[0].release_date if issues else None,
+                    "last_release_date": issues[-1].release_date if issues else None}
+
+    def add_issue_calendars(self, start: date, end: date, allocate_ids: Callable[[int], List[int]] = None,
+                            pages: int = None, editor: Editor = None) -> dict:
+        # the calendar of every newspaper, one write per newspaper
+        summaries = []
+        for paper in self.newspapers.iterate():
+            try:
+                summaries.append(self.add_issue_calendar(paper, start, end, allocate_ids, pages, editor))
+            except NotRegistered:
+                continue
+            except ValueError as e:
+                summaries.append({"paper_id": paper.paper_id, "created": 0, "skipped": 0, "error": str(e)})
+        return {"created": sum(summary["created"] for summary in summaries),
+                "skipped": sum(summary["skipped"] for summary in summaries),
+                "newspapers": summaries}
+
+    def remove_newspaper_issue(self, paper: Newspaper, issue: Issue):
+        with self._writing(paper, issue):
+            deliveries = self.deliveries.count_for_issue(issue.issue_id)
+            paper.remove_issue(issue)
+            self._forget_deliveries([issue.issue_id])
+            self.analytics.removed_issue(paper, issue.released, deliveries)
+            self._unschedule(issue)
+            self._log('remove_issue', paper_id=paper.paper_id, issue_id=issue.issue_id)
+
+    def release_issue(self, paper: Newspaper, issue: Issue):
+        with self._writing(paper, issue):
+            if not issue.released:
+                self.analytics.released(paper)
+            paper.release_issue(issue)
+            self._unschedule(issue)
+            self._log('release_issue', paper_id=paper.paper_id, issue_id=issue.issue_id)
+
+    def release_scheduled_issue(self, paper: Newspaper, issue: Issue) -> bool:
+        # releases the issue unless that happened meanwhile (by hand or in another process)
+        with self._writing(paper, issue):
+            if issue.released:
+                return False
+            self.release_issue(paper, issue)
+            return True
+
+    def deliver_issue(self, paper: Newspaper, issue: Issue, subscriber: Subscriber) -> bool:
+        with self._writing(paper, issue, subscriber):
+            delivered = paper.deliver_issue_id_to_subscriber(issue, subscriber)
+            if delivered:
+                self.analytics.delivered(paper, 1)
+                self._log('deliver', paper_id=paper.paper_id, issue_id=issue.issue_id,
+                          subscriber_ids=[subscriber.subscriber_id])
+            return delivered
 
-    def get_all_editors(self) -> List[Editor]:
+    def deliver_issue_to_subscribers(self, paper: Newspaper, issue: Issue, **options) -> dict:
+        # fan-out delivery, logged as one record per batch
+        def log_batch(subscriber_ids):
+            self.analytics.delivered(paper, len(subscriber_ids))
+            self._log('deliver', paper_id=paper.paper_id, issue_id=issue.issue_id, subscriber_ids=subscriber_ids)
+        return deliver_to_subscribers(paper, issue, on_delivered=log_batch,
+                                      transaction=lambda: self._writing(paper, issue), **options)
+
+    def get_newspaper_issue(self, paper: Newspaper, issue_id: Union[int,str]) -> Optional[Issue]:
+        entry = self.issues.lookup(issue_id)
+        if entry is None or entry[0] is not paper:
+            return None
+        return entry[1]
+
+    def get_all_editors(self) -> Registry[Editor]:
         return self.editors
 
     def set_editor_to_issue(self, editor, issue, newspaper):
-        editor.assign_issue(issue, newspaper)
-        issue.set_editor(editor)
+        with self._writing(editor, issue, newspaper):
+            added = issue not in newspaper.issues
+            editor.assign_issue(issue, newspaper)
+            if added:
+                self.analytics.update_newspaper(newspaper)
+                if issue.released:
+                    self.analytics.released(newspaper)
+                self._schedule(newspaper, issue)
+            self._log('assign_editor', paper_id=newspaper.paper_id, issue_id=issue.issue_id, editor_id=editor.editor_id)
 
     def get_any_other_editor_same_newspaper(self, editor: Editor, newspaper: Newspaper) -> Optional[Editor]:
-        for other_editor in self.editors:
-            if other_editor.editor_id != editor.editor_id and newspaper in other_editor.newspapers:
+        for other_editor in newspaper.editors:
+            if other_editor.editor_id != editor.editor_id:
                 return other_editor
         return None
 
+    def get_editor_issues(self, editor: Editor) -> Registry[Issue]:
+        return self.issues.of_editor(editor.editor_id)
+
     def get_editor_issues_ids(self, editor: Editor):
         return editor.get_editor_issues_ids()
 
 
     def get_issue(self, issue_id: Union[int,str]) -> Optional[Issue]:
-        for issue in self.issues:
-            if issue.issue_id == issue_id:
-                return issue
-        return None
+        return self.issues.get(issue_id)
 
 # Subscriber related methods
     def add_subscriber(self, new_subscriber: Subscriber):
-        self.subscriber.append(new_subscriber)
+        with self._writing():
+            self.subscriber.add(new_subscriber)
+            new_subscriber.ledger = self.deliveries
+            self.analytics.update_subscriber(new_subscriber)
+            self._log('add_subscriber', subscriber_id=new_subscriber.subscriber_id, name=new_subscriber.name,
+                      address=new_subscriber.address)
 
-    def all_subscribers(self) -> List[Subscriber]:
+    def all_subscribers(self) -> Registry[Subscriber]:
         return self.subscriber
 
 
     def get_subscriber(self, subscriber_id: Union[int,str]) -> Optional[Subscriber]:
-        for subscriber in self.subscriber:
-            if subscriber.subscriber_id == subscriber_id:
-                return subscriber
-        return None
+        return self.subscriber.get(subscriber_id)
 
     def remove_subscriber(self, subscriber: Subscriber):
-        for subscriber in self.subscriber:
-            if subscriber.subscriber_id == subscriber.subscriber_id:
-                self.subscriber.remove(subscriber)
\ No newline at end of file
+        # ends the subscriptions and drops the deliveries, found through the reverse indexes
+        with self._writing(subscriber):
+            for paper in list(subscriber._papers()):
+                subscriber.unsubscribe_from_newspaper(paper)
+                self.analytics.update_newspaper(paper)
+            self.subscriber.remove(subscriber)
+            self.analytics.remove_subscriber(subscriber, self.deliveries.received_by_paper(subscriber.subscriber_id))
+            self.deliveries.forget_subscriber(subscriber.subscriber_id)
+            self._log('remove_subscriber', subscriber_id=subscriber.subscriber_id)
+
+    def remove_subscriber_in_background(self, subscriber: Subscriber) -> Job:
+        # for subscribers with many subscriptions; see _cascade_in_background
+        return self._cascade_in_background(
+            'remove_subscriber', subscriber, subscriber.subscriber_id, lambda: iter(list(subscriber._papers())),
+            lambda paper: self.unsubscribe(subscriber, paper), self.remove_subscriber,
+            subscriber.calculate_subscriptions())
+
+    def update_subscriber(self, subscriber: Subscriber, name: str = None, address: str = None):
+        with self._writing(subscriber):
+            subscriber.update(name=name, address=address)
+            changes = {key: value for key, value in (("name", name), ("address", address)) if value is not None}
+            self._log('update_subscriber', subscriber_id=subscriber.subscriber_id, changes=changes)
+
+    def subscribe(self, subscriber: Subscriber, paper: Newspaper):
+        with self._writing(subscriber, paper):
+            subscriber.subscribe_to_newspaper(paper)
+            self.analytics.update_newspaper(paper)
+            self.analytics.update_subscriber(subscriber)
+            self._log('subscribe', subscriber_id=subscriber.subscriber_id, paper_id=paper.paper_id)
+
+    def unsubscribe(self, subscriber: Subscriber, paper: Newspaper):
+        with self._writing(subscriber, paper):
+            subscriber.unsubscribe_from_newspaper(paper)
+            self.analytics.update_newspaper(paper)
+            self.analytics.update_subscriber(subscriber)
+            self._log('unsubscribe', subscriber_id=subscriber.subscriber_id, paper_id=paper.paper_id)
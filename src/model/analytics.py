@@ -0,0 +1,262 @@
+import threading
+from typing import Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+
+class Columns(object):
+    # A table of NumPy columns with one row per entity, addressed by its ID. Rows of removed
+    # entities are recycled and the arrays grow by doubling, so a change is O(1) amortized.
+    def __init__(self, dtypes: Dict[str, str], capacity: int = 1024):
+        self._data = {name: np.zeros(capacity, dtype) for name, dtype in dtypes.items()}
+        self._live = np.zeros(capacity, bool)
+        self._keys: List[Hashable] = [None] * capacity
+        self._row_of: Dict[Hashable, int] = {}
+        self._free: List[int] = []
+        self._size = 0
+
+    def _grow(self):
+        capacity = 2 * len(self._live)
+        for name, column in self._data.items():
+            grown = np.zeros(capacity, column.dtype)
+            grown[:len(column)] = column
+            self._data[name] = grown
+        live = np.zeros(capacity, bool)
+        live[:len(self._live)] = self._live
+        self._live = live
+        self._keys.extend([None] * (capacity - len(self._keys)))
+
+    def add(self, key: Hashable, **values):
+        if key in self._row_of:
+            self.set(key, **values)
+            return
+        if self._free:
+            row = self._free.pop()
+        else:
+            if self._size == len(self._live):
+                self._grow()
+            row = self._size
+            self._size += 1
+        self._row_of[key] = row
+        self._keys[row] = key
+        self._live[row] = True
+        for name, column in self._data.items():
+            column[row] = values.get(name, 0)
+
+    def remove(self, key: Hashable):
+        row = self._row_of.pop(key, None)
+        if row is None:
+            return
+        self._live[row] = False
+        self._keys[row] = None
+        self._free.append(row)
+
+    def set(self, key: Hashable, **values):
+        row = self._row_of.get(key)
+        if row is None:
+            return
+        for name, value in values.items():
+            self._data[name][row] = value
+
+    def increment(self, key: Hashable, name: str, delta=1):
+        row = self._row_of.get(key)
+        if row is not None:
+            self._data[name][row] += delta
+
+    def get(self, key: Hashable, name: str):
+        row = self._row_of.get(key)
+        return None if row is None else self._data[name][row].item()
+
+    def column(self, name: str) -> np.ndarray:
+        # the values of the live rows (a copy, in row order)
+        return self._data[name][:self._size][self._live[:self._size]]
+
+    def keys(self, positions: Sequence[int]) -> List[Hashable]:
+        # the IDs at these positions of `column`
+        rows = np.flatnonzero(self._live[:self._size])[np.asarray(positions, int)]
+        return [self._keys[row] for row in rows.tolist()]
+
+    def clear(self):
+        self._live[:] = False
+        self._keys = [None] * len(self._live)
+        self._row_of.clear()
+        self._free.clear()
+        self._size = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._row_of
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+
+def percentiles(values: np.ndarray, points: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, float]:
+    if not len(values):
+        return {f'p{point:g}': 0.0 for point in points}
+    return {f'p{point:g}': value for point, value in zip(points, np.percentile(values, points).tolist())}
+
+
+def delivery_rate(deliveries, released, subscribers) -> Optional[float]:
+    # delivered share of the issues owed: every released issue to every current subscriber
+    owed = float(np.dot(released, subscribers))
+    return float(np.sum(deliveries)) / owed if owed else None
+
+
+class Analytics(object):
+    # Columnar copies of the per-newspaper and per-subscriber figures, for agency-wide
+    # summaries with vectorized operations. The Agency keeps them in step with every
+    # mutation; they are built from the agency on first use (or again after `invalidate`).
+    def __init__(self):
+        self.papers = Columns({"price": 'f8', "frequency": 'i8', "subscribers": 'i8', "issues": 'i8',
+                               "released": 'i8', "deliveries": 'i8'})
+        self.subscribers = Columns({"subscriptions": 'i4', "cost": 'f8'})
+        self.built = False
+        # the subscribers' costs follow the prices; they are brought up to date when read
+        self.costs_stale = False
+        self._build_lock = threading.Lock()
+
+    def ensure_built(self, agency):
+        # readers may get here together; the agency does not change meanwhile (read lock)
+        with self._build_lock:
+            if self.built:
+                if self.costs_stale:
+                    for subscriber in agency.subscriber:
+                        self.subscribers.set(subscriber.subscriber_id, cost=subscriber.calculate_monthly_cost())
+                    self.costs_stale = False
+                return
+            self.papers.clear()
+            self.subscribers.clear()
+            self.built = True
+            self.costs_stale = False
+            for paper in agency.newspapers:
+                self.add_newspaper(paper, agency.deliveries)
+            for subscriber in agency.subscriber:
+                self.update_subscriber(subscriber)
+
+    def invalidate(self):
+        self.built = False
+
+    # Newspapers
+    def add_newspaper(self, paper, ledger):
+        if not self.built:
+            return
+        released = [issue.issue_id for issue in paper.issues if issue.released]
+        self.papers.add(paper.paper_id, price=paper.price, frequency=paper.frequency,
+                        subscribers=len(paper.subscribers), issues=len(paper.issues), released=len(released),
+                        deliveries=sum(ledger.count_for_issue(issue_id) for issue_id in released))
+
+    def update_newspaper(self, paper):
+        if self.built:
+            self.papers.set(paper.paper_id, price=paper.price, frequency=paper.frequency,
+                            subscribers=len(paper.subscribers), issues=len(paper.issues))
+
+    def remove_newspaper(self, paper):
+        if self.built:
+            self.papers.remove(paper.paper_id)
+
+    def repriced(self):
+        if self.built:
+            self.costs_stale = True
+
+    def released(self, paper):
+        if self.built:
+            self.papers.increment(paper.paper_id, "released")
+
+    def delivered(self, paper, count: int):
+        if self.built:
+            self.papers.increment(paper.paper_id, "deliveries", count)
+
+    def removed_issue(self, paper, released: bool, deliveries: int):
+        if self.built:
+            self.update_newspaper(paper)
+            if released:
+                self.papers.increment(paper.paper_id, "released", -1)
+            self.papers.increment(paper.paper_id, "deliveries", -deliveries)
+
+    # Subscribers
+    def update_subscriber(self, subscriber):
+        if self.built:
+            self.subscribers.add(subscriber.subscriber_id, subscriptions=subscriber.calculate_subscriptions(),
+                                 cost=subscriber.calculate_monthly_cost())
+
+    def remove_subscriber(self, subscriber, received: Dict[int, int]):
+        # `received` is the subscriber's deliveries per paper, which go with it
+        if self.built:
+            self.subscribers.remove(subscriber.subscriber_id)
+            for paper_id, count in received.items():
+                self.papers.increment(paper_id, "deliveries", -count)
+
+    # Summaries
+    def summary(self) -> dict:
+        papers, subscribers = self.papers, self.subscribers
+        revenue = papers.column("price") * papers.column("subscribers")
+        return {"newspapers": len(papers),
+                "subscribers": len(subscribers),
+                "subscriptions": int(papers.column("subscribers").sum()),
+                "issues": int(papers.column("issues").sum()),
+                "released_issues": int(papers.column("released").sum()),
+                "deliveries": int(papers.column("deliveries").sum()),
+                "monthly_revenue": float(revenue.sum()),
+                "annual_revenue": float(revenue.sum() * 12),
+                "delivery_rate": delivery_rate(papers.column("deliveries"), papers.column("released"),
+                                               papers.column("subscribers"))}
+
+    def newspaper_summary(self, top: int = 10, points: Sequence[float] = DEFAULT_PERCENTILES) -> dict:
+        papers = self.papers
+        price, subscribers = papers.column("price"), papers.column("subscribers")
+        revenue = price * subscribers
+        # the `top` largest revenues without sorting the whole column
+        top = min(max(top, 0), len(revenue))
+        best = np.argpartition(-revenue, top - 1)[:top] if top else np.empty(0, int)
+        best = best[np.argsort(-revenue[best], kind='stable')]
+        keys = papers.keys(best)
+        return {"percentiles": {"price": percentiles(price, points),
+                                "subscribers": percentiles(subscribers, points),
+                                "monthly_revenue": percentiles(revenue, points),
+                                "issues": percentiles(papers.column("issues"), points)},
+                "top_revenue": [{"paper_id": key, "monthly_revenue": revenue[row].item()}
+                                for key, row in zip(keys, best.tolist())]}
+
+    def newspaper_groups(self, by: str, bands: Optional[Sequence[float]] = None) -> List[dict]:
+        # Group-by over the papers: by frequency, or by price band ([edge, next edge) between
+        # consecutive `bands`; below the first edge is its own band)
+        papers = self.papers
+        price, subscribers = papers.column("price"), papers.column("subscribers")
+        released, deliveries = papers.column("released"), papers.column("deliveries")
+        if by == "frequency":
+            labels, groups = np.unique(papers.column("frequency"), return_inverse=True)
+            names = [{"frequency": label} for label in labels.tolist()]
+        elif by == "price":
+            edges = np.asarray(sorted(bands or ()), float)
+            groups = np.searchsorted(edges, price, side='right')
+            bounds = [None] + edges.tolist() + [None]
+            names = [{"min_price": bounds[group], "max_price": bounds[group + 1]} for group in range(len(edges) + 1)]
+        else:
+            raise ValueError(f'Cannot group newspapers by {by!r}')
+
+        count = len(names)
+        newspapers = np.bincount(groups, minlength=count)
+        totals = {"subscribers": np.bincount(groups, subscribers, count),
+                  "monthly_revenue": np.bincount(groups, price * subscribers, count),
+                  "deliveries": np.bincount(groups, deliveries, count),
+                  "owed": np.bincount(groups, released * subscribers, count)}
+        result = []
+        for group, name in enumerate(names):
+            if not newspapers[group]:
+                continue
+            owed = totals["owed"][group]
+            result.append({**name,
+                           "newspapers": int(newspapers[group]),
+                           "subscribers": int(totals["subscribers"][group]),
+                           "monthly_revenue": float(totals["monthly_revenue"][group]),
+                           "delivery_rate": float(totals["deliveries"][group] / owed) if owed else None})
+        return result
+
+    def subscriber_summary(self, points: Sequence[float] = DEFAULT_PERCENTILES) -> dict:
+        subscriptions = self.subscribers.column("subscriptions")
+        distribution = np.bincount(subscriptions) if len(subscriptions) else np.zeros(0, int)
+        return {"subscriptions": [{"subscriptions": number, "subscribers": count}
+                                  for number, count in enumerate(distribution.tolist()) if count],
+                "monthly_cost": percentiles(self.subscribers.column("cost"), points)}
@@ -0,0 +1,107 @@
+import json
+from collections import OrderedDict
+from itertools import count
+from threading import Lock
+from typing import Callable, Hashable, Tuple
+
+DEFAULT_BUDGET = 64 * 1024 * 1024
+
+# one counter for all entities, so a version number is never reused by another object
+_versions = count(1)
+
+
+def next_version() -> int:
+    return next(_versions)
+
+
+def advance_versions(past: int):
+    # new versions must be greater than the ones loaded from storage
+    global _versions
+    _versions = count(max(next(_versions), past + 1))
+
+
+class Versioned(object):
+    # Entities get a new version on every change; cached serializations are keyed on it.
+    # An entity bound to a repository is written back whenever it changes.
+    __slots__ = ('version', 'repository', '__weakref__')
+
+    def __init__(self):
+        self.version: int = next_version()
+        self.repository = None
+
+    def touch(self):
+        self.version = next_version()
+        if self.repository is not None:
+            self.repository.save(self)
+
+
+class SerializationCache(object):
+    # LRU cache of serialized entities. An entry is reused while the stamp it was built
+    # for (an entity version, or a tuple of versions) is current. The memory budget is
+    # measured on the JSON encoding of the entries.
+    def __init__(self, budget: int = DEFAULT_BUDGET):
+        self.budget = budget
+        self._entries: 'OrderedDict[Hashable, Tuple[Hashable, object, bytes]]' = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key: Hashable, stamp: Hashable, build: Callable[[], object],
+                encode: Callable[[object], str] = None) -> Tuple[object, bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+            self.misses += 1
+
+        value = build()
+        encoded = (encode(value) if encode is not None else json.dumps(value, separators=(',', ':'))).encode()
+        if len(encoded) > self.budget:
+            return value, encoded
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[2])
+            self._entries[key] = (stamp, value, encoded)
+            self._size += len(encoded)
+            while self._size > self.budget:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+        return value, encoded
+
+    def get(self, key: Hashable, stamp: Hashable, build: Callable[[], object]):
+        # the cached value is shared, callers must not modify it
+        return self._lookup(key, stamp, build)[0]
+
+    def get_encoded(self, key: Hashable, stamp: Hashable, build: Callable[[], object],
+                    encode: Callable[[object], str] = None) -> bytes:
+        # `encode` turns the built value into JSON (json.dumps by default)
+        return self._lookup(key, stamp, build, encode)[1]
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._size -= len(entry[2])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries),
+                    "bytes": self._size,
+                    "budget": self.budget,
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions,
+                    "hit_ratio": self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,65 @@
+from contextlib import nullcontext
+from itertools import islice
+from typing import Callable, ContextManager, Iterable, Iterator, List, Optional
+
+from .issue import Issue
+from .newspaper import Newspaper
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _batches(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def deliver_to_subscribers(newspaper: Newspaper, issue: Issue, only_missing: bool = False,
+                           subscriber_ids: Optional[Iterable[int]] = None,
+                           batch_size: int = DEFAULT_BATCH_SIZE,
+                           progress: Optional[Callable[[int, int], None]] = None,
+                           on_delivered: Optional[Callable[[List[int]], None]] = None,
+                           transaction: Callable[[], ContextManager] = nullcontext) -> dict:
+    # Deliver a released issue to every subscriber of the newspaper (or the selected ones),
+    # in batches on the calling thread. Each batch is stored in one `transaction`, so other
+    # requests get their turn between batches; the targets are picked in one too, so the
+    # subscriptions cannot change while they are read.
+    wanted = set(subscriber_ids) if subscriber_ids is not None else None
+    targets, seen = [], set()
+    with transaction():
+        if not issue.released:
+            raise ValueError(f'Newspaper issue with ID {issue.issue_id} has not been released')
+        for subscriber in newspaper.subscribers:
+            subscriber_id = subscriber.subscriber_id
+            if subscriber_id in seen or (wanted is not None and subscriber_id not in wanted):
+                continue
+            seen.add(subscriber_id)
+            if only_missing and subscriber_id in issue.subscribers:
+                continue
+            targets.append(subscriber)
+
+    def deliver_batch(batch):
+        with transaction():
+            delivered_ids = [subscriber.subscriber_id for subscriber in batch
+                             if newspaper.deliver_issue_id_to_subscriber(issue, subscriber)]
+            if on_delivered is not None and delivered_ids:
+                on_delivered(delivered_ids)
+        return len(delivered_ids)
+
+    batch_size = max(batch_size, 1)
+    total_batches = (len(targets) + batch_size - 1) // batch_size
+    delivered = done = 0
+    for batch in _batches(targets, batch_size):
+        delivered += deliver_batch(batch)
+        done += 1
+        if progress is not None:
+            progress(done, total_batches)
+
+    return {"issue_id": issue.issue_id,
+            "targeted": len(targets),
+            "delivered": delivered,
+            "already_delivered": len(targets) - delivered,
+            "batches": total_batches}
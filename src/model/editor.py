@@ -1,32 +1,87 @@
 from typing import List
 from .newspaper import Newspaper
+from .cache import Versioned
+
+class Editor(Versioned):
+    __slots__ = ('editor_id', 'name', 'address', '_newspapers', 'index')
 
-class Editor(object):
     def __init__(self, editor_id: int, name: str, address: str):
+        super().__init__()
         self.editor_id: int = editor_id
         self.name: str = name
         self.address: str = address
-        self.newspapers: List[Newspaper] = []
+        # created on the first assignment
+        self._newspapers: List[Newspaper] = None
+        # set by the Agency; its issue index also keeps the issues of every editor
+        self.index = None
 
-    def assign_issue(self, issue, newspaper):
-        # Ensure this editor is linked to the newspaper
+    @property
+    def newspapers(self) -> List[Newspaper]:
+        if self._newspapers is None:
+            self._newspapers = []
+        return self._newspapers
+
+    @newspapers.setter
+    def newspapers(self, newspapers: List[Newspaper]):
+        self._newspapers = newspapers
+
+    def _papers(self):
+        # the assigned papers, without creating the list
+        return self._newspapers if self._newspapers is not None else ()
+
+    def add_newspaper(self, newspaper):
+        # links the editor and the newspaper both ways
         if newspaper not in self.newspapers:
             self.newspapers.append(newspaper)
-        # Link the issue to the newspaper; this assumes the Newspaper class has a method to handle this
-        newspaper.add_issue(issue)
+            newspaper.add_editor(self)
+
+    def assign_issue(self, issue, newspaper):
+        # Ensure this editor is linked to the newspaper
+        self.add_newspaper(newspaper)
+        # Link the issue to the newspaper unless it already belongs to it
+        if issue not in newspaper.issues:
+            newspaper.add_issue(issue)
+        if self.index is not None:
+            self.index.set_editor(issue, self.editor_id)
+        else:
+            issue.set_editor(self.editor_id)
+        self.touch()
+
+    @property
+    def issues(self):
+        # the issues this editor is responsible for
+        if self.index is not None:
+            return self.index.of_editor(self.editor_id)
+        # not part of an agency: the issues of the linked newspapers
+        return [issue for paper in self._papers() for issue in paper.issues if issue.editor_id == self.editor_id]
 
     def get_editor_issues_ids(self):
-        # return the paper_id of each newspaper in the list of newspapers
-        newspaper_ids = [newspaper.paper_id for newspaper in self.newspapers]
-        return newspaper_ids
-
-    def reassign_issue(self, issue, other_editor):
-        self.newspapers.remove(issue.newspaper)
-        other_editor.assign_issue(issue, issue.newspaper)
-    def serialize(self):
-        return {
+        return [issue.issue_id for issue in self.issues]
+
+    def reassign_issue(self, issue, other_editor, newspaper):
+        other_editor.assign_issue(issue, newspaper)
+        self.touch()
+
+    def remove_newspaper(self, newspaper):
+        # the newspaper was removed from the agency
+        if newspaper in self._papers():
+            self.newspapers.remove(newspaper)
+            self.touch()
+
+    def update(self, name: str = None, address: str = None):
+        if name is not None:
+            self.name = name
+        if address is not None:
+            self.address = address
+        self.touch()
+
+    def serialize(self, fields=None, depth: int = 0):
+        data = {
             "editor_id": self.editor_id,
             "name": self.name,
             "address": self.address,
-            "newspapers": [newspaper.paper_id for newspaper in self.newspapers]
-        }
\ No newline at end of file
+            "newspapers": [newspaper.paper_id for newspaper in self._papers()]
+        }
+        if fields is None:
+            return data
+        return {key: value for key, value in data.items() if key in fields}
@@ -0,0 +1,82 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+# IDs are 63-bit integers, so they also fit a signed SQLite INTEGER:
+#   milliseconds since EPOCH (41 bits, until 2093) | worker (10 bits) | sequence (12 bits)
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+WORKERS = 1 << WORKER_BITS
+SEQUENCE_SIZE = 1 << SEQUENCE_BITS
+_EPOCH_MS = int(EPOCH.timestamp() * 1000)
+_TIME_SHIFT = WORKER_BITS + SEQUENCE_BITS
+
+
+def id_time(entity_id: int) -> datetime:
+    # when an ID was allocated (to the millisecond)
+    return datetime.fromtimestamp(((entity_id >> _TIME_SHIFT) + _EPOCH_MS) / 1000, timezone.utc)
+
+
+def id_worker(entity_id: int) -> int:
+    return (entity_id >> SEQUENCE_BITS) & (WORKERS - 1)
+
+
+class IdAllocator(object):
+    # Hands out unique, increasing, time-ordered IDs (snowflake-style). Every process
+    # allocates with a worker number of its own, so IDs from processes sharing a database
+    # do not collide without being checked; see Repository.claim_worker. Without a worker
+    # number the process ID is used, and taken again after a fork.
+    #
+    # Up to SEQUENCE_SIZE IDs are allocated per millisecond; past that, or when the clock
+    # goes back, the allocator carries on in the following milliseconds instead of waiting,
+    # so a bulk import reserves its IDs in one go.
+    def __init__(self, worker: Optional[int] = None, clock: Callable[[], float] = time.time):
+        if worker is not None and not 0 <= worker < WORKERS:
+            raise ValueError(f'The worker number must be between 0 and {WORKERS - 1}, not {worker}')
+        self.clock = clock
+        self._fixed_worker = worker
+        self._pid = None
+        self._worker = worker
+        self._lock = threading.Lock()
+        self._last = -1
+        self._sequence = 0
+
+    @property
+    def worker(self) -> int:
+        if self._fixed_worker is None and self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._worker = self._pid % WORKERS
+            # a forked child must not continue the sequence of its parent
+            self._last, self._sequence = -1, 0
+        return self._worker
+
+    def next_id(self) -> int:
+        with self._lock:
+            worker = self.worker
+            now = max(int(self.clock() * 1000) - _EPOCH_MS, self._last)
+            sequence = self._sequence if now == self._last else 0
+            if sequence == SEQUENCE_SIZE:
+                now, sequence = now + 1, 0
+            self._last, self._sequence = now, sequence + 1
+        return (now << _TIME_SHIFT) | (worker << SEQUENCE_BITS) | sequence
+
+    def allocate(self, count: int) -> List[int]:
+        # `count` new IDs in increasing order, whole milliseconds of sequence at a time
+        ids: List[int] = []
+        with self._lock:
+            worker = self.worker
+            now = max(int(self.clock() * 1000) - _EPOCH_MS, self._last)
+            sequence = self._sequence if now == self._last else 0
+            while count > 0:
+                if sequence == SEQUENCE_SIZE:
+                    now, sequence = now + 1, 0
+                taken = min(count, SEQUENCE_SIZE - sequence)
+                base = (now << _TIME_SHIFT) | (worker << SEQUENCE_BITS)
+                ids.extend(range(base + sequence, base + sequence + taken))
+                sequence += taken
+                count -= taken
+            self._last, self._sequence = now, sequence
+        return ids
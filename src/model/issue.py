@@ -1,28 +1,55 @@
-class Issue(object):
+from .ledger import DeliveryLedger
+from .cache import Versioned
+
+class Issue(Versioned):
+    __slots__ = ('release_date', 'released', 'page', 'editor_id', 'issue_id', 'paper_id', 'ledger')
+
     def __init__(self, releasedate,  page: int , editor: int , issue_id: int, released: bool = False,):
+        super().__init__()
         self.release_date = releasedate
         self.released: bool = released
         self.page : int = page
         self.editor_id : int = editor
         self.issue_id : int = issue_id
-        self.subscribers = []
+        self.paper_id : int = None
+        # shared with the subscribers; attached by the Agency or on first delivery
+        self.ledger: DeliveryLedger = None
+
+    @property
+    def subscribers(self):
+        # IDs of the subscribers that received this issue
+        if self.ledger is None:
+            return frozenset()
+        return self.ledger.subscribers_of(self.issue_id)
 
     def set_editor(self, editor):
         self.editor_id = editor
+        self.touch()
 
     def get_issue_by_id(self, issue_id):
         return self.issue_id
 
-    def deliver_issue_id_to_subscriber(self, subscriber):
-        self.subscribers.append(subscriber)
-        subscriber.delivered_issues.append(self)
+    def deliver_issue_id_to_subscriber(self, subscriber) -> bool:
+        if self.ledger is None:
+            self.ledger = subscriber.ledger if subscriber.ledger is not None else DeliveryLedger()
+        if subscriber.ledger is None:
+            subscriber.ledger = self.ledger
+        delivered = self.ledger.record(self.issue_id, subscriber.subscriber_id, self.paper_id)
+        if delivered:
+            self.touch()
+            subscriber.touch()
+        return delivered
 
-    def serialize(self):
-        return {
+    def serialize(self, fields=None, depth: int = 0):
+        data = {
             "issue_id": self.issue_id,
             "release_date": self.release_date,
             "pages": self.page,
             "editor": self.editor_id,
-            "released": self.released,
-            "subscribers": [subscriber.subscriber_id for subscriber in self.subscribers]
-        }
\ No newline at end of file
+            "released": self.released
+        }
+        if fields is None or "subscribers" in fields:
+            data["subscribers"] = list(self.subscribers)
+        if fields is None:
+            return data
+        return {key: value for key, value in data.items() if key in fields}
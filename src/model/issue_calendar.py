@@ -0,0 +1,36 @@
+from datetime import date, timedelta
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from .issue import Issue
+from .newspaper import Newspaper
+
+# issues generated for one newspaper at a time, at most
+MAX_CALENDAR_ISSUES = 100000
+
+
+def release_dates(start: date, end: date, frequency: int) -> Iterator[date]:
+    # start, start + frequency days, ... up to end (inclusive)
+    if frequency is None or frequency < 1:
+        raise ValueError(f'Cannot generate a calendar for a frequency of {frequency} days')
+    step = timedelta(days=frequency)
+    day = start
+    while day <= end:
+        yield day
+        day += step
+
+
+def build_calendar(paper: Newspaper, start: date, end: date, allocate_ids: Callable[[int], List[int]],
+                   pages: Optional[int] = None, editor_id: Optional[int] = None) -> Tuple[List[Issue], int]:
+    # The issues of the paper between start and end, one every `frequency` days, except
+    # on the dates it already has an issue for. Returns the new issues and the number of
+    # skipped dates.
+    if end < start:
+        raise ValueError(f'The calendar ends ({end}) before it starts ({start})')
+    if (end - start).days // max(paper.frequency or 1, 1) >= MAX_CALENDAR_ISSUES:
+        raise ValueError(f'A calendar is limited to {MAX_CALENDAR_ISSUES} issues per newspaper')
+    existing = {str(issue.release_date) for issue in paper.issues}
+    days = [day.isoformat() for day in release_dates(start, end, paper.frequency)]
+    new_days = [day for day in days if day not in existing]
+    issue_ids = allocate_ids(len(new_days))
+    return [Issue(day, pages, editor_id, issue_id) for day, issue_id in zip(new_days, issue_ids)], \
+        len(days) - len(new_days)
@@ -0,0 +1,100 @@
+from operator import attrgetter
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple, Union
+
+from .issue import Issue
+from .registry import Registry
+
+_issue_id = attrgetter('issue_id')
+# returned for editors without issues; never modified
+_NO_ISSUES: Registry[Issue] = Registry(_issue_id, 'issue')
+
+
+class IssueIndex(object):
+    # Maps issue_id -> (newspaper, issue) for every issue in the agency, and
+    # editor_id -> issues for the issues that have an editor
+    def __init__(self):
+        self._entries: Dict[int, Tuple[Optional[object], Issue]] = {}
+        self._by_editor: Dict[Hashable, Registry[Issue]] = {}
+
+    def add(self, issue: Issue, newspaper=None):
+        entry = self._entries.get(issue.issue_id)
+        if entry is not None and entry[1] is not issue:
+            raise ValueError(f'An issue with ID {issue.issue_id} already exists')
+        if entry is None:
+            self._index_editor(issue)
+        if entry is None or newspaper is not None:
+            self._entries[issue.issue_id] = (newspaper, issue)
+
+    def add_many(self, issues: List[Issue], newspaper=None):
+        # new issues only; none is added if one of them is a duplicate
+        seen = set()
+        for issue in issues:
+            if issue.issue_id in self._entries or issue.issue_id in seen:
+                raise ValueError(f'An issue with ID {issue.issue_id} already exists')
+            seen.add(issue.issue_id)
+        for issue in issues:
+            self._entries[issue.issue_id] = (newspaper, issue)
+            self._index_editor(issue)
+
+    def _index_editor(self, issue: Issue):
+        if issue.editor_id is None:
+            return
+        issues = self._by_editor.get(issue.editor_id)
+        if issues is None:
+            issues = self._by_editor[issue.editor_id] = Registry(_issue_id, 'issue')
+        issues.add(issue)
+
+    def _unindex_editor(self, issue: Issue):
+        issues = self._by_editor.get(issue.editor_id)
+        if issues is not None:
+            issues.remove(issue)
+            if not len(issues):
+                del self._by_editor[issue.editor_id]
+
+    def set_editor(self, issue: Issue, editor_id):
+        # changes the editor of an issue, keeping the index in step
+        registered = issue in self
+        if registered:
+            self._unindex_editor(issue)
+        issue.set_editor(editor_id)
+        if registered:
+            self._index_editor(issue)
+
+    def of_editor(self, editor_id) -> Registry[Issue]:
+        # the issues of an editor, in assignment order
+        return self._by_editor.get(editor_id, _NO_ISSUES)
+
+    def get(self, issue_id: Union[int,str]) -> Optional[Issue]:
+        entry = self._entries.get(issue_id)
+        return entry[1] if entry is not None else None
+
+    def lookup(self, issue_id: Union[int,str]) -> Optional[Tuple[Optional[object], Issue]]:
+        return self._entries.get(issue_id)
+
+    def newspaper_of(self, issue: Issue):
+        entry = self._entries.get(issue.issue_id)
+        return entry[0] if entry is not None and entry[1] is issue else None
+
+    def remove(self, issue: Issue):
+        entry = self._entries.get(issue.issue_id)
+        if entry is not None and entry[1] is issue:
+            del self._entries[issue.issue_id]
+            self._unindex_editor(issue)
+
+    def remove_newspaper(self, newspaper):
+        for issue in newspaper.issues:
+            self.remove(issue)
+
+    def clear(self):
+        self._entries.clear()
+        self._by_editor.clear()
+
+    def __contains__(self, issue: Issue) -> bool:
+        entry = self._entries.get(issue.issue_id)
+        return entry is not None and entry[1] is issue
+
+    def __iter__(self) -> Iterator[Issue]:
+        return (issue for _, issue in self._entries.values())
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+from queue import Queue
+from typing import Callable, Dict, Optional
+
+from .ids import IdAllocator
+from .repository import Repository
+
+DEFAULT_KEEP = 100
+
+
+class Job(object):
+    # A long-running operation and its progress. `run` does the work, reports progress
+    # through `advance` and returns the result.
+    def __init__(self, job_id: int, kind: str, target: int, run: Optional[Callable[['Job'], dict]],
+                 on_change: Optional[Callable[['Job'], None]] = None):
+        self.job_id: int = job_id
+        self.kind: str = kind
+        self.target: int = target
+        self.run = run
+        self.status: str = 'pending'
+        self.done: int = 0
+        self.total: Optional[int] = None
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.created: float = time.time()
+        self.finished: Optional[float] = None
+        self.on_change = on_change
+
+    @staticmethod
+    def restore(record: dict) -> 'Job':
+        # a job as stored by the process that runs it (see serialize); it cannot be run here
+        job = Job(record["job_id"], record["kind"], record["target"], None)
+        job.status, job.done, job.total = record["status"], record["done"], record["total"]
+        job.result, job.error = record["result"], record["error"]
+        return job
+
+    def advance(self, count: int):
+        self.done += count
+        self.changed()
+
+    def changed(self):
+        if self.on_change is not None:
+            self.on_change(self)
+
+    def serialize(self):
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "target": self.target,
+            "status": self.status,
+            "done": self.done,
+            "total": self.total,
+            "result": self.result,
+            "error": self.error
+        }
+
+
+class Jobs(object):
+    # Runs jobs one after another on a daemon thread, started with the first job. The
+    # last `keep` finished jobs stay around to be inspected. Jobs run in the process that
+    # started them; with a shared repository their state is stored there as it changes, so
+    # that every process can report on them.
+    def __init__(self, keep: int = DEFAULT_KEEP, repository: Optional[Repository] = None,
+                 ids: Optional[IdAllocator] = None):
+        self.keep = keep
+        self.repository = repository
+        self._jobs: Dict[int, Job] = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue: Queue = Queue()
+        self._thread: Optional[threading.Thread] = None
+        # job IDs must not collide with those of the other processes sharing the repository
+        self._ids = ids if ids is not None else IdAllocator()
+
+    def submit(self, kind: str, target: int, run: Callable[[Job], dict]) -> Job:
+        job = Job(self._ids.next_id(), kind, target, run, self._save)
+        self._save(job)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._forget_finished()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='jobs', daemon=True)
+                self._thread.start()
+        self._queue.put(job)
+        return job
+
+    def _save(self, job: Job):
+        if self.repository is not None:
+            self.repository.save_job(job.serialize(), self.keep)
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished is not None]
+        for job_id in finished[:max(len(finished) - self.keep, 0)]:
+            del self._jobs[job_id]
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            job.status = 'running'
+            try:
+                job.changed()
+                job.result = job.run(job)
+                job.status = 'done'
+            except Exception as e:
+                job.error = str(e)
+                job.status = 'failed'
+            job.finished = time.time()
+            try:
+                job.changed()
+            except Exception:
+                # the job is over either way; failing to store that must not stop the thread
+                pass
+            self._queue.task_done()
+
+    def wait(self):
+        # blocks until every submitted job has finished
+        self._queue.join()
+
+    def get(self, job_id: int) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is None and self.repository is not None:
+            record = self.repository.load_job(job_id)
+            job = Job.restore(record) if record is not None else None
+        return job
+
+    def __iter__(self):
+        with self._lock:
+            jobs = dict(self._jobs)
+        if self.repository is None:
+            return iter(list(jobs.values()))
+        # the jobs of this process are current, the stored ones of the others may lag a little
+        stored = {record["job_id"]: Job.restore(record) for record in self.repository.recent_jobs()}
+        stored.update(jobs)
+        return iter(sorted(stored.values(), key=lambda job: job.job_id))
+
+    def __len__(self) -> int:
+        return len(list(self))
@@ -0,0 +1,136 @@
+from typing import AbstractSet, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+_EMPTY: AbstractSet[int] = frozenset()
+
+
+class DeliveryLedger(object):
+    # Records which subscriber received which issue as (issue_id, subscriber_id) pairs,
+    # indexed both ways so that either side can be iterated without a scan. Both sides are
+    # sets and the missing issues are dicts, so that every delivery, settlement and removal
+    # is a constant-time update.
+    __slots__ = ('_by_issue', '_by_subscriber', '_missing', '_paper_of', '_received')
+
+    def __init__(self):
+        self._by_issue: Dict[int, Set[int]] = {}
+        self._by_subscriber: Dict[int, Set[int]] = {}
+        # released but undelivered issues: subscriber_id -> paper_id -> issue_ids (in release order)
+        self._missing: Dict[int, Dict[int, Dict[int, None]]] = {}
+        # issues received per paper: subscriber_id -> {paper_id: count}
+        self._paper_of: Dict[int, int] = {}
+        self._received: Dict[int, Dict[int, int]] = {}
+
+    def record(self, issue_id: int, subscriber_id: int, paper_id: Optional[int] = None) -> bool:
+        # returns False if the issue had already been delivered to the subscriber
+        recipients = self._by_issue.setdefault(issue_id, set())
+        if subscriber_id in recipients:
+            return False
+        recipients.add(subscriber_id)
+        self._by_subscriber.setdefault(subscriber_id, set()).add(issue_id)
+        if paper_id is not None:
+            self._settle(subscriber_id, paper_id, issue_id)
+            self._paper_of[issue_id] = paper_id
+            received = self._received.setdefault(subscriber_id, {})
+            received[paper_id] = received.get(paper_id, 0) + 1
+        return True
+
+    # Missing issues
+    def owe(self, paper_id: int, issue_id: int, subscriber_ids: Iterable[int]):
+        # an issue was released to (or subscribed by) these subscribers
+        recipients = self._by_issue.get(issue_id, _EMPTY)
+        for subscriber_id in subscriber_ids:
+            if subscriber_id in recipients:
+                continue
+            self._missing.setdefault(subscriber_id, {}).setdefault(paper_id, {})[issue_id] = None
+
+    def retract(self, paper_id: int, issue_id: int, subscriber_ids: Iterable[int]):
+        # an issue was withdrawn, so these subscribers no longer miss it
+        for subscriber_id in subscriber_ids:
+            self._settle(subscriber_id, paper_id, issue_id)
+
+    def forgive(self, subscriber_id: int, paper_id: int):
+        # a subscription ended, so drop everything still owed from that paper
+        papers = self._missing.get(subscriber_id)
+        if not papers or papers.pop(paper_id, None) is None:
+            return
+        if not papers:
+            del self._missing[subscriber_id]
+
+    def _settle(self, subscriber_id: int, paper_id: int, issue_id: int):
+        papers = self._missing.get(subscriber_id)
+        owed = papers.get(paper_id) if papers else None
+        if not owed or issue_id not in owed:
+            return
+        del owed[issue_id]
+        if not owed:
+            del papers[paper_id]
+            if not papers:
+                del self._missing[subscriber_id]
+
+    def missing_count(self, subscriber_id: int) -> int:
+        return sum(map(len, self._missing.get(subscriber_id, {}).values()))
+
+    def missing(self, subscriber_id: int) -> Iterator[Tuple[int, int]]:
+        # yields (paper_id, issue_id) for every issue the subscriber is still waiting for
+        for paper_id, owed in self._missing.get(subscriber_id, {}).items():
+            for issue_id in owed:
+                yield paper_id, issue_id
+
+    def delivered(self, issue_id: int, subscriber_id: int) -> bool:
+        return subscriber_id in self._by_issue.get(issue_id, _EMPTY)
+
+    def subscribers_of(self, issue_id: int) -> AbstractSet[int]:
+        return self._by_issue.get(issue_id, _EMPTY)
+
+    def issues_of(self, subscriber_id: int) -> AbstractSet[int]:
+        return self._by_subscriber.get(subscriber_id, _EMPTY)
+
+    def recipients(self) -> Iterator[Tuple[int, AbstractSet[int]]]:
+        # yields (issue_id, subscriber_ids) for every issue delivered at least once
+        return iter(self._by_issue.items())
+
+    def count_for_issue(self, issue_id: int) -> int:
+        return len(self._by_issue.get(issue_id, _EMPTY))
+
+    def count_for_subscriber(self, subscriber_id: int) -> int:
+        return len(self._by_subscriber.get(subscriber_id, ()))
+
+    def received_by_paper(self, subscriber_id: int) -> Dict[int, int]:
+        return dict(self._received.get(subscriber_id, {}))
+
+    def forget_issue(self, issue_id: int):
+        paper_id = self._paper_of.pop(issue_id, None)
+        for subscriber_id in self._by_issue.pop(issue_id, _EMPTY):
+            received = self._by_subscriber.get(subscriber_id)
+            received.discard(issue_id)
+            if not received:
+                del self._by_subscriber[subscriber_id]
+            if paper_id is not None:
+                self._uncount(subscriber_id, paper_id)
+
+    def _uncount(self, subscriber_id: int, paper_id: int):
+        received = self._received[subscriber_id]
+        received[paper_id] -= 1
+        if not received[paper_id]:
+            del received[paper_id]
+            if not received:
+                del self._received[subscriber_id]
+
+    def forget_subscriber(self, subscriber_id: int):
+        self._missing.pop(subscriber_id, None)
+        self._received.pop(subscriber_id, None)
+        for issue_id in self._by_subscriber.pop(subscriber_id, ()):
+            recipients = self._by_issue.get(issue_id)
+            recipients.discard(subscriber_id)
+            if not recipients:
+                del self._by_issue[issue_id]
+                self._paper_of.pop(issue_id, None)
+
+    def clear(self):
+        self._by_issue.clear()
+        self._by_subscriber.clear()
+        self._missing.clear()
+        self._paper_of.clear()
+        self._received.clear()
+
+    def __len__(self) -> int:
+        return sum(len(recipients) for recipients in self._by_issue.values())
@@ -0,0 +1,86 @@
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock(object):
+    # Any number of readers or a single writer. Writers are preferred: once a writer waits,
+    # new readers queue behind it, so a steady stream of reads cannot starve updates.
+    # Both sides are reentrant per thread and the writer may also read, but a reader cannot
+    # upgrade to writing (two upgrading readers would wait for each other forever).
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._waiting_writers = 0
+        self._writer = None
+        self._writes = 0
+        self._local = threading.local()
+
+    def acquire_read(self):
+        local = self._local
+        if self._writer == threading.get_ident():
+            # reading inside one's own write needs no further lock
+            local.nested = getattr(local, 'nested', 0) + 1
+            return
+        reads = getattr(local, 'reads', 0)
+        if not reads:
+            with self._condition:
+                while self._writer is not None or self._waiting_writers:
+                    self._condition.wait()
+                self._readers += 1
+        local.reads = reads + 1
+
+    def release_read(self):
+        local = self._local
+        if getattr(local, 'nested', 0):
+            local.nested -= 1
+            return
+        local.reads -= 1
+        if not local.reads:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        if self._writer == me:
+            self._writes += 1
+            return
+        if getattr(self._local, 'reads', 0):
+            raise RuntimeError('A read lock cannot be upgraded to a write lock')
+        with self._condition:
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+            self._writes = 1
+
+    def release_write(self):
+        self._writes -= 1
+        if not self._writes:
+            with self._condition:
+                self._writer = None
+                self._condition.notify_all()
+
+    def writing(self) -> bool:
+        # whether the calling thread holds the write lock
+        return self._writer == threading.get_ident()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
@@ -1,31 +1,126 @@
-from typing import List
+from operator import attrgetter
 
 from .issue import Issue
+from .registry import Registry
+from .cache import Versioned
+
+# shared by the registries of all newspapers
+_issue_id = attrgetter('issue_id')
+_subscriber_id = attrgetter('subscriber_id')
+_editor_id = attrgetter('editor_id')
+
+class Newspaper(Versioned):
+    __slots__ = ('paper_id', 'name', 'frequency', 'price', 'issues', 'subscribers', '_editors', 'index', 'ledger')
 
-class Newspaper(object):
     def __init__(self, paper_id: int, name: str, frequency: int, price: float):
+        super().__init__()
         self.paper_id: int = paper_id
         self.name: str = name
         self.frequency: int = frequency
         self.price: float = price
-        self.issues: List[Issue] = []
-        self.subscribers = []
-        self.editors = []
+        self.issues: Registry[Issue] = Registry(_issue_id, 'issue')
+        self.subscribers = Registry(_subscriber_id, 'subscriber')
+        self._editors = None
+        # set by the Agency so that issues added here are indexed agency-wide
+        self.index = None
+        self.ledger = None
 
     def add_issue(self, issue):
-        self.issues.append(issue)
+        if self.index is not None:
+            self.index.add(issue, self)
+        self.issues.add(issue)
+        issue.paper_id = self.paper_id
+        if self.ledger is not None:
+            issue.ledger = self.ledger
+            if issue.released:
+                self.ledger.owe(self.paper_id, issue.issue_id, self.subscriber_ids())
+        self.touch()
+
+    def add_issues(self, issues):
+        # new issues in bulk, with a single change of the newspaper
+        issues = list(issues)
+        if self.index is not None:
+            self.index.add_many(issues, self)
+        self.issues.add_many(issues)
+        for issue in issues:
+            issue.paper_id = self.paper_id
+            if self.ledger is not None:
+                issue.ledger = self.ledger
+                if issue.released:
+                    self.ledger.owe(self.paper_id, issue.issue_id, self.subscriber_ids())
+        self.touch()
+
+    def remove_issue(self, issue):
+        self.issues.remove(issue)
+        if self.index is not None:
+            self.index.remove(issue)
+        if self.ledger is not None:
+            self.ledger.retract(self.paper_id, issue.issue_id, self.subscriber_ids())
+        self.touch()
+
+    def release_issue(self, issue):
+        issue.released = True
+        issue.touch()
+        if self.ledger is not None:
+            self.ledger.owe(self.paper_id, issue.issue_id, self.subscriber_ids())
+        self.touch()
+
+    def update(self, name: str = None, frequency: int = None, price: float = None):
+        if name is not None:
+            self.name = name
+        if frequency is not None:
+            self.frequency = frequency
+        if price is not None:
+            self.price = price
+        self.touch()
+
+    def stamp(self, depth: int = 0):
+        # the versions a serialization at this depth depends on
+        if not depth:
+            return self.version
+        return (self.version,) + tuple(issue.version for issue in self.issues)
 
     def show_issues(self):
         return [issue.issue_id for issue in self.issues]
 
+    @property
+    def editors(self):
+        # the editors working for the newspaper; created on first use
+        if self._editors is None:
+            self._editors = Registry(_editor_id, 'editor')
+        return self._editors
+
     def add_editor(self, editor):
-        self.editors.append(editor)
+        if editor in self.editors:
+            return
+        self.editors.add(editor)
+        self.touch()
+
+    def remove_editor(self, editor):
+        if self._editors is not None:
+            self._editors.remove(editor)
 
     def add_subscriber_to_newspaper(self, subscriber):
-        self.subscribers.append(subscriber)
+        if subscriber in self.subscribers:
+            return
+        self.subscribers.add(subscriber)
+        if self.ledger is not None:
+            for issue in self.issues:
+                if issue.released:
+                    self.ledger.owe(self.paper_id, issue.issue_id, [subscriber.subscriber_id])
+        self.touch()
+
+    def remove_subscriber_from_newspaper(self, subscriber):
+        self.subscribers.remove(subscriber)
+        if self.ledger is not None:
+            self.ledger.forgive(subscriber.subscriber_id, self.paper_id)
+        self.touch()
+
+    def subscriber_ids(self):
+        return [subscriber.subscriber_id for subscriber in self.subscribers]
 
     def deliver_issue_id_to_subscriber(self, issue, subscriber):
-        issue.deliver_issue_id_to_subscriber(subscriber)
+        return issue.deliver_issue_id_to_subscriber(subscriber)
 
     def calculate_subscribers(self):
         return len(self.subscribers)
@@ -33,15 +128,24 @@ class Newspaper(object):
     def calculate_monthly_revenue(self):
         return len(self.subscribers) * self.price
 
-    def serialize(self):
-        return {
+    def calculate_annual_revenue(self):
+        return self.calculate_monthly_revenue() * 12
+
+    def serialize(self, fields=None, depth: int = 0):
+        # depth 0 lists related entities by ID, depth 1 embeds the issues
+        data = {
             "paper_id": self.paper_id,
             "name": self.name,
             "frequency": self.frequency,
-            "price": self.price,
-            "issues": [issue.issue_id for issue in self.issues],
-            "subscribers": [subscriber.subscriber_id for subscriber in self.subscribers]
+            "price": self.price
         }
+        if fields is None or "issues" in fields:
+            data["issues"] = [issue.serialize() if depth else issue.issue_id for issue in self.issues]
+        if fields is None or "subscribers" in fields:
+            data["subscribers"] = list(self.subscribers.ids())
+        if fields is None:
+            return data
+        return {key: value for key, value in data.items() if key in fields}
 
     def serialize_paper_id(self):
         return {
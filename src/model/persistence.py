@@ -0,0 +1,393 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from typing import List, Optional
+
+from .newspaper import Newspaper
+from .editor import Editor
+from .subscriber import Subscriber
+from .issue import Issue
+
+DEFAULT_SNAPSHOT_EVERY = 10000
+SNAPSHOT_FILE = 'snapshot.json'
+SEGMENT_PREFIX = 'wal-'
+SEGMENT_SUFFIX = '.log'
+
+
+def _encode(record: dict) -> bytes:
+    return (json.dumps(record, separators=(',', ':')) + '\n').encode()
+
+
+def _fsync_directory(directory: str):
+    # make renames and new segment files durable (not supported on every platform)
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class WriteAheadLog(object):
+    # Append-only log of JSON lines split into segments named after their first LSN.
+    # A single writer thread flushes whatever has accumulated with one write and one
+    # fsync (group commit), so concurrent appenders share the cost of a disk sync.
+    def __init__(self, directory: str, fsync: bool = True):
+        self.directory = directory
+        self.fsync = fsync
+        self._cond = threading.Condition()
+        self._pending: List[bytes] = []
+        self._writing = False
+        self._closed = True
+        self._next_lsn = 1
+        self._durable_lsn = 0
+        self._file = None
+        self._thread: Optional[threading.Thread] = None
+        self.commits = 0
+        self.records = 0
+
+    def segments(self) -> List[str]:
+        names = [name for name in os.listdir(self.directory)
+                 if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)]
+        return sorted(names, key=lambda name: int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+
+    def _open_segment(self):
+        path = os.path.join(self.directory, f'{SEGMENT_PREFIX}{self._next_lsn:020d}{SEGMENT_SUFFIX}')
+        self._file = open(path, 'ab')
+        _fsync_directory(self.directory)
+
+    def open(self, next_lsn: int):
+        self._next_lsn = next_lsn
+        self._durable_lsn = next_lsn - 1
+        self._closed = False
+        self._open_segment()
+        self._thread = threading.Thread(target=self._run, name='wal-writer', daemon=True)
+        self._thread.start()
+
+    @property
+    def last_lsn(self) -> int:
+        return self._next_lsn - 1
+
+    def append(self, record: dict, wait: bool = True) -> int:
+        # returns the LSN of the record; with wait, only once it is on disk
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('The write-ahead log is closed')
+            lsn = self._next_lsn
+            self._next_lsn += 1
+            self._pending.append(_encode({"lsn": lsn, **record}))
+            self._cond.notify_all()
+            if wait:
+                while self._durable_lsn < lsn:
+                    self._cond.wait()
+        return lsn
+
+    def wait(self, lsn: int):
+        # wait until the records up to `lsn` are durable
+        with self._cond:
+            while self._durable_lsn < lsn:
+                self._cond.wait()
+
+    def flush(self):
+        # wait until everything appended so far is durable
+        self.wait(self.last_lsn)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                batch, self._pending = self._pending, []
+                last = self._next_lsn - 1
+                self._writing = True
+            self._file.write(b''.join(batch))
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            with self._cond:
+                self._writing = False
+                self._durable_lsn = last
+                self.commits += 1
+                self.records += len(batch)
+                self._cond.notify_all()
+
+    def rotate(self) -> int:
+        # start a new segment; returns the last LSN stored in the previous ones
+        with self._cond:
+            while self._pending or self._writing:
+                self._cond.wait()
+            self._file.close()
+            self._open_segment()
+            return self._next_lsn - 1
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._file.close()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"last_lsn": self._next_lsn - 1,
+                    "durable_lsn": self._durable_lsn,
+                    "records": self.records,
+                    "commits": self.commits}
+
+
+def read_segment(path: str):
+    # yields the records of a segment, stopping at a torn write at its end
+    with open(path, 'rb') as segment:
+        for line in segment:
+            if not line.endswith(b'\n'):
+                return
+            try:
+                yield json.loads(line)
+            except ValueError:
+                return
+
+
+# Snapshots
+
+def dump_state(agency) -> dict:
+    newspapers = []
+    for paper in agency.newspapers:
+        newspapers.append({"paper_id": paper.paper_id,
+                           "name": paper.name,
+                           "frequency": paper.frequency,
+                           "price": paper.price,
+                           "issues": [issue_record(issue) for issue in paper.issues]})
+    editors = [{"editor_id": editor.editor_id,
+                "name": editor.name,
+                "address": editor.address,
+                "newspapers": [paper.paper_id for paper in editor.newspapers]}
+               for editor in agency.editors]
+    subscribers = [{"subscriber_id": subscriber.subscriber_id,
+                    "name": subscriber.name,
+                    "address": subscriber.address,
+                    "newspapers": [paper.paper_id for paper in subscriber.newspapers]}
+                   for subscriber in agency.subscriber]
+    deliveries = [[issue_id, sorted(subscriber_ids)]
+                  for issue_id, subscriber_ids in agency.deliveries.recipients()]
+    return {"newspapers": newspapers, "editors": editors,
+            "subscribers": subscribers, "deliveries": deliveries}
+
+
+def issue_record(issue) -> dict:
+    return {"issue_id": issue.issue_id,
+            "release_date": issue.release_date,
+            "page": issue.page,
+            "editor_id": issue.editor_id,
+            "released": issue.released}
+
+
+def load_state(agency, state: dict):
+    for record in state["newspapers"]:
+        paper = Newspaper(record["paper_id"], record["name"], record["frequency"], record["price"])
+        agency.add_newspaper(paper)
+        for issue in record["issues"]:
+            paper.add_issue(Issue(issue["release_date"], issue["page"], issue["editor_id"],
+                                  issue["issue_id"], issue["released"]))
+    for record in state["editors"]:
+        editor = Editor(record["editor_id"], record["name"], record["address"])
+        editor.newspapers = [paper for paper in map(agency.get_newspaper, record["newspapers"]) if paper is not None]
+        agency.add_editor(editor)
+    for record in state["subscribers"]:
+        subscriber = Subscriber(record["subscriber_id"], record["name"], record["address"])
+        agency.add_subscriber(subscriber)
+        for paper_id in record["newspapers"]:
+            subscriber.subscribe_to_newspaper(agency.get_newspaper(paper_id))
+    for issue_id, subscriber_ids in state["deliveries"]:
+        entry = agency.issues.lookup(issue_id)
+        paper_id = entry[0].paper_id if entry is not None else None
+        for subscriber_id in subscriber_ids:
+            agency.deliveries.record(issue_id, subscriber_id, paper_id)
+
+
+# Replay
+
+def apply(agency, record: dict):
+    # re-executes a logged mutation; the entities it refers to exist unless the log is corrupt
+    op = record["op"]
+    if op == "add_newspaper":
+        agency.add_newspaper(Newspaper(record["paper_id"], record["name"], record["frequency"], record["price"]))
+    elif op == "update_newspaper":
+        agency.update_newspaper(agency.get_newspaper(record["paper_id"]), **record["changes"])
+    elif op == "remove_newspaper":
+        agency.remove_newspaper(agency.get_newspaper(record["paper_id"]))
+    elif op == "add_issue":
+        issue = record["issue"]
+        agency.add_newspaper_issue(agency.get_newspaper(record["paper_id"]),
+                                   Issue(issue["release_date"], issue["page"], issue["editor_id"],
+                                         issue["issue_id"], issue["released"]))
+    elif op == "add_issue_calendar":
+        issue_ids = iter(record["issue_ids"])
+        editor = agency.get_editor(record["editor_id"]) if record["editor_id"] is not None else None
+        agency.add_issue_calendar(agency.get_newspaper(record["paper_id"]), date.fromisoformat(record["start"]),
+                                  date.fromisoformat(record["end"]),
+                                  lambda count: [next(issue_ids) for _ in range(count)], record["pages"], editor)
+    elif op == "remove_issue":
+        paper = agency.get_newspaper(record["paper_id"])
+        agency.remove_newspaper_issue(paper, agency.get_newspaper_issue(paper, record["issue_id"]))
+    elif op == "release_issue":
+        paper = agency.get_newspaper(record["paper_id"])
+        agency.release_issue(paper, agency.get_newspaper_issue(paper, record["issue_id"]))
+    elif op == "assign_editor":
+        paper = agency.get_newspaper(record["paper_id"])
+        agency.set_editor_to_issue(agency.get_editor(record["editor_id"]),
+                                   agency.get_newspaper_issue(paper, record["issue_id"]), paper)
+    elif op == "deliver":
+        paper = agency.get_newspaper(record["paper_id"])
+        issue = agency.get_newspaper_issue(paper, record["issue_id"])
+        for subscriber_id in record["subscriber_ids"]:
+            agency.deliver_issue(paper, issue, agency.get_subscriber(subscriber_id))
+    elif op == "add_editor":
+        agency.add_editor(Editor(record["editor_id"], record["name"], record["address"]))
+    elif op == "change_editor_id":
+        agency.change_editor_id(agency.get_editor(record["editor_id"]), record["new_editor_id"])
+    elif op == "update_editor":
+        agency.update_editor(agency.get_editor(record["editor_id"]), **record["changes"])
+    elif op == "remove_editor":
+        agency.remove_editor(agency.get_editor(record["editor_id"]))
+    elif op == "add_subscriber":
+        agency.add_subscriber(Subscriber(record["subscriber_id"], record["name"], record["address"]))
+    elif op == "update_subscriber":
+        agency.update_subscriber(agency.get_subscriber(record["subscriber_id"]), **record["changes"])
+    elif op == "remove_subscriber":
+        agency.remove_subscriber(agency.get_subscriber(record["subscriber_id"]))
+    elif op == "subscribe":
+        agency.subscribe(agency.get_subscriber(record["subscriber_id"]), agency.get_newspaper(record["paper_id"]))
+    elif op == "unsubscribe":
+        agency.unsubscribe(agency.get_subscriber(record["subscriber_id"]), agency.get_newspaper(record["paper_id"]))
+    else:
+        raise ValueError(f'Unknown log record {op!r}')
+
+
+class Persistence(object):
+    # Durability for an Agency: every mutation is appended to the write-ahead log, and
+    # after `snapshot_every` records the state is written to a snapshot and the log
+    # segments it covers are deleted. Recovery loads the snapshot and replays the tail.
+    def __init__(self, directory: str, snapshot_every: int = DEFAULT_SNAPSHOT_EVERY, fsync: bool = True):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self.log = WriteAheadLog(directory, fsync)
+        self.agency = None
+        self.recovery: dict = {}
+        self._since_snapshot = 0
+        self._snapshot_lock = threading.Lock()
+        self._batch = threading.local()
+
+    def open(self, agency) -> dict:
+        # restores the agency from disk and starts logging its mutations
+        os.makedirs(self.directory, exist_ok=True)
+        started = time.perf_counter()
+
+        snapshot_lsn, state = 0, None
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(path):
+            with open(path, 'rb') as snapshot:
+                state = json.load(snapshot)
+            snapshot_lsn = state["lsn"]
+            load_state(agency, state)
+        loaded = time.perf_counter()
+
+        last_lsn, replayed = snapshot_lsn, 0
+        for name in self.log.segments():
+            for record in read_segment(os.path.join(self.directory, name)):
+                if record["lsn"] <= last_lsn:
+                    continue
+                apply(agency, record)
+                last_lsn = record["lsn"]
+                replayed += 1
+        finished = time.perf_counter()
+
+        self.recovery = {"snapshot_lsn": snapshot_lsn,
+                         "snapshot_entities": 0 if state is None else
+                         len(state["newspapers"]) + len(state["editors"]) + len(state["subscribers"]),
+                         "replayed": replayed,
+                         "last_lsn": last_lsn,
+                         "snapshot_seconds": loaded - started,
+                         "replay_seconds": finished - loaded,
+                         "seconds": finished - started}
+        # a torn record at the end of the last segment is dropped by starting a new one
+        self.log.open(last_lsn + 1)
+        self._since_snapshot = replayed
+        self.agency = agency
+        agency.persistence = self
+        return self.recovery
+
+    def record(self, op: str, **fields):
+        # Appends without waiting for the disk: the caller holds the agency's write lock,
+        # and waits (see wait) once it has let go of it, so that the records of concurrent
+        # writers share a disk sync.
+        self._batch.lsn = self.log.append({"op": op, **fields}, wait=False)
+        self._since_snapshot += 1
+
+    def wait(self):
+        # Waits until the records this thread logged are durable, unless inside a batch.
+        # A due snapshot is taken here too: the caller has completed its mutation, so the
+        # snapshot cannot catch one that is logged halfway.
+        lsn = getattr(self._batch, 'lsn', 0)
+        if lsn and not getattr(self._batch, 'depth', 0):
+            self.log.wait(lsn)
+            self._batch.lsn = 0
+            if self._snapshot_due():
+                self.snapshot(if_due=True)
+
+    def _snapshot_due(self) -> bool:
+        return bool(self.snapshot_every) and self._since_snapshot >= self.snapshot_every
+
+    @contextmanager
+    def batch(self):
+        # records logged inside the block do not wait for the disk, the block waits once at its end
+        self._batch.depth = getattr(self._batch, 'depth', 0) + 1
+        try:
+            yield
+        finally:
+            self._batch.depth -= 1
+            self.wait()
+
+    def snapshot(self, if_due: bool = False) -> Optional[int]:
+        # compacts the log into a snapshot; the agency's read lock keeps mutations out meanwhile
+        with self.agency.lock.read(), self._snapshot_lock:
+            if if_due and not self._snapshot_due():
+                # another thread took it first
+                return None
+            lsn = self.log.rotate()
+            self._since_snapshot = 0
+            state = dump_state(self.agency)
+            state["lsn"] = lsn
+            path = os.path.join(self.directory, SNAPSHOT_FILE)
+            with open(path + '.tmp', 'wb') as snapshot:
+                snapshot.write(json.dumps(state, separators=(',', ':')).encode())
+                snapshot.flush()
+                if self.fsync:
+                    os.fsync(snapshot.fileno())
+            os.replace(path + '.tmp', path)
+            _fsync_directory(self.directory)
+            # every segment but the current one only holds records up to `lsn`
+            for name in self.log.segments()[:-1]:
+                os.remove(os.path.join(self.directory, name))
+            return lsn
+
+    def close(self):
+        if self.agency is not None:
+            self.agency.persistence = None
+            self.agency = None
+        self.log.close()
+
+    def stats(self) -> dict:
+        return {**self.log.stats(), "segments": len(self.log.segments()),
+                "since_snapshot": self._since_snapshot, "recovery": self.recovery}
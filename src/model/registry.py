@@ -0,0 +1,116 @@
+from bisect import bisect_right
+from typing import Callable, Dict, Generic, Hashable, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+class Registry(Generic[T]):
+    # Insertion-ordered collection of entities keyed by their ID (O(1) add, get, remove).
+    # Every entry also gets an increasing sequence number, which serves as a stable
+    # pagination cursor: a page starts with a binary search instead of a scan.
+    __slots__ = ('_key', '_kind', '_items', '_seq_of', '_seqs', '_keys', '_next_seq')
+
+    def __init__(self, key: Callable[[T], Hashable], kind: str = 'entity'):
+        self._key = key
+        self._kind = kind
+        self._items: Dict[Hashable, T] = {}
+        self._seq_of: Dict[Hashable, int] = {}
+        # parallel, sorted by sequence number; removed entries linger until compaction
+        self._seqs: List[int] = []
+        self._keys: List[Hashable] = []
+        self._next_seq = 0
+
+    def _duplicate(self, key) -> ValueError:
+        article = 'An' if self._kind[:1] in 'aeiou' else 'A'
+        return ValueError(f'{article} {self._kind} with ID {key} already exists')
+
+    def add(self, item: T):
+        key = self._key(item)
+        if key in self._items:
+            raise self._duplicate(key)
+        self._items[key] = item
+        self._seq_of[key] = self._next_seq
+        self._seqs.append(self._next_seq)
+        self._keys.append(key)
+        self._next_seq += 1
+
+    def add_many(self, items: Iterable[T]):
+        for item in items:
+            self.add(item)
+
+    def get(self, key: Hashable) -> Optional[T]:
+        return self._items.get(key)
+
+    def remove(self, item: T):
+        key = self._key(item)
+        if self._items.get(key) is item:
+            del self._items[key]
+            del self._seq_of[key]
+            if len(self._seqs) > 2 * len(self._items) + 16:
+                self._compact()
+
+    def rekey(self, item: T, old_key: Hashable):
+        # move an entity whose ID was changed after it was registered
+        new_key = self._key(item)
+        if new_key == old_key:
+            return
+        if new_key in self._items:
+            raise self._duplicate(new_key)
+        seq = self._seq_of.pop(old_key)
+        del self._items[old_key]
+        self._items[new_key] = item
+        self._seq_of[new_key] = seq
+        self._keys[bisect_right(self._seqs, seq) - 1] = new_key
+
+    def _compact(self):
+        live = [(seq, key) for seq, key in zip(self._seqs, self._keys) if self._seq_of.get(key) == seq]
+        self._seqs = [seq for seq, _ in live]
+        self._keys = [key for _, key in live]
+
+    def page(self, after: Optional[int] = None, limit: Optional[int] = None,
+             where: Optional[Callable[[T], bool]] = None) -> Tuple[List[T], Optional[int]]:
+        # returns up to `limit` entities registered after cursor `after`, and the cursor
+        # of the last one if more entities may follow
+        start = 0 if after is None else bisect_right(self._seqs, after)
+        items: List[T] = []
+        for position in range(start, len(self._seqs)):
+            seq, key = self._seqs[position], self._keys[position]
+            if self._seq_of.get(key) != seq:
+                continue
+            item = self._items[key]
+            if where is not None and not where(item):
+                continue
+            if limit is not None and len(items) == limit:
+                return items, self._seq_of[self._key(items[-1])]
+            items.append(item)
+        return items, None
+
+    def iterate(self, after: Optional[int] = None, where: Optional[Callable[[T], bool]] = None,
+                chunk: int = 500) -> Iterator[T]:
+        # walks the registry page by page, so it tolerates concurrent inserts and removals
+        while True:
+            items, after = self.page(after, chunk, where)
+            yield from items
+            if after is None:
+                return
+
+    def ids(self):
+        return self._items.keys()
+
+    def values(self):
+        return self._items.values()
+
+    def clear(self):
+        self._items.clear()
+        self._seq_of.clear()
+        self._seqs.clear()
+        self._keys.clear()
+
+    def __contains__(self, item) -> bool:
+        return self._items.get(self._key(item)) is item
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self._items.values())
+
+    def __len__(self) -> int:
+        return len(self._items)
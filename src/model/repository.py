@@ -0,0 +1,70 @@
+from contextlib import nullcontext
+
+from .registry import Registry
+from .issue_index import IssueIndex
+from .ledger import DeliveryLedger
+
+
+class Repository(object):
+    # Storage behind the Agency. A repository provides the agency-wide collections:
+    #   newspapers, editors, subscribers  - keyed collections with the Registry interface
+    #   issues                            - issue_id -> (newspaper, issue), the IssueIndex interface
+    #   deliveries                        - the DeliveryLedger interface
+    # Entities bound to a repository report every change through `save` (see Versioned.touch).
+    newspapers = None
+    editors = None
+    subscribers = None
+    issues = None
+    deliveries = None
+
+    def save(self, entity):
+        raise NotImplementedError
+
+    def transaction(self):
+        # groups the writes of one operation; nests
+        raise NotImplementedError
+
+    def claim_worker(self):
+        # a worker number for the IDs allocated by this process (see IdAllocator), unique
+        # among the processes sharing the storage; None if the storage is not shared
+        return None
+
+    def save_job(self, job: dict, keep: int):
+        # stores the state of a background job (Job.serialize) for the other processes,
+        # and of the finished jobs only the last `keep`
+        pass
+
+    def load_job(self, job_id: int):
+        # the stored state of a job started by any process, or None
+        return None
+
+    def recent_jobs(self) -> list:
+        # the stored state of the jobs of every process, oldest first
+        return []
+
+    def stale(self) -> bool:
+        # whether another process changed the shared storage since this one last looked
+        return False
+
+    def refresh(self):
+        # brings the entities held in memory up to date with the storage
+        pass
+
+    def close(self):
+        pass
+
+
+class MemoryRepository(Repository):
+    # Everything lives in the object graph, so there is nothing to write back
+    def __init__(self):
+        self.newspapers = Registry(lambda paper: paper.paper_id, 'newspaper')
+        self.editors = Registry(lambda editor: editor.editor_id, 'editor')
+        self.subscribers = Registry(lambda subscriber: subscriber.subscriber_id, 'subscriber')
+        self.issues = IssueIndex()
+        self.deliveries = DeliveryLedger()
+
+    def save(self, entity):
+        pass
+
+    def transaction(self):
+        return nullcontext()
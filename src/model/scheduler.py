@@ -0,0 +1,195 @@
+import heapq
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import count
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .delivery import DEFAULT_BATCH_SIZE
+
+DEFAULT_WORKERS = 2
+
+logger = logging.getLogger(__name__)
+
+
+def due_time(release_date) -> Optional[float]:
+    # the timestamp an issue is due at: its release_date (an ISO date or date and time,
+    # UTC unless it says otherwise), or None if it has no usable date
+    if not release_date:
+        return None
+    try:
+        moment = datetime.fromisoformat(str(release_date))
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+class ReleaseScheduler(object):
+    # Releases issues when their release_date comes, and optionally delivers them to the
+    # subscribers that miss them. Pending releases are kept in a heap ordered by due time;
+    # a dispatcher thread sleeps until the earliest one is due and hands it to a bounded
+    # pool of workers (it waits for a free worker rather than queueing without limit).
+    #
+    # On start every unreleased issue of the agency is scheduled, so releases that fell
+    # due while the service was down are caught up first, in release order. The Agency
+    # schedules the issues added later and cancels the ones released or removed by hand.
+    # Several processes sharing a database may each run a scheduler: only the first to
+    # release an issue delivers it.
+    def __init__(self, agency, workers: int = DEFAULT_WORKERS, deliver: bool = False,
+                 batch_size: int = DEFAULT_BATCH_SIZE, clock: Callable[[], float] = time.time):
+        self.agency = agency
+        self.workers = max(workers, 1)
+        self.deliver = deliver
+        self.batch_size = batch_size
+        self.clock = clock
+        self._cond = threading.Condition()
+        # (due, seq, issue_id); entries that no longer match _scheduled are skipped
+        self._heap: List[Tuple[float, int, int]] = []
+        self._scheduled: Dict[int, Tuple[float, int]] = {}
+        self._seq = count()
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._in_flight = 0
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self.running = False
+        self.caught_up = 0
+        self.released = 0
+        self.delivered = 0
+        self.failed = 0
+
+    def start(self):
+        with self.agency.lock.read():
+            issues = [(paper.paper_id, issue) for issue in self.agency.issues
+                      for paper in [self.agency.issues.newspaper_of(issue)]
+                      if paper is not None and not issue.released]
+        now = self.clock()
+        for paper_id, issue in issues:
+            self.schedule(paper_id, issue)
+        self.caught_up = sum(1 for due, _ in self._scheduled.values() if due <= now)
+        self.running = True
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='release')
+        self._thread = threading.Thread(target=self._run, name='release-scheduler', daemon=True)
+        self._thread.start()
+        self.agency.scheduler = self
+        return self
+
+    def stop(self):
+        if self.agency.scheduler is self:
+            self.agency.scheduler = None
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+    # Queue
+    def schedule(self, paper_id: int, issue):
+        due = due_time(issue.release_date)
+        if due is None:
+            return
+        with self._cond:
+            self._scheduled[issue.issue_id] = (due, paper_id)
+            heapq.heappush(self._heap, (due, next(self._seq), issue.issue_id))
+            if len(self._heap) > 2 * len(self._scheduled) + 64:
+                # drop the entries of cancelled releases
+                self._heap = [entry for entry in self._heap if self._scheduled.get(entry[2], (None,))[0] == entry[0]]
+                heapq.heapify(self._heap)
+            self._cond.notify_all()
+
+    def unschedule(self, issue_id: int):
+        with self._cond:
+            self._scheduled.pop(issue_id, None)
+
+    def _next_due(self) -> Optional[Tuple[float, int, int]]:
+        # the earliest live entry, after dropping stale ones from the top of the heap
+        while self._heap:
+            due, _, issue_id = self._heap[0]
+            entry = self._scheduled.get(issue_id)
+            if entry is not None and entry[0] == due:
+                return due, issue_id, entry[1]
+            heapq.heappop(self._heap)
+        return None
+
+    def pending(self, limit: int = 100) -> List[dict]:
+        with self._cond:
+            entries = heapq.nsmallest(limit, self._scheduled.items(), key=lambda item: item[1][0])
+        return [{"issue_id": issue_id, "paper_id": paper_id,
+                 "due_at": datetime.fromtimestamp(due, timezone.utc).isoformat()}
+                for issue_id, (due, paper_id) in entries]
+
+    def __len__(self) -> int:
+        return len(self._scheduled)
+
+    # Dispatching
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self.running:
+                        return
+                    head = self._next_due()
+                    delay = None if head is None else head[0] - self.clock()
+                    if delay is not None and delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                heapq.heappop(self._heap)
+                due, issue_id, paper_id = head
+                del self._scheduled[issue_id]
+                self._in_flight += 1
+            self._slots.acquire()
+            self._pool.submit(self._release, paper_id, issue_id)
+
+    def _release(self, paper_id: int, issue_id: int):
+        try:
+            paper = self.agency.get_newspaper(paper_id)
+            issue = self.agency.get_newspaper_issue(paper, issue_id) if paper is not None else None
+            if issue is not None and self.agency.release_scheduled_issue(paper, issue):
+                delivered = 0
+                if self.deliver:
+                    result = self.agency.deliver_issue_to_subscribers(paper, issue, only_missing=True,
+                                                                      batch_size=self.batch_size)
+                    delivered = result["delivered"]
+                with self._cond:
+                    self.released += 1
+                    self.delivered += delivered
+        except Exception:
+            logger.exception('Scheduled release of issue %s failed', issue_id)
+            with self._cond:
+                self.failed += 1
+        finally:
+            self._slots.release()
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        # waits until nothing is due or being released; returns False on timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                head = self._next_due()
+                if not self._in_flight and (head is None or head[0] > self.clock()):
+                    return True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining if remaining is None else min(remaining, 0.05))
+
+    def status(self) -> dict:
+        with self._cond:
+            head = self._next_due()
+        return {"running": self.running,
+                "workers": self.workers,
+                "deliver": self.deliver,
+                "pending": len(self),
+                "next_due_at": None if head is None else datetime.fromtimestamp(head[0], timezone.utc).isoformat(),
+                "caught_up": self.caught_up,
+                "released": self.released,
+                "delivered": self.delivered,
+                "failed": self.failed}
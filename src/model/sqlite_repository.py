@@ -0,0 +1,1128 @@
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from queue import Queue
+from typing import AbstractSet, Callable, Iterator, List, Optional, Tuple
+from weakref import WeakValueDictionary
+
+from .newspaper import Newspaper
+from .editor import Editor
+from .subscriber import Subscriber
+from .issue import Issue
+from .cache import advance_versions, next_version
+from .ids import WORKERS
+from .repository import Repository
+
+DEFAULT_POOL_SIZE = 8
+FETCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS newspapers (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    paper_id INTEGER NOT NULL UNIQUE,
+    name TEXT, frequency INTEGER, price REAL,
+    version INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS issues (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    issue_id INTEGER NOT NULL UNIQUE,
+    paper_id INTEGER,
+    release_date, page INTEGER, editor_id INTEGER, released INTEGER,
+    release_seq INTEGER,
+    version INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS issues_paper ON issues (paper_id, seq);
+CREATE INDEX IF NOT EXISTS issues_editor ON issues (editor_id, seq);
+CREATE TABLE IF NOT EXISTS editors (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    editor_id INTEGER NOT NULL UNIQUE,
+    name TEXT, address TEXT,
+    version INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS editor_papers (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    editor_id INTEGER NOT NULL,
+    paper_id INTEGER NOT NULL,
+    UNIQUE (editor_id, paper_id));
+CREATE INDEX IF NOT EXISTS editor_papers_paper ON editor_papers (paper_id, seq);
+CREATE TABLE IF NOT EXISTS subscribers (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    subscriber_id INTEGER NOT NULL UNIQUE,
+    name TEXT, address TEXT,
+    version INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS subscriptions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    paper_id INTEGER NOT NULL,
+    subscriber_id INTEGER NOT NULL,
+    UNIQUE (paper_id, subscriber_id));
+CREATE INDEX IF NOT EXISTS subscriptions_paper ON subscriptions (paper_id, seq);
+CREATE INDEX IF NOT EXISTS subscriptions_subscriber ON subscriptions (subscriber_id, seq);
+CREATE TABLE IF NOT EXISTS deliveries (
+    issue_id INTEGER NOT NULL,
+    subscriber_id INTEGER NOT NULL,
+    PRIMARY KEY (issue_id, subscriber_id)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS deliveries_subscriber ON deliveries (subscriber_id, issue_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY,
+    kind TEXT, target INTEGER, status TEXT,
+    done INTEGER, total INTEGER, result TEXT, error TEXT,
+    finished INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    key INTEGER NOT NULL);
+-- every updated or deleted entity row is logged, so that other processes reload just those objects
+CREATE TRIGGER IF NOT EXISTS newspapers_updated AFTER UPDATE ON newspapers BEGIN
+    INSERT INTO changes (kind, key) VALUES ('newspaper', NEW.paper_id); END;
+CREATE TRIGGER IF NOT EXISTS newspapers_deleted AFTER DELETE ON newspapers BEGIN
+    INSERT INTO changes (kind, key) VALUES ('newspaper', OLD.paper_id); END;
+CREATE TRIGGER IF NOT EXISTS issues_updated AFTER UPDATE ON issues BEGIN
+    INSERT INTO changes (kind, key) VALUES ('issue', NEW.issue_id); END;
+CREATE TRIGGER IF NOT EXISTS issues_deleted AFTER DELETE ON issues BEGIN
+    INSERT INTO changes (kind, key) VALUES ('issue', OLD.issue_id); END;
+CREATE TRIGGER IF NOT EXISTS editors_updated AFTER UPDATE ON editors BEGIN
+    INSERT INTO changes (kind, key) VALUES ('editor', NEW.editor_id); END;
+CREATE TRIGGER IF NOT EXISTS editors_deleted AFTER DELETE ON editors BEGIN
+    INSERT INTO changes (kind, key) VALUES ('editor', OLD.editor_id); END;
+CREATE TRIGGER IF NOT EXISTS subscribers_updated AFTER UPDATE ON subscribers BEGIN
+    INSERT INTO changes (kind, key) VALUES ('subscriber', NEW.subscriber_id); END;
+CREATE TRIGGER IF NOT EXISTS subscribers_deleted AFTER DELETE ON subscribers BEGIN
+    INSERT INTO changes (kind, key) VALUES ('subscriber', OLD.subscriber_id); END;
+INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('workers', 0);
+"""
+
+PAPER_COLUMNS = 'n.paper_id, n.name, n.frequency, n.price, n.version'
+ISSUE_COLUMNS = 'i.issue_id, i.paper_id, i.release_date, i.page, i.editor_id, i.released, i.version'
+EDITOR_COLUMNS = 'e.editor_id, e.name, e.address, e.version'
+SUBSCRIBER_COLUMNS = 's.subscriber_id, s.name, s.address, s.version'
+
+# how many logged changes are kept; a process further behind reloads all its objects
+KEEP_CHANGES = 100000
+
+_SIGN_BIT = 1 << 63
+
+
+def to_sql(value):
+    # IDs are unsigned 64-bit numbers, SQLite integers are signed
+    if isinstance(value, int) and value >= _SIGN_BIT:
+        return value - (_SIGN_BIT << 1)
+    return value
+
+
+def from_sql(value):
+    if isinstance(value, int) and value < 0:
+        return value + (_SIGN_BIT << 1)
+    return value
+
+
+GENERATION = "SELECT value FROM meta WHERE key = 'generation'"
+# the last sequence number handed out, which stays put when old changes are pruned
+LAST_CHANGE = "SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'changes'"
+
+# the stored columns of each kind of entity, by key, for bringing cached objects up to date
+RELOAD = {
+    'newspaper': f'SELECT {PAPER_COLUMNS} FROM newspapers n WHERE n.paper_id = ?',
+    'issue': f'SELECT {ISSUE_COLUMNS} FROM issues i WHERE i.issue_id = ?',
+    'editor': f'SELECT {EDITOR_COLUMNS} FROM editors e WHERE e.editor_id = ?',
+    'subscriber': f'SELECT {SUBSCRIBER_COLUMNS} FROM subscribers s WHERE s.subscriber_id = ?',
+}
+
+
+JOB_COLUMNS = 'job_id, kind, target, status, done, total, result, error'
+
+
+def _job(row) -> dict:
+    return {"job_id": from_sql(row[0]), "kind": row[1], "target": from_sql(row[2]), "status": row[3],
+            "done": row[4], "total": row[5], "result": json.loads(row[6]), "error": row[7]}
+
+
+def _duplicate(kind: str, key) -> ValueError:
+    article = 'An' if kind[:1] in 'aeiou' else 'A'
+    return ValueError(f'{article} {kind} with ID {key} already exists')
+
+
+def _load(kind: str, entity, row):
+    # copies a row of RELOAD[kind] into a cached object
+    if kind == 'newspaper':
+        entity.name, entity.frequency, entity.price = row[1], row[2], row[3]
+    elif kind == 'issue':
+        entity.paper_id = from_sql(row[1])
+        entity.release_date, entity.page, entity.editor_id = row[2], row[3], from_sql(row[4])
+        entity.released = None if row[5] is None else bool(row[5])
+    else:
+        entity.name, entity.address = row[1], row[2]
+    entity.version = row[-1]
+
+
+class ConnectionPool(object):
+    # sqlite3 connections shared by the request threads. A connection is borrowed for a
+    # statement, or pinned to the thread for the length of a transaction. SQLite allows one
+    # writer at a time, so write transactions queue up here instead of failing as busy.
+    def __init__(self, path: str, size: int = DEFAULT_POOL_SIZE):
+        self.path = path
+        # every connection to ':memory:' would open a database of its own
+        self.size = 1 if path == ':memory:' else max(size, 1)
+        self._idle: Queue = Queue()
+        self._connections = [self._connect() for _ in range(self.size)]
+        for connection in self._connections:
+            self._idle.put(connection)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # statements are compiled once per connection and reused from its statement cache
+        connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None,
+                                     cached_statements=256)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute('PRAGMA busy_timeout=5000')
+        return connection
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        pinned = getattr(self._local, 'connection', None)
+        if pinned is not None:
+            yield pinned
+            return
+        connection = self._idle.get()
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        pinned = getattr(self._local, 'connection', None)
+        if pinned is not None:
+            yield pinned
+            return
+        with self._write_lock:
+            connection = self._idle.get()
+            self._local.connection = connection
+            try:
+                connection.execute('BEGIN IMMEDIATE')
+                try:
+                    yield connection
+                except BaseException:
+                    connection.execute('ROLLBACK')
+                    raise
+                connection.execute('COMMIT')
+            finally:
+                self._local.connection = None
+                self._idle.put(connection)
+
+    def in_transaction(self) -> bool:
+        return getattr(self._local, 'connection', None) is not None
+
+    def close(self):
+        for connection in self._connections:
+            connection.close()
+
+
+class SqliteRepository(Repository):
+    # Entities are stored in SQLite and materialized on demand. An identity map keeps one
+    # object per entity while it is referenced, so the object graph does not need to fit
+    # in memory; changes are written back through `save` as they happen.
+    #
+    # Several processes may share the database. Every write transaction raises the
+    # `generation` in the meta table to a fresh version number, so a process can tell that
+    # another one committed (`stale`) and bring the objects it holds up to date (`refresh`),
+    # and versions, which key the caches and ETags, never repeat across processes. Triggers
+    # log the rows each commit updates or deletes in `changes`, so a refresh reads back only
+    # the cached objects that another process changed.
+    def __init__(self, path: str, pool_size: int = DEFAULT_POOL_SIZE):
+        self.pool = ConnectionPool(path, pool_size)
+        with self.pool.connection() as connection:
+            connection.executescript(SCHEMA)
+        self._lock = threading.RLock()
+        self._identity = {kind: WeakValueDictionary() for kind in ('newspaper', 'issue', 'editor', 'subscriber')}
+        self.newspapers = NewspaperTable(self)
+        self.editors = EditorTable(self)
+        self.subscribers = SubscriberTable(self)
+        self.issues = SqliteIssueIndex(self)
+        self.deliveries = SqliteLedger(self)
+        self._generation = self.scalar(GENERATION)
+        # the last entry of `changes` that the cached objects reflect
+        self._change_seq = self.scalar(LAST_CHANGE)
+        advance_versions(max([self._generation] +
+                             [self.scalar(f'SELECT COALESCE(MAX(version), 0) FROM {table}')
+                              for table in ('newspapers', 'issues', 'editors', 'subscribers')]))
+
+    # Statements
+    def read(self, sql: str, params: tuple = ()) -> list:
+        with self.pool.connection() as connection:
+            return connection.execute(sql, params).fetchall()
+
+    def scalar(self, sql: str, params: tuple = ()):
+        rows = self.read(sql, params)
+        return rows[0][0] if rows else None
+
+    def write(self, sql: str, params: tuple = ()) -> int:
+        with self.transaction() as connection:
+            return connection.execute(sql, params).rowcount
+
+    def write_many(self, sql: str, params) -> int:
+        with self.transaction() as connection:
+            return connection.executemany(sql, params).rowcount
+
+    @contextmanager
+    def transaction(self):
+        if self.pool.in_transaction():
+            with self.pool.transaction() as connection:
+                yield connection
+            return
+        written = False
+        try:
+            with self.pool.transaction() as connection:
+                changes = connection.total_changes
+                # the database is locked for writing now, so this sees every other commit
+                generation = connection.execute(GENERATION).fetchone()[0]
+                if generation != self._generation:
+                    self._reload(connection)
+                advance_versions(generation)
+                try:
+                    yield connection
+                except BaseException:
+                    written = connection.total_changes != changes
+                    raise
+                generation = next_version()
+                connection.execute("UPDATE meta SET value = ? WHERE key = 'generation'", (generation,))
+                # the changes logged by this transaction are already in the cached objects
+                self._change_seq = connection.execute(LAST_CHANGE).fetchone()[0]
+                connection.execute('DELETE FROM changes WHERE seq <= ?', (self._change_seq - KEEP_CHANGES,))
+                self._generation = generation
+        except BaseException:
+            # objects changed by a rolled back transaction are reloaded on next use
+            if written:
+                with self._lock:
+                    for identity in self._identity.values():
+                        for entity in list(identity.values()):
+                            entity.repository = None
+                        identity.clear()
+            raise
+
+    def stale(self) -> bool:
+        return self.scalar(GENERATION) != self._generation
+
+    def claim_worker(self) -> int:
+        # worker numbers are handed out in turn, so up to WORKERS processes share the database
+        with self.pool.transaction() as connection:
+            claimed = connection.execute("UPDATE meta SET value = value + 1 WHERE key = 'workers' "
+                                         "RETURNING value").fetchone()[0]
+        return (claimed - 1) % WORKERS
+
+    # Background jobs. Their state is not part of the agency, so storing it does not raise
+    # the generation: other processes have nothing to reload.
+    def save_job(self, job: dict, keep: int):
+        finished = job["status"] in ('done', 'failed')
+        with self.pool.transaction() as connection:
+            connection.execute('INSERT OR REPLACE INTO jobs (job_id, kind, target, status, done, total, result, '
+                               'error, finished) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                               (to_sql(job["job_id"]), job["kind"], to_sql(job["target"]), job["status"],
+                                job["done"], job["total"], json.dumps(job["result"]), job["error"], finished))
+            if finished:
+                connection.execute('DELETE FROM jobs WHERE finished AND job_id NOT IN '
+                                   '(SELECT job_id FROM jobs WHERE finished ORDER BY job_id DESC LIMIT ?)', (keep,))
+
+    def load_job(self, job_id: int) -> Optional[dict]:
+        rows = self.read(f'SELECT {JOB_COLUMNS} FROM jobs WHERE job_id = ?', (to_sql(job_id),))
+        return _job(rows[0]) if rows else None
+
+    def recent_jobs(self) -> List[dict]:
+        return [_job(row) for row in self.read(f'SELECT {JOB_COLUMNS} FROM jobs ORDER BY job_id')]
+
+    def refresh(self):
+        with self.pool.connection() as connection:
+            self._reload(connection)
+
+    def _reload(self, connection: sqlite3.Connection):
+        # Brings the cached objects changed by other processes up to date with the database, in
+        # place, so that references held elsewhere stay valid; objects whose row is gone are
+        # dropped from the identity map.
+        generation = connection.execute(GENERATION).fetchone()[0]
+        last = connection.execute(LAST_CHANGE).fetchone()[0]
+        changed = [(kind, from_sql(key)) for kind, key in connection.execute(
+            'SELECT kind, key FROM changes WHERE seq > ? AND seq <= ? ORDER BY seq', (self._change_seq, last))]
+        if len(changed) < last - self._change_seq:
+            # some of the changes since the last reload were pruned, so every cached object is checked
+            with self._lock:
+                changed = [(kind, key) for kind, identity in self._identity.items() for key in list(identity)]
+        for kind, key in dict.fromkeys(changed):
+            entity = self._identity[kind].get(key)
+            if entity is None:
+                continue
+            row = connection.execute(RELOAD[kind], (to_sql(key),)).fetchone()
+            if row is None:
+                self.unbind(kind, key, entity)
+            elif row[-1] != entity.version:
+                _load(kind, entity, row)
+        self._change_seq = last
+        self._generation = generation
+
+    def close(self):
+        self.pool.close()
+
+    def page(self, sql: str, params: tuple, seq_column: str, build: Callable, after: Optional[int],
+             limit: Optional[int], where: Optional[Callable]) -> Tuple[list, Optional[int]]:
+        # Registry.page over a query whose first column is the cursor; `sql` ends in a WHERE clause
+        query = f'{sql} AND {seq_column} > ? ORDER BY {seq_column} LIMIT ?'
+        fetch = limit + 1 if limit is not None and where is None else FETCH_SIZE
+        cursor = 0 if after is None else after
+        items, last = [], None
+        while True:
+            rows = self.read(query, params + (cursor, fetch))
+            for row in rows:
+                cursor = row[0]
+                item = build(row[1:])
+                if where is not None and not where(item):
+                    continue
+                if limit is not None and len(items) == limit:
+                    return items, last
+                items.append(item)
+                last = row[0]
+            if len(rows) < fetch:
+                return items, None
+
+    def iterate(self, sql: str, params: tuple, seq_column: str, build: Callable,
+                where: Optional[Callable] = None, after: Optional[int] = None) -> Iterator:
+        while True:
+            items, after = self.page(sql, params, seq_column, build, after, FETCH_SIZE, where)
+            yield from items
+            if after is None:
+                return
+
+    # Identity map
+    def identity(self, kind: str) -> WeakValueDictionary:
+        return self._identity[kind]
+
+    def _materialize(self, kind: str, key, build: Callable):
+        with self._lock:
+            entity = self._identity[kind].get(key)
+            if entity is None:
+                entity = build()
+                self._identity[kind][key] = entity
+            return entity
+
+    def unbind(self, kind: str, key, entity):
+        with self._lock:
+            if self._identity[kind].get(key) is entity:
+                del self._identity[kind][key]
+        entity.repository = None
+
+    def paper_from_row(self, row) -> Newspaper:
+        def build():
+            paper = Newspaper(from_sql(row[0]), row[1], row[2], row[3])
+            self.bind_newspaper(paper, row[4])
+            return paper
+        return self._materialize('newspaper', from_sql(row[0]), build)
+
+    def issue_from_row(self, row) -> Issue:
+        def build():
+            issue = Issue(row[2], row[3], from_sql(row[4]), from_sql(row[0]),
+                          None if row[5] is None else bool(row[5]))
+            issue.paper_id = from_sql(row[1])
+            self.bind_issue(issue, row[6])
+            return issue
+        return self._materialize('issue', from_sql(row[0]), build)
+
+    def editor_from_row(self, row) -> Editor:
+        def build():
+            editor = Editor(from_sql(row[0]), row[1], row[2])
+            self.bind_editor(editor, row[3])
+            return editor
+        return self._materialize('editor', from_sql(row[0]), build)
+
+    def subscriber_from_row(self, row) -> Subscriber:
+        def build():
+            subscriber = Subscriber(from_sql(row[0]), row[1], row[2])
+            self.bind_subscriber(subscriber, row[3])
+            return subscriber
+        return self._materialize('subscriber', from_sql(row[0]), build)
+
+    def bind_newspaper(self, paper: Newspaper, version: int):
+        paper.issues = PaperIssues(self, paper.paper_id)
+        paper.subscribers = PaperSubscribers(self, paper.paper_id)
+        paper._editors = PaperEditors(self, paper.paper_id)
+        paper.index = self.issues
+        paper.ledger = self.deliveries
+        paper.version = version
+        paper.repository = self
+
+    def bind_issue(self, issue: Issue, version: int):
+        issue.ledger = self.deliveries
+        issue.version = version
+        issue.repository = self
+
+    def bind_editor(self, editor: Editor, version: int):
+        editor.newspapers = EditorPapers(self, editor.editor_id)
+        editor.index = self.issues
+        editor.version = version
+        editor.repository = self
+
+    def bind_subscriber(self, subscriber: Subscriber, version: int):
+        subscriber.newspapers = SubscriberPapers(self, subscriber.subscriber_id)
+        subscriber.ledger = self.deliveries
+        subscriber.version = version
+        subscriber.repository = self
+
+    def insert_issue(self, issue: Issue, paper_id: Optional[int]):
+        self.insert_issues([issue], paper_id)
+
+    def insert_issues(self, issues: List[Issue], paper_id: Optional[int]):
+        self.write_many('INSERT INTO issues (issue_id, paper_id, release_date, page, editor_id, released, '
+                        'release_seq, version) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                        [(to_sql(issue.issue_id), to_sql(paper_id), issue.release_date, issue.page,
+                          to_sql(issue.editor_id), issue.released, issue.version if issue.released else None,
+                          issue.version) for issue in issues])
+        for issue in issues:
+            issue.paper_id = paper_id
+            self._identity['issue'][issue.issue_id] = issue
+            self.bind_issue(issue, issue.version)
+
+    # Write-back
+    def save(self, entity):
+        if isinstance(entity, Newspaper):
+            self.write('UPDATE newspapers SET name = ?, frequency = ?, price = ?, version = ? WHERE paper_id = ?',
+                       (entity.name, entity.frequency, entity.price, entity.version, to_sql(entity.paper_id)))
+        elif isinstance(entity, Issue):
+            # release_seq keeps the order in which issues were released, for missing issues
+            self.write('UPDATE issues SET release_date = ?, page = ?, editor_id = ?, released = ?, '
+                       'release_seq = COALESCE(release_seq, CASE WHEN ? THEN ? END), version = ? '
+                       'WHERE issue_id = ?',
+                       (entity.release_date, entity.page, to_sql(entity.editor_id), entity.released,
+                        bool(entity.released), entity.version, entity.version, to_sql(entity.issue_id)))
+        elif isinstance(entity, Editor):
+            self.write('UPDATE editors SET name = ?, address = ?, version = ? WHERE editor_id = ?',
+                       (entity.name, entity.address, entity.version, to_sql(entity.editor_id)))
+        elif isinstance(entity, Subscriber):
+            self.write('UPDATE subscribers SET name = ?, address = ?, version = ? WHERE subscriber_id = ?',
+                       (entity.name, entity.address, entity.version, to_sql(entity.subscriber_id)))
+
+
+class SqliteTable(object):
+    # The Registry interface over one entity table
+    kind = ''
+    table = ''
+    alias = ''
+    key_column = ''
+    columns = ''
+
+    def __init__(self, repository: SqliteRepository):
+        self.repository = repository
+        self._select = f'SELECT {self.alias}.seq, {self.columns} FROM {self.table} {self.alias} WHERE 1'
+        self._by_key = f'SELECT {self.columns} FROM {self.table} {self.alias} WHERE {self.alias}.{self.key_column} = ?'
+
+    def key(self, item):
+        raise NotImplementedError
+
+    def build(self, row):
+        raise NotImplementedError
+
+    def insert(self, item):
+        raise NotImplementedError
+
+    def adopt(self, item):
+        # moves the collections of a new entity into the database
+        pass
+
+    def add(self, item):
+        key = self.key(item)
+        with self.repository.transaction():
+            # a version from this process' counter may have been used by another process
+            item.version = next_version()
+            try:
+                self.insert(item)
+            except sqlite3.IntegrityError:
+                raise _duplicate(self.kind, key)
+            with self.repository._lock:
+                self.repository.identity(self.kind)[key] = item
+            self.adopt(item)
+
+    def get(self, key):
+        entity = self.repository.identity(self.kind).get(key)
+        if entity is not None or not isinstance(key, int):
+            return entity
+        rows = self.repository.read(self._by_key, (to_sql(key),))
+        return self.build(rows[0]) if rows else None
+
+    def remove(self, item):
+        key = self.key(item)
+        if self.repository.identity(self.kind).get(key) is not item:
+            return
+        self.repository.write(f'DELETE FROM {self.table} WHERE {self.key_column} = ?', (to_sql(key),))
+        self.repository.unbind(self.kind, key, item)
+
+    def rekey(self, item, old_key):
+        new_key = self.key(item)
+        if new_key == old_key:
+            return
+        try:
+            self.repository.write(f'UPDATE {self.table} SET {self.key_column} = ? WHERE {self.key_column} = ?',
+                                  (to_sql(new_key), to_sql(old_key)))
+        except sqlite3.IntegrityError:
+            raise _duplicate(self.kind, new_key)
+        with self.repository._lock:
+            identity = self.repository.identity(self.kind)
+            if identity.get(old_key) is item:
+                del identity[old_key]
+            identity[new_key] = item
+
+    def page(self, after: Optional[int] = None, limit: Optional[int] = None, where: Optional[Callable] = None):
+        return self.repository.page(self._select, (), f'{self.alias}.seq', self.build, after, limit, where)
+
+    def iterate(self, after: Optional[int] = None, where: Optional[Callable] = None, chunk: int = FETCH_SIZE):
+        while True:
+            items, after = self.page(after, chunk, where)
+            yield from items
+            if after is None:
+                return
+
+    def ids(self) -> list:
+        return [from_sql(row[0]) for row in
+                self.repository.read(f'SELECT {self.key_column} FROM {self.table} ORDER BY seq')]
+
+    def values(self) -> list:
+        return list(self)
+
+    def clear(self):
+        self.repository.write(f'DELETE FROM {self.table}')
+        for key, item in list(self.repository.identity(self.kind).items()):
+            self.repository.unbind(self.kind, key, item)
+
+    def __contains__(self, item) -> bool:
+        return self.repository.identity(self.kind).get(self.key(item)) is item
+
+    def __iter__(self):
+        return self.iterate()
+
+    def __len__(self) -> int:
+        return self.repository.scalar(f'SELECT COUNT(*) FROM {self.table}')
+
+
+class NewspaperTable(SqliteTable):
+    kind, table, alias, key_column, columns = 'newspaper', 'newspapers', 'n', 'paper_id', PAPER_COLUMNS
+
+    def key(self, paper):
+        return paper.paper_id
+
+    def build(self, row):
+        return self.repository.paper_from_row(row)
+
+    def insert(self, paper):
+        self.repository.write('INSERT INTO newspapers (paper_id, name, frequency, price, version) '
+                              'VALUES (?, ?, ?, ?, ?)',
+                              (to_sql(paper.paper_id), paper.name, paper.frequency, paper.price, paper.version))
+
+    def adopt(self, paper):
+        issues, subscribers, editors = list(paper.issues), list(paper.subscribers), list(paper._editors or ())
+        self.repository.bind_newspaper(paper, paper.version)
+        for issue in issues:
+            if self.repository.identity('issue').get(issue.issue_id) is issue:
+                self.repository.write('UPDATE issues SET paper_id = ? WHERE issue_id = ?',
+                                      (to_sql(paper.paper_id), to_sql(issue.issue_id)))
+                issue.paper_id = paper.paper_id
+            else:
+                self.repository.insert_issue(issue, paper.paper_id)
+        self.repository.write_many('INSERT OR IGNORE INTO subscriptions (paper_id, subscriber_id) VALUES (?, ?)',
+                                   [(to_sql(paper.paper_id), to_sql(subscriber.subscriber_id))
+                                    for subscriber in subscribers])
+        self.repository.write_many('INSERT OR IGNORE INTO editor_papers (editor_id, paper_id) VALUES (?, ?)',
+                                   [(to_sql(editor.editor_id), to_sql(paper.paper_id)) for editor in editors])
+
+
+class EditorTable(SqliteTable):
+    kind, table, alias, key_column, columns = 'editor', 'editors', 'e', 'editor_id', EDITOR_COLUMNS
+
+    def key(self, editor):
+        return editor.editor_id
+
+    def build(self, row):
+        return self.repository.editor_from_row(row)
+
+    def insert(self, editor):
+        self.repository.write('INSERT INTO editors (editor_id, name, address, version) VALUES (?, ?, ?, ?)',
+                              (to_sql(editor.editor_id), editor.name, editor.address, editor.version))
+
+    def adopt(self, editor):
+        newspapers = list(editor.newspapers)
+        self.repository.bind_editor(editor, editor.version)
+        for paper in newspapers:
+            editor.newspapers.append(paper)
+
+    def remove(self, editor):
+        if self.repository.identity(self.kind).get(editor.editor_id) is editor:
+            self.repository.write('DELETE FROM editor_papers WHERE editor_id = ?', (to_sql(editor.editor_id),))
+        super().remove(editor)
+
+    def rekey(self, editor, old_key):
+        with self.repository.transaction():
+            super().rekey(editor, old_key)
+            self.repository.write('UPDATE editor_papers SET editor_id = ? WHERE editor_id = ?',
+                                  (to_sql(editor.editor_id), to_sql(old_key)))
+        if isinstance(editor.newspapers, EditorPapers):
+            editor.newspapers.editor_id = editor.editor_id
+
+
+class SubscriberTable(SqliteTable):
+    kind, table, alias, key_column, columns = 'subscriber', 'subscribers', 's', 'subscriber_id', SUBSCRIBER_COLUMNS
+
+    def key(self, subscriber):
+        return subscriber.subscriber_id
+
+    def build(self, row):
+        return self.repository.subscriber_from_row(row)
+
+    def insert(self, subscriber):
+        self.repository.write('INSERT INTO subscribers (subscriber_id, name, address, version) VALUES (?, ?, ?, ?)',
+                              (to_sql(subscriber.subscriber_id), subscriber.name, subscriber.address,
+                               subscriber.version))
+
+    def adopt(self, subscriber):
+        newspapers = list(subscriber.newspapers)
+        self.repository.bind_subscriber(subscriber, subscriber.version)
+        self.repository.write_many('INSERT OR IGNORE INTO subscriptions (paper_id, subscriber_id) VALUES (?, ?)',
+                                   [(to_sql(paper.paper_id), to_sql(subscriber.subscriber_id))
+                                    for paper in newspapers])
+
+
+class PaperIssues(object):
+    # The issues of one newspaper, with the Registry interface
+    _select = f'SELECT i.seq, {ISSUE_COLUMNS} FROM issues i WHERE i.paper_id = ?'
+
+    def __init__(self, repository: SqliteRepository, paper_id: int):
+        self.repository = repository
+        self.paper_id = paper_id
+
+    def _paper_of(self, issue_id) -> Optional[list]:
+        return self.repository.read('SELECT paper_id FROM issues WHERE issue_id = ?', (to_sql(issue_id),))
+
+    def add(self, issue: Issue):
+        with self.repository.transaction():
+            rows = self._paper_of(issue.issue_id)
+            if rows and (self.repository.identity('issue').get(issue.issue_id) is not issue
+                         or from_sql(rows[0][0]) == self.paper_id):
+                raise _duplicate('issue', issue.issue_id)
+            if rows:
+                self.repository.write('UPDATE issues SET paper_id = ? WHERE issue_id = ?',
+                                      (to_sql(self.paper_id), to_sql(issue.issue_id)))
+                issue.paper_id = self.paper_id
+            else:
+                self.repository.insert_issue(issue, self.paper_id)
+
+    def add_many(self, issues: List[Issue]):
+        # new issues only, in one statement
+        try:
+            self.repository.insert_issues(issues, self.paper_id)
+        except sqlite3.IntegrityError:
+            raise ValueError('An issue with one of these IDs already exists')
+
+    def get(self, issue_id) -> Optional[Issue]:
+        if not isinstance(issue_id, int):
+            return None
+        rows = self.repository.read(f'SELECT {ISSUE_COLUMNS} FROM issues i WHERE i.issue_id = ? AND i.paper_id = ?',
+                                    (to_sql(issue_id), to_sql(self.paper_id)))
+        return self.repository.issue_from_row(rows[0]) if rows else None
+
+    def remove(self, issue: Issue):
+        if self.repository.identity('issue').get(issue.issue_id) is not issue:
+            return
+        if self.repository.write('DELETE FROM issues WHERE issue_id = ? AND paper_id = ?',
+                                 (to_sql(issue.issue_id), to_sql(self.paper_id))):
+            self.repository.unbind('issue', issue.issue_id, issue)
+
+    def page(self, after: Optional[int] = None, limit: Optional[int] = None, where: Optional[Callable] = None):
+        return self.repository.page(self._select, (to_sql(self.paper_id),), 'i.seq',
+                                    self.repository.issue_from_row, after, limit, where)
+
+    def iterate(self, after: Optional[int] = None, where: Optional[Callable] = None, chunk: int = FETCH_SIZE):
+        return self.repository.iterate(self._select, (to_sql(self.paper_id),), 'i.seq',
+                                       self.repository.issue_from_row, where, after)
+
+    def ids(self) -> list:
+        return [from_sql(row[0]) for row in
+                self.repository.read('SELECT issue_id FROM issues WHERE paper_id = ? ORDER BY seq',
+                                     (to_sql(self.paper_id),))]
+
+    def values(self) -> list:
+        return list(self)
+
+    def clear(self):
+        for issue in list(self):
+            self.remove(issue)
+
+    def __contains__(self, issue) -> bool:
+        if self.repository.identity('issue').get(issue.issue_id) is not issue:
+            return False
+        rows = self._paper_of(issue.issue_id)
+        return bool(rows) and from_sql(rows[0][0]) == self.paper_id
+
+    def __iter__(self) -> Iterator[Issue]:
+        return self.iterate()
+
+    def __len__(self) -> int:
+        return self.repository.scalar('SELECT COUNT(*) FROM issues WHERE paper_id = ?', (to_sql(self.paper_id),))
+
+
+class PaperSubscribers(object):
+    # The subscribers of one newspaper, with the Registry interface
+    _select = (f'SELECT sub.seq, {SUBSCRIBER_COLUMNS} FROM subscriptions sub '
+               f'JOIN subscribers s ON s.subscriber_id = sub.subscriber_id WHERE sub.paper_id = ?')
+
+    def __init__(self, repository: SqliteRepository, paper_id: int):
+        self.repository = repository
+        self.paper_id = paper_id
+
+    def add(self, subscriber: Subscriber):
+        try:
+            self.repository.write('INSERT INTO subscriptions (paper_id, subscriber_id) VALUES (?, ?)',
+                                  (to_sql(self.paper_id), to_sql(subscriber.subscriber_id)))
+        except sqlite3.IntegrityError:
+            raise _duplicate('subscriber', subscriber.subscriber_id)
+
+    def get(self, subscriber_id) -> Optional[Subscriber]:
+        if not isinstance(subscriber_id, int):
+            return None
+        rows = self.repository.read(f'{self._select} AND sub.subscriber_id = ?',
+                                    (to_sql(self.paper_id), to_sql(subscriber_id)))
+        return self.repository.subscriber_from_row(rows[0][1:]) if rows else None
+
+    def remove(self, subscriber: Subscriber):
+        self.repository.write('DELETE FROM subscriptions WHERE paper_id = ? AND subscriber_id = ?',
+                              (to_sql(self.paper_id), to_sql(subscriber.subscriber_id)))
+
+    def page(self, after: Optional[int] = None, limit: Optional[int] = None, where: Optional[Callable] = None):
+        return self.repository.page(self._select, (to_sql(self.paper_id),), 'sub.seq',
+                                    self.repository.subscriber_from_row, after, limit, where)
+
+    def iterate(self, after: Optional[int] = None, where: Optional[Callable] = None, chunk: int = FETCH_SIZE):
+        return self.repository.iterate(self._select, (to_sql(self.paper_id),), 'sub.seq',
+                                       self.repository.subscriber_from_row, where, after)
+
+    def ids(self) -> list:
+        return [from_sql(row[0]) for row in self.repository.read(
+            'SELECT sub.subscriber_id FROM subscriptions sub JOIN subscribers s '
+            'ON s.subscriber_id = sub.subscriber_id WHERE sub.paper_id = ? ORDER BY sub.seq',
+            (to_sql(self.paper_id),))]
+
+    def values(self) -> list:
+        return list(self)
+
+    def clear(self):
+        self.repository.write('DELETE FROM subscriptions WHERE paper_id = ?', (to_sql(self.paper_id),))
+
+    def __contains__(self, subscriber) -> bool:
+        return bool(self.repository.read('SELECT 1 FROM subscriptions WHERE paper_id = ? AND subscriber_id = ?',
+                                         (to_sql(self.paper_id), to_sql(subscriber.subscriber_id))))
+
+    def __iter__(self) -> Iterator[Subscriber]:
+        return self.iterate()
+
+    def __len__(self) -> int:
+        return self.repository.scalar('SELECT COUNT(*) FROM subscriptions sub JOIN subscribers s '
+                                      'ON s.subscriber_id = sub.subscriber_id WHERE sub.paper_id = ?',
+                                      (to_sql(self.paper_id),))
+
+
+class _PaperList(object):
+    # A read-only list of newspapers selected by a join table
+    _select = ''
+
+    def _key(self) -> tuple:
+        raise NotImplementedError
+
+    def __iter__(self) -> Iterator[Newspaper]:
+        return self.repository.iterate(self._select, self._key(), 'x.seq', self.repository.paper_from_row)
+
+    def __len__(self) -> int:
+        return self.repository.scalar('SELECT COUNT(*) ' + self._select[self._select.index('FROM'):], self._key())
+
+    def __getitem__(self, index):
+        return list(self)[index]
+
+    def __contains__(self, paper) -> bool:
+        return any(candidate is paper for candidate in self)
+
+
+class SubscriberPapers(_PaperList):
+    # The newspapers of a subscriber. The subscription rows are written by the newspaper's
+    # side (Newspaper.add_subscriber_to_newspaper), so appending here only reads.
+    _select = (f'SELECT x.seq, {PAPER_COLUMNS} FROM subscriptions x '
+               f'JOIN newspapers n ON n.paper_id = x.paper_id WHERE x.subscriber_id = ?')
+
+    def __init__(self, repository: SqliteRepository, subscriber_id: int):
+        self.repository = repository
+        self.subscriber_id = subscriber_id
+
+    def _key(self) -> tuple:
+        return (to_sql(self.subscriber_id),)
+
+    def __contains__(self, paper) -> bool:
+        return bool(self.repository.read('SELECT 1 FROM subscriptions WHERE paper_id = ? AND subscriber_id = ?',
+                                         (to_sql(paper.paper_id), to_sql(self.subscriber_id))))
+
+    def append(self, paper):
+        pass
+
+    def remove(self, paper):
+        pass
+
+
+class EditorPapers(_PaperList):
+    # The newspapers an editor works for
+    _select = (f'SELECT x.seq, {PAPER_COLUMNS} FROM editor_papers x '
+               f'JOIN newspapers n ON n.paper_id = x.paper_id WHERE x.editor_id = ?')
+
+    def __init__(self, repository: SqliteRepository, editor_id: int):
+        self.repository = repository
+        self.editor_id = editor_id
+
+    def _key(self) -> tuple:
+        return (to_sql(self.editor_id),)
+
+    def __contains__(self, paper) -> bool:
+        return bool(self.repository.read('SELECT 1 FROM editor_papers WHERE editor_id = ? AND paper_id = ?',
+                                         (to_sql(self.editor_id), to_sql(paper.paper_id))))
+
+    def append(self, paper):
+        self.repository.write('INSERT OR IGNORE INTO editor_papers (editor_id, paper_id) VALUES (?, ?)',
+                              (to_sql(self.editor_id), to_sql(paper.paper_id)))
+
+    def remove(self, paper):
+        if not self.repository.write('DELETE FROM editor_papers WHERE editor_id = ? AND paper_id = ?',
+                                     (to_sql(self.editor_id), to_sql(paper.paper_id))):
+            raise ValueError('list.remove(x): x not in list')
+
+
+class PaperEditors(object):
+    # The editors of one newspaper, with the Registry interface. The links are written by
+    # the editor's side (EditorPapers), so adding here only writes a missing one.
+    _select = (f'SELECT x.seq, {EDITOR_COLUMNS} FROM editor_papers x '
+               f'JOIN editors e ON e.editor_id = x.editor_id WHERE x.paper_id = ?')
+
+    def __init__(self, repository: SqliteRepository, paper_id: int):
+        self.repository = repository
+        self.paper_id = paper_id
+
+    def add(self, editor: Editor):
+        self.repository.write('INSERT OR IGNORE INTO editor_papers (editor_id, paper_id) VALUES (?, ?)',
+                              (to_sql(editor.editor_id), to_sql(self.paper_id)))
+
+    def remove(self, editor: Editor):
+        self.repository.write('DELETE FROM editor_papers WHERE editor_id = ? AND paper_id = ?',
+                              (to_sql(editor.editor_id), to_sql(self.paper_id)))
+
+    def rekey(self, editor: Editor, old_key):
+        # EditorTable.rekey moves the links
+        pass
+
+    def page(self, after: Optional[int] = None, limit: Optional[int] = None, where: Optional[Callable] = None):
+        return self.repository.page(self._select, (to_sql(self.paper_id),), 'x.seq',
+                                    self.repository.editor_from_row, after, limit, where)
+
+    def ids(self) -> list:
+        return [from_sql(row[0]) for row in
+                self.repository.read('SELECT editor_id FROM editor_papers WHERE paper_id = ? ORDER BY seq',
+                                     (to_sql(self.paper_id),))]
+
+    def __contains__(self, editor) -> bool:
+        return bool(self.repository.read('SELECT 1 FROM editor_papers WHERE editor_id = ? AND paper_id = ?',
+                                         (to_sql(editor.editor_id), to_sql(self.paper_id))))
+
+    def __iter__(self) -> Iterator[Editor]:
+        return self.repository.iterate(self._select, (to_sql(self.paper_id),), 'x.seq',
+                                       self.repository.editor_from_row)
+
+    def __len__(self) -> int:
+        return self.repository.scalar('SELECT COUNT(*) FROM editor_papers WHERE paper_id = ?',
+                                      (to_sql(self.paper_id),))
+
+
+class EditorIssues(object):
+    # The issues of one editor, with the Registry interface (read-only: an issue moves
+    # between editors through its editor_id)
+    _select = f'SELECT i.seq, {ISSUE_COLUMNS} FROM issues i WHERE i.editor_id = ?'
+
+    def __init__(self, repository: SqliteRepository, editor_id):
+        self.repository = repository
+        self.editor_id = editor_id
+
+    def get(self, issue_id) -> Optional[Issue]:
+        if not isinstance(issue_id, int):
+            return None
+        rows = self.repository.read(f'SELECT {ISSUE_COLUMNS} FROM issues i WHERE i.issue_id = ? AND i.editor_id = ?',
+                                    (to_sql(issue_id), to_sql(self.editor_id)))
+        return self.repository.issue_from_row(rows[0]) if rows else None
+
+    def page(self, after: Optional[int] = None, limit: Optional[int] = None, where: Optional[Callable] = None):
+        return self.repository.page(self._select, (to_sql(self.editor_id),), 'i.seq',
+                                    self.repository.issue_from_row, after, limit, where)
+
+    def iterate(self, after: Optional[int] = None, where: Optional[Callable] = None, chunk: int = FETCH_SIZE):
+        return self.repository.iterate(self._select, (to_sql(self.editor_id),), 'i.seq',
+                                       self.repository.issue_from_row, where, after)
+
+    def ids(self) -> list:
+        return [from_sql(row[0]) for row in
+                self.repository.read('SELECT issue_id FROM issues WHERE editor_id = ? ORDER BY seq',
+                                     (to_sql(self.editor_id),))]
+
+    def values(self) -> list:
+        return list(self)
+
+    def __contains__(self, issue) -> bool:
+        return self.get(issue.issue_id) is issue
+
+    def __iter__(self) -> Iterator[Issue]:
+        return self.iterate()
+
+    def __len__(self) -> int:
+        return self.repository.scalar('SELECT COUNT(*) FROM issues WHERE editor_id = ?', (to_sql(self.editor_id),))
+
+
+class SqliteIssueIndex(object):
+    # issue_id -> (newspaper, issue), with the IssueIndex interface
+    _select = f'SELECT i.seq, {ISSUE_COLUMNS} FROM issues i WHERE 1'
+
+    def __init__(self, repository: SqliteRepository):
+        self.repository = repository
+
+    def add(self, issue: Issue, newspaper=None):
+        rows = self.repository.read('SELECT 1 FROM issues WHERE issue_id = ?', (to_sql(issue.issue_id),))
+        if rows and self.repository.identity('issue').get(issue.issue_id) is not issue:
+            raise ValueError(f'An issue with ID {issue.issue_id} already exists')
+        # an issue of a newspaper is stored when the newspaper's collection takes it
+        if not rows and newspaper is None:
+            self.repository.insert_issue(issue, None)
+
+    def get(self, issue_id) -> Optional[Issue]:
+        issue = self.repository.identity('issue').get(issue_id)
+        if issue is not None or not isinstance(issue_id, int):
+            return issue
+        rows = self.repository.read(f'SELECT {ISSUE_COLUMNS} FROM issues i WHERE i.issue_id = ?', (to_sql(issue_id),))
+        return self.repository.issue_from_row(rows[0]) if rows else None
+
+    def lookup(self, issue_id) -> Optional[Tuple[Optional[Newspaper], Issue]]:
+        issue = self.get(issue_id)
+        if issue is None:
+            return None
+        paper = self.repository.newspapers.get(issue.paper_id) if issue.paper_id is not None else None
+        return paper, issue
+
+    def newspaper_of(self, issue: Issue):
+        entry = self.lookup(issue.issue_id)
+        return entry[0] if entry is not None and entry[1] is issue else None
+
+    def add_many(self, issues: List[Issue], newspaper=None):
+        # the newspaper's collection stores them (and rejects duplicates)
+        if newspaper is None:
+            self.repository.insert_issues(issues, None)
+
+    def set_editor(self, issue: Issue, editor_id):
+        # the editor_id column is the index
+        issue.set_editor(editor_id)
+
+    def of_editor(self, editor_id) -> EditorIssues:
+        return EditorIssues(self.repository, editor_id)
+
+    def remove(self, issue: Issue):
+        if self.repository.identity('issue').get(issue.issue_id) is not issue:
+            return
+        self.repository.write('DELETE FROM issues WHERE issue_id = ?', (to_sql(issue.issue_id),))
+        self.repository.unbind('issue', issue.issue_id, issue)
+
+    def remove_newspaper(self, newspaper):
+        self.repository.write('DELETE FROM issues WHERE paper_id = ?', (to_sql(newspaper.paper_id),))
+        for issue_id, issue in list(self.repository.identity('issue').items()):
+            if issue.paper_id == newspaper.paper_id:
+                self.repository.unbind('issue', issue_id, issue)
+
+    def clear(self):
+        self.repository.write('DELETE FROM issues')
+        for issue_id, issue in list(self.repository.identity('issue').items()):
+            self.repository.unbind('issue', issue_id, issue)
+
+    def __contains__(self, issue) -> bool:
+        return self.get(issue.issue_id) is issue
+
+    def __iter__(self) -> Iterator[Issue]:
+        return self.repository.iterate(self._select, (), 'i.seq', self.repository.issue_from_row)
+
+    def __len__(self) -> int:
+        return self.repository.scalar('SELECT COUNT(*) FROM issues')
+
+
+class SqliteLedger(object):
+    # Deliveries with the DeliveryLedger interface. Missing issues are not tracked
+    # incrementally: they are the released issues of the subscribed papers without a
+    # delivery, which the indexes answer directly.
+    _missing = ('FROM subscriptions sub JOIN issues i ON i.paper_id = sub.paper_id AND i.released '
+                'WHERE sub.subscriber_id = ? AND NOT EXISTS '
+                '(SELECT 1 FROM deliveries d WHERE d.issue_id = i.issue_id AND d.subscriber_id = sub.subscriber_id)')
+
+    def __init__(self, repository: SqliteRepository):
+        self.repository = repository
+
+    def record(self, issue_id: int, subscriber_id: int, paper_id: Optional[int] = None) -> bool:
+        return self.repository.write('INSERT OR IGNORE INTO deliveries (issue_id, subscriber_id) VALUES (?, ?)',
+                                     (to_sql(issue_id), to_sql(subscriber_id))) == 1
+
+    def owe(self, paper_id, issue_id, subscriber_ids):
+        pass
+
+    def retract(self, paper_id, issue_id, subscriber_ids):
+        pass
+
+    def forgive(self, subscriber_id, paper_id):
+        pass
+
+    def missing_count(self, subscriber_id: int) -> int:
+        return self.repository.scalar(f'SELECT COUNT(*) {self._missing}', (to_sql(subscriber_id),))
+
+    def missing(self, subscriber_id: int) -> Iterator[Tuple[int, int]]:
+        rows = self.repository.read(f'SELECT i.paper_id, i.issue_id {self._missing} '
+                                    f'ORDER BY sub.seq, i.release_seq, i.seq', (to_sql(subscriber_id),))
+        return ((from_sql(paper_id), from_sql(issue_id)) for paper_id, issue_id in rows)
+
+    def delivered(self, issue_id: int, subscriber_id: int) -> bool:
+        return bool(self.repository.read('SELECT 1 FROM deliveries WHERE issue_id = ? AND subscriber_id = ?',
+                                         (to_sql(issue_id), to_sql(subscriber_id))))
+
+    def subscribers_of(self, issue_id: int) -> AbstractSet[int]:
+        return frozenset(from_sql(row[0]) for row in self.repository.read(
+            'SELECT subscriber_id FROM deliveries WHERE issue_id = ?', (to_sql(issue_id),)))
+
+    def issues_of(self, subscriber_id: int) -> AbstractSet[int]:
+        return frozenset(from_sql(row[0]) for row in self.repository.read(
+            'SELECT issue_id FROM deliveries WHERE subscriber_id = ?', (to_sql(subscriber_id),)))
+
+    def recipients(self) -> Iterator[Tuple[int, AbstractSet[int]]]:
+        grouped = {}
+        for issue_id, subscriber_id in self.repository.read('SELECT issue_id, subscriber_id FROM deliveries'):
+            grouped.setdefault(from_sql(issue_id), set()).add(from_sql(subscriber_id))
+        return iter(grouped.items())
+
+    def count_for_issue(self, issue_id: int) -> int:
+        return self.repository.scalar('SELECT COUNT(*) FROM deliveries WHERE issue_id = ?', (to_sql(issue_id),))
+
+    def count_for_subscriber(self, subscriber_id: int) -> int:
+        return self.repository.scalar('SELECT COUNT(*) FROM deliveries WHERE subscriber_id = ?',
+                                      (to_sql(subscriber_id),))
+
+    def received_by_paper(self, subscriber_id: int) -> dict:
+        return {from_sql(paper_id): count for paper_id, count in self.repository.read(
+            'SELECT i.paper_id, COUNT(*) FROM deliveries d JOIN issues i ON i.issue_id = d.issue_id '
+            'WHERE d.subscriber_id = ? AND i.paper_id IS NOT NULL GROUP BY i.paper_id', (to_sql(subscriber_id),))}
+
+    def forget_issue(self, issue_id: int):
+        self.repository.write('DELETE FROM deliveries WHERE issue_id = ?', (to_sql(issue_id),))
+
+    def forget_subscriber(self, subscriber_id: int):
+        self.repository.write('DELETE FROM deliveries WHERE subscriber_id = ?', (to_sql(subscriber_id),))
+
+    def clear(self):
+        self.repository.write('DELETE FROM deliveries')
+
+    def __len__(self) -> int:
+        return self.repository.scalar('SELECT COUNT(*) FROM deliveries')
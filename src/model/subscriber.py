@@ -1,14 +1,43 @@
-from typing import List
+from fractions import Fraction
+from itertools import islice
+from typing import Dict, List
 from .newspaper import Newspaper
-from .issue import Issue
+from .ledger import DeliveryLedger
+from .cache import Versioned
+
+class Subscriber(Versioned):
+    __slots__ = ('subscriber_id', 'name', 'address', '_newspapers', 'ledger')
 
-class Subscriber(object):
     def __init__(self,subscriber_id: int, name: str, address: str):
+        super().__init__()
         self.subscriber_id: int = subscriber_id
         self.name: str = name
         self.address: str = address
-        self.newspapers: List[Newspaper] = []
-        self.delivered_issues: List[Issue] = []
+        # most subscribers hold few papers, so the list is only created on the first subscription
+        self._newspapers: List[Newspaper] = None
+        # shared with the issues; attached by the Agency or on first delivery
+        self.ledger: DeliveryLedger = None
+
+    @property
+    def newspapers(self) -> List[Newspaper]:
+        if self._newspapers is None:
+            self._newspapers = []
+        return self._newspapers
+
+    @newspapers.setter
+    def newspapers(self, newspapers: List[Newspaper]):
+        self._newspapers = newspapers
+
+    def _papers(self):
+        # the subscribed papers, without creating the list
+        return self._newspapers if self._newspapers is not None else ()
+
+    @property
+    def delivered_issues(self):
+        # IDs of the issues delivered to this subscriber
+        if self.ledger is None:
+            return frozenset()
+        return self.ledger.issues_of(self.subscriber_id)
 
     def create_subscriber(self, subscriber_id: int, name: str, address: str):
         return Subscriber(subscriber_id, name, address)
@@ -17,24 +46,85 @@ class Subscriber(object):
         if newspaper not in self.newspapers:
             self.newspapers.append(newspaper)
         newspaper.add_subscriber_to_newspaper(self)
+        self.touch()
 
-    def serialize(self):
-        return {
+    def unsubscribe_from_newspaper(self, newspaper: Newspaper):
+        if newspaper in self._papers():
+            self.newspapers.remove(newspaper)
+        newspaper.remove_subscriber_from_newspaper(self)
+        self.touch()
+
+    def update(self, name: str = None, address: str = None):
+        if name is not None:
+            self.name = name
+        if address is not None:
+            self.address = address
+        self.touch()
+
+    def stamp(self, depth: int = 0):
+        # the versions a serialization at this depth depends on
+        if not depth:
+            return self.version
+        return (self.version,) + tuple(newspaper.version for newspaper in self._papers())
+
+    def missing_issues(self, offset: int = 0, limit: int = None):
+        # released issues of the subscribed papers that were not delivered yet
+        if self.ledger is None:
+            return []
+        stop = None if limit is None else offset + limit
+        return [{"issue_id": issue_id, "paper_id": paper_id}
+                for paper_id, issue_id in islice(self.ledger.missing(self.subscriber_id), offset, stop)]
+
+    def calculate_missing_issues(self):
+        if self.ledger is None:
+            return 0
+        return self.ledger.missing_count(self.subscriber_id)
+
+    def serialize(self, fields=None, depth: int = 0):
+        # depth 0 lists newspapers by ID, depth 1 embeds a summary of each paper,
+        # depth 2 embeds the papers with their issue and subscriber IDs
+        data = {
             "subscriber_id": self.subscriber_id,
             "name": self.name,
-            "address": self.address,
-            "newspapers": [newspaper.serialize() for newspaper in self.newspapers],
-            "delivered_issues": [issue.serialize() for issue in self.delivered_issues]
+            "address": self.address
         }
+        if fields is None or "newspapers" in fields:
+            if depth >= 2:
+                data["newspapers"] = [newspaper.serialize() for newspaper in self._papers()]
+            elif depth == 1:
+                data["newspapers"] = [newspaper.serialize_paper_id() for newspaper in self._papers()]
+            else:
+                data["newspapers"] = [newspaper.paper_id for newspaper in self._papers()]
+        if fields is None or "delivered_issues" in fields:
+            data["delivered_issues"] = list(self.delivered_issues)
+        if fields is None:
+            return data
+        return {key: value for key, value in data.items() if key in fields}
 
     def calculate_subscriptions(self):
-        return len(self.newspapers)
+        return len(self._papers())
+
+    def _cost(self) -> Fraction:
+        # summed from the current prices, so that a price change does not touch the subscribers;
+        # exact, so that the sum does not depend on the order of the papers
+        return sum((Fraction(newspaper.price) for newspaper in self._papers()), Fraction(0))
 
     def calculate_monthly_cost(self):
-        return sum([newspaper.price for newspaper in self.newspapers])
+        return float(self._cost())
+
+    def calculate_annual_cost(self):
+        return float(self._cost() * 12)
 
     def calculate_issues(self):
-        return len(self.delivered_issues)
+        if self.ledger is None:
+            return 0
+        return self.ledger.count_for_subscriber(self.subscriber_id)
+
+    def calculate_issues_per_paper(self) -> Dict[int, int]:
+        # paper_id -> number of issues of that paper delivered to this subscriber
+        if self.ledger is None:
+            return {}
+        return self.ledger.received_by_paper(self.subscriber_id)
 
     def serialize_subscriber_id(self):
         return {
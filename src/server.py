@@ -0,0 +1,48 @@
+import os
+import signal
+import socket
+from typing import Callable, List
+
+from flask import Flask
+from werkzeug.serving import make_server
+
+from .model.sqlite_repository import SqliteRepository
+
+
+def serve(create: Callable[[], Flask], host: str, port: int, workers: int, database: str):
+    # Pre-forking server: the listening socket is opened once and every worker process
+    # accepts on it with its own threaded server. The workers share nothing but the SQLite
+    # database, so each has its own interpreter and GIL. Each worker creates its app (and
+    # its connections) after the fork, since SQLite connections must not cross a fork.
+    # the schema is created once here rather than by all workers at the same time
+    SqliteRepository(database).close()
+    listener = socket.create_server((host, port))
+    listener.set_inheritable(True)
+
+    children: List[int] = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            server = make_server(host, port, create(), threaded=True, fd=listener.fileno())
+            try:
+                server.serve_forever()
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    def stop(signum, frame):
+        for child in children:
+            try:
+                os.kill(child, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        for child in children:
+            os.waitpid(child, 0)
+    finally:
+        listener.close()
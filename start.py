@@ -1,5 +1,16 @@
+import os
+
 from src.app import create_app
+from src.server import serve
 
 if __name__ == '__main__':
-    app = create_app()
-    create_app().run(debug=False, port=7890)
\ No newline at end of file
+    workers = int(os.environ.get('NSMS_WORKERS', 1))
+    if workers > 1:
+        # the worker processes share the agency through its SQLite database
+        database = os.environ.get('NSMS_DATABASE')
+        if not database:
+            raise SystemExit('NSMS_WORKERS requires NSMS_DATABASE')
+        serve(lambda: create_app(database=database), '127.0.0.1', 7890, workers, database)
+    else:
+        app = create_app()
+        app.run(debug=False, port=7890)
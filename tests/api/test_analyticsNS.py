@@ -0,0 +1,36 @@
+from ..fixtures import app, client, agency
+
+
+def test_get_summary(client, agency):
+    response = client.get("/analytics/")
+    assert response.status_code == 200
+    parsed = response.get_json()
+    assert parsed["newspapers"] == len(agency.all_newspapers())
+    assert parsed["subscribers"] == len(agency.subscriber)
+
+
+def test_get_newspaper_summary(client, agency):
+    response = client.get("/analytics/newspapers?top=2")
+    assert response.status_code == 200
+    parsed = response.get_json()
+    assert len(parsed["top_revenue"]) == min(2, len(agency.all_newspapers()))
+    assert set(parsed["percentiles"]["price"]) == {"p50", "p90", "p99"}
+
+    assert client.get("/analytics/newspapers?top=-1").status_code == 400
+
+
+def test_get_newspaper_groups(client, agency):
+    response = client.get("/analytics/newspapers/groups?by=price&bands=5,10")
+    assert response.status_code == 200
+    groups = response.get_json()["groups"]
+    assert sum(group["newspapers"] for group in groups) == len(agency.all_newspapers())
+
+    assert client.get("/analytics/newspapers/groups?by=name").status_code == 400
+    assert client.get("/analytics/newspapers/groups?by=price&bands=x").status_code == 400
+
+
+def test_get_subscriber_summary(client, agency):
+    response = client.get("/analytics/subscribers")
+    assert response.status_code == 200
+    parsed = response.get_json()
+    assert sum(row["subscribers"] for row in parsed["subscriptions"]) == len(agency.subscriber)
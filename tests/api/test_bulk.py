@@ -0,0 +1,83 @@
+import io
+import json
+
+from ..fixtures import app, client, agency
+from ...src.api import bulk
+from ...src.api.bulk import _iter_json_array, _iter_ndjson, MalformedBody
+
+import pytest
+
+
+def test_iter_json_array_across_chunk_boundaries():
+    records = [{"name": f"Paper {i}", "price": 1.25 * i} for i in range(50)]
+    stream = io.BytesIO(json.dumps(records).encode())
+    assert [record for _, record in _iter_json_array(stream, chunk_size=7)] == records
+
+def test_iter_json_array_empty():
+    assert list(_iter_json_array(io.BytesIO(b" [ ] "))) == []
+
+def test_iter_json_array_malformed():
+    stream = io.BytesIO(b'[{"name": "a"}, {"name": ]')
+    rows = _iter_json_array(stream, chunk_size=4)
+    assert next(rows) == (1, {"name": "a"})
+    with pytest.raises(MalformedBody):
+        next(rows)
+
+def test_iter_ndjson_reports_bad_lines():
+    stream = io.BytesIO(b'{"name": "a"}\n\nnot json\n{"name": "b"}\n')
+    rows = list(_iter_ndjson(stream))
+    assert rows[0] == (1, {"name": "a"})
+    assert isinstance(rows[1][1], ValueError)
+    assert rows[2] == (3, {"name": "b"})
+
+
+def test_bulk_create_newspapers_from_json_array(client, agency):
+    before = len(agency.newspapers)
+    response = client.post("/newspaper/bulk", json=[
+        {"name": "Simpsons Comic", "frequency": 7, "price": 3.14},
+        {"name": "Missing price", "frequency": 7},
+        {"name": "Superman Comic", "frequency": 30, "price": 5}
+    ])
+    assert response.status_code == 200
+    parsed = response.get_json()
+    assert parsed["created"] == 2
+    assert parsed["errors"] == [{"row": 2, "message": "'price' is a required property"}]
+    assert len(agency.newspapers) == before + 2
+    assert agency.get_newspaper(parsed["ids"][1]).name == "Superman Comic"
+
+def test_bulk_create_subscribers_from_ndjson(client, agency):
+    body = "\n".join(json.dumps({"name": f"Subscriber {i}", "address": "1234 Elm Street"}) for i in range(2500))
+    response = client.post("/subscriber/bulk", data=body, content_type="application/x-ndjson")
+    assert response.status_code == 200
+    parsed = response.get_json()
+    assert parsed["created"] == 2500
+    assert parsed["errors"] == []
+    assert len(agency.subscriber) == 2500
+    assert parsed["ids"] == sorted(set(parsed["ids"]))
+    assert client.post("/subscriber/", json={"name": "Next", "address": "Elm St"}).get_json()["subscriber_id"] \
+        > parsed["ids"][-1]
+
+def test_bulk_create_editors(client, agency):
+    response = client.post("/editor/bulk", data='{"name": "John Doe"}\n{"name": 3}\n',
+                           content_type="application/x-ndjson")
+    parsed = response.get_json()
+    assert parsed["created"] == 1
+    assert parsed["errors"] == [{"row": 2, "message": "'name' has an invalid type"}]
+    assert agency.get_editor(parsed["ids"][0]).name == "John Doe"
+
+def test_bulk_create_holds_the_lock_per_batch(client, agency, monkeypatch):
+    body = "\n".join(json.dumps({"name": f"Subscriber {i}", "address": "1234 Elm Street"}) for i in range(2500))
+    locked_while_reading = []
+    read = bulk.iter_records
+
+    def iter_records():
+        # notes whether the agency is locked whenever the next record is read from the request
+        for row in read():
+            locked_while_reading.append(agency.lock.writing())
+            yield row
+
+    monkeypatch.setattr(bulk, 'iter_records', iter_records)
+    response = client.post("/subscriber/bulk", data=body, content_type="application/x-ndjson")
+    assert response.get_json()["created"] == 2500
+    assert len(locked_while_reading) == 2500
+    assert not any(locked_while_reading)
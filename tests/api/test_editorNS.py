@@ -89,4 +89,38 @@ def test_editor_initialization_with_valid_parameters():
 
 def test_show_editor_issues():
     editor = Editor(1, "John Doe", "1234 Elm Street")
-    assert editor.get_editor_issues_ids() == []
\ No newline at end of file
+    assert editor.get_editor_issues_ids() == []
+
+
+def test_get_editor_issues_pages(client, agency):
+    paper = agency.get_newspaper(100)
+    editor = Editor(1, "John Doe", "1234 Elm Street")
+    agency.add_editor(editor)
+    for issue_id in range(10, 15):
+        agency.add_newspaper_issue(paper, Issue("2024-01-01", 12, None, issue_id))
+        agency.set_editor_to_issue(editor, agency.get_issue(issue_id), paper)
+
+    response = client.get("/editor/1/issues?limit=3")
+    assert response.status_code == 200
+    parsed = response.get_json()
+    assert [issue["issue_id"] for issue in parsed["issues"]] == [10, 11, 12]
+    assert parsed["issues"][0]["paper_id"] == 100
+    parsed = client.get(f"/editor/1/issues?limit=3&after={parsed['next']}").get_json()
+    assert [issue["issue_id"] for issue in parsed["issues"]] == [13, 14]
+    assert parsed["next"] is None
+
+    assert client.get("/editor/2/issues").status_code == 404
+
+
+def test_delete_editor_reassigns_issues(client, agency):
+    paper = agency.get_newspaper(100)
+    agency.add_editor(Editor(1, "John Doe", "1234 Elm Street"))
+    agency.add_editor(Editor(2, "Jane Doe", "1234 Elm Street"))
+    agency.add_newspaper_issue(paper, Issue("2024-01-01", 12, None, 10))
+    agency.set_editor_to_issue(agency.get_editor(2), agency.get_issue(10), paper)
+    agency.set_editor_to_issue(agency.get_editor(1), agency.get_issue(10), paper)
+
+    response = client.delete("/editor/1")
+    assert response.status_code == 200
+    assert response.get_json()["reassigned_issues"] == 1
+    assert agency.get_issue(10).editor_id == 2
@@ -0,0 +1,92 @@
+import json
+
+from flask_restx import Model, fields, marshal
+
+from ..fixtures import app, client, agency
+from ...src.api.encoders import compile_encoder, encode
+from ...src.api.analyticsNS import analytics_ns
+from ...src.api.editorNS import editor_ns
+from ...src.api.jobsNS import jobs_ns
+from ...src.api.newspaperNS import issue_page_model, newspaper_ns, paper_model, paper_projected_model
+from ...src.api.schedulerNS import scheduler_ns
+from ...src.api.subscriberNS import missing_issues_page_model, subscriber_ns
+
+NAMESPACES = (newspaper_ns, editor_ns, subscriber_ns, analytics_ns, jobs_ns, scheduler_ns)
+
+# a value of each field type, including characters that JSON escapes
+SAMPLES = {fields.Integer: 7, fields.Float: 2.5, fields.String: 'Caf\u00e9 "Zeit"', fields.Boolean: 1,
+           fields.Raw: {"raw": [1, None]}}
+
+
+def marshalled(data, model, **options):
+    return json.dumps(marshal(data, model, **options), separators=(',', ':'))
+
+
+def test_encoder_matches_marshal():
+    cases = [
+        (paper_projected_model, {"paper_id": 5, "name": "Café \"Zeit\"", "frequency": 7.0, "price": 3,
+                                 "issues": [1, None, 3], "subscribers": None}),
+        (paper_model, {}),
+        (paper_model, [{"paper_id": 1}, {"paper_id": 2}]),
+        (paper_model, {"paper_id": 1, "issues": [{"issue_id": 2, "pages": 12, "released": 1}, None],
+                       "price": float('inf')}),
+        (issue_page_model, {"issue newspaper": [{"issue_id": 1, "editor": 7}], "next": "MTA"}),
+    ]
+    for model, data in cases:
+        assert encode(data, model) == marshalled(data, model)
+        assert encode(data, model, envelope='wrapped') == marshalled(data, model, envelope='wrapped')
+
+
+def sample(field):
+    if isinstance(field, type):
+        field = field()
+    if type(field) is fields.List:
+        return [sample(field.container), None]
+    if type(field) is fields.Nested:
+        return sample_of(field.nested)
+    return SAMPLES.get(type(field), 'other')
+
+
+def sample_of(model):
+    return {getattr(field, 'attribute', None) or name: sample(field) for name, field in model.items()}
+
+
+def test_every_model_encodes_like_marshal():
+    models = [model for namespace in NAMESPACES for model in namespace.models.values()]
+    assert len(models) > 20
+    for model in models:
+        for data in (sample_of(model), {}, [sample_of(model), {}]):
+            for skip_none in (False, True):
+                assert encode(data, model, skip_none=skip_none) == \
+                    marshalled(data, model, skip_none=skip_none), model.name
+
+
+def test_encoder_skips_none_like_marshal():
+    data = {"missing_issues": [{"issue_id": 1, "paper_id": None}], "next": None, "total": 3}
+    assert encode(data, missing_issues_page_model, skip_none=True) == \
+        marshalled(data, missing_issues_page_model, skip_none=True)
+
+
+def test_encoder_for_a_field_subset():
+    data = {"paper_id": 1, "name": "Daily", "price": 2.5}
+    assert encode(data, paper_model, only=frozenset({"name", "price"})) == \
+        marshalled(data, paper_model, mask='{name,price}')
+
+
+def test_unknown_fields_fall_back_to_marshal():
+    model = Model('Dated', {'at': fields.DateTime(dt_format='iso8601'), 'id': fields.Integer})
+    data = {'at': '2024-01-01T00:00:00', 'id': '3'}
+    assert compile_encoder(model).__name__ == 'slow'
+    assert encode(data, model) == marshalled(data, model)
+
+
+def test_encoded_endpoints(client, agency):
+    response = client.get("/newspaper/?limit=2")
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    assert [paper["paper_id"] for paper in response.get_json()["newspapers"]] == [100, 101]
+
+    masked = client.get("/newspaper/?limit=2", headers={"X-Fields": "newspapers{name}"})
+    assert masked.get_json() == {"newspapers": [{"name": "The New York Times"}, {"name": "Heute"}]}
+
+    assert client.get("/newspaper/100/stats").get_json()["stats newspaper"]["number_subscribers"] == 0
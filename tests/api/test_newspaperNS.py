@@ -1,14 +1,16 @@
 from ..fixtures import app, client, agency
 from ...src.model.issue import Issue
+from ...src.model.subscriber import Subscriber
+from ...src.model.editor import Editor
 
 def test_deliver_issue(client, agency):
     # Prepare
-    paper = agency.newspapers[0]
+    paper = list(agency.newspapers)[0]
     if not paper.issues:
         issue = Issue("2022-01-01", 10, 1, 1)
         paper.add_issue(issue)
         agency.add_issue(issue)
-    issue = paper.issues[0]
+    issue = list(paper.issues)[0]
 
     assert agency.get_newspaper(paper.paper_id) is not None
     assert agency.get_issue(issue.issue_id) is not None
@@ -49,7 +51,7 @@ def test_add_newspaper(client, agency):
 
 
 def test_get_newspaper_information(client,agency):
-    paper = agency.newspapers[0]
+    paper = list(agency.newspapers)[0]
 
     response = client.get(f"/newspaper/{paper.paper_id}")  # <-- note the slash at the end!
     assert response.status_code == 200
@@ -60,7 +62,7 @@ def test_get_newspaper_information(client,agency):
     assert paper_response["price"] == paper.price
 
 def test_update_newspaper(client,agency):
-    paper = agency.newspapers[0]
+    paper = list(agency.newspapers)[0]
 
     response = client.post(f"/newspaper/{paper.paper_id}",  # <-- note the slash at the end!
                            json={
@@ -78,7 +80,7 @@ def test_update_newspaper(client,agency):
     assert paper_response["price"] == 3.14
 
 def test_delete_newspaper_by_id(client, agency):
-    paper = agency.newspapers[0]
+    paper = list(agency.newspapers)[0]
     response = client.delete(f"/newspaper/{paper.paper_id}")
     assert response.status_code == 200
     assert paper not in agency.newspapers
@@ -86,7 +88,7 @@ def test_delete_newspaper_by_id(client, agency):
     expected_message = {"message": f"Newspaper with ID {paper.paper_id} was deleted"}
     assert parsed == expected_message
 def test_create_issue(client, agency):
-    paper = agency.newspapers[0]
+    paper = list(agency.newspapers)[0]
     issue_count_before = len(paper.issues)
 
     # act
@@ -109,7 +111,7 @@ def test_create_issue(client, agency):
     assert len(paper.issues) == issue_count_before + 1
 
 def test_get_newspaper_issues(client, agency):
-    paper = agency.newspapers[0]
+    paper = list(agency.newspapers)[0]
     response = client.get(f"/newspaper/{paper.paper_id}/issue")
     assert response.status_code == 200
     parsed = response.get_json()
@@ -121,14 +123,14 @@ def test_get_issue_information_nonexistent_paper(client, agency):
     assert response.status_code == 404
 
 def test_get_issue_information_nonexistent_issue(client, agency):
-    paper_id = agency.newspapers[0].paper_id
+    paper_id = list(agency.newspapers)[0].paper_id
     nonexistent_issue_id = 9999
     response = client.get(f"/newspaper/{paper_id}/issue/{nonexistent_issue_id}")
     assert response.status_code == 404
 
 def test_list_newspaper_issues(client, agency):
 
-  paper = agency.newspapers[0]
+  paper = list(agency.newspapers)[0]
 
   response = client.get(f"/newspaper/{paper.paper_id}/issue")
 
@@ -137,17 +139,17 @@ def test_list_newspaper_issues(client, agency):
   issues = parsed.get("issues", [])
 
 def test_get_issue_information(client, agency):
-    paper = agency.newspapers[0]
+    paper = list(agency.newspapers)[0]
 
     response = client.get(f"/newspaper/{paper.paper_id}/issue/1")
     assert response.status_code == 200 or response.status_code == 404
 
 
 def test_release_issue(client, agency):
-    paper = agency.newspapers[0]
+    paper = list(agency.newspapers)[0]
     if not paper.issues:
         paper.add_issue(Issue("2022-01-01", 10, 1, 1))
-    issue = paper.issues[0]
+    issue = list(paper.issues)[0]
 
     response = client.post(f"/newspaper/{paper.paper_id}/issue/{issue.issue_id}/release")
 
@@ -158,7 +160,7 @@ def test_release_issue(client, agency):
 
 def test_stats_for_newspaper(client, agency):
     # Prepare
-    paper, issue = agency.newspapers[0], Issue("2022-01-01", 10, 1, 1)
+    paper, issue = list(agency.newspapers)[0], Issue("2022-01-01", 10, 1, 1)
     paper.add_issue(issue)
     agency.add_issue(issue)
 
@@ -167,4 +169,192 @@ def test_stats_for_newspaper(client, agency):
     response_data = response.get_json()['stats newspaper']
     expected_keys = ['monthly_revenue', 'annual_revenue', 'number_subscribers']
     for key in expected_keys:
-        assert key in response_data, f"Expected key '{key}' not found in the response"
\ No newline at end of file
+        assert key in response_data, f"Expected key '{key}' not found in the response"
+
+def test_created_issue_is_indexed_by_agency(client, agency):
+    paper = list(agency.newspapers)[0]
+    response = client.post(f"/newspaper/{paper.paper_id}/issue", json={
+        "release_date": "2020-01-01",
+        "page": 32
+    })
+    issue_id = response.get_json()["issue_id"]
+    assert agency.get_issue(issue_id) is list(paper.issues)[-1]
+
+    response = client.get(f"/newspaper/{paper.paper_id}/issue/{issue_id}")
+    assert response.status_code == 200
+
+def test_issue_of_other_newspaper_is_not_found(client, agency):
+    paper, other_paper = list(agency.newspapers)[:2]
+    paper.add_issue(Issue("2022-01-01", 10, 1, 1))
+
+    response = client.post(f"/newspaper/{other_paper.paper_id}/issue/1/release")
+    assert response.status_code == 404
+
+def test_deliver_issue_to_all_subscribers(client, agency):
+    paper = list(agency.newspapers)[0]
+    for subscriber_id in range(1, 4):
+        subscriber = Subscriber(subscriber_id, "John Doe", "1234 Elm Street")
+        agency.add_subscriber(subscriber)
+        subscriber.subscribe_to_newspaper(paper)
+    paper.add_issue(Issue("2022-01-01", 10, 1, 1))
+
+    response = client.post(f"/newspaper/{paper.paper_id}/issue/1/deliver")
+    assert response.status_code == 409
+
+    client.post(f"/newspaper/{paper.paper_id}/issue/1/release")
+    response = client.post(f"/newspaper/{paper.paper_id}/issue/1/deliver", json={"only_missing": True})
+    assert response.status_code == 200
+    parsed = response.get_json()
+    assert parsed["delivered"] == 3
+    assert agency.get_issue(1).subscribers == {1, 2, 3}
+
+def test_list_newspapers_with_cursor(client, agency):
+    response = client.get("/newspaper/?limit=3")
+    parsed = response.get_json()
+    assert len(parsed["newspapers"]) == 3
+    assert parsed["next"]
+
+    response = client.get(f"/newspaper/?limit=3&after={parsed['next']}")
+    parsed = response.get_json()
+    assert [paper["paper_id"] for paper in parsed["newspapers"]] == [125]
+    assert parsed["next"] is None
+
+def test_list_newspapers_with_invalid_cursor(client, agency):
+    response = client.get("/newspaper/?after=not-a-cursor")
+    assert response.status_code == 400
+
+def test_filter_newspaper_issues(client, agency):
+    paper = list(agency.newspapers)[0]
+    for issue_id, release_date in enumerate(["2022-01-01", "2022-02-01", "2022-03-01", "2022-04-01"], 1):
+        paper.add_issue(Issue(release_date, 10, 1, issue_id, released=issue_id % 2 == 0))
+
+    response = client.get(f"/newspaper/{paper.paper_id}/issue?released=true")
+    assert [issue["issue_id"] for issue in response.get_json()["issue newspaper"]] == [2, 4]
+
+    response = client.get(f"/newspaper/{paper.paper_id}/issue?release_date_from=2022-02-01&release_date_to=2022-03-31&limit=1")
+    parsed = response.get_json()
+    assert [issue["issue_id"] for issue in parsed["issue newspaper"]] == [2]
+    response = client.get(f"/newspaper/{paper.paper_id}/issue?release_date_from=2022-02-01&release_date_to=2022-03-31&after={parsed['next']}")
+    assert [issue["issue_id"] for issue in response.get_json()["issue newspaper"]] == [3]
+
+def test_get_newspaper_projection(client, agency):
+    paper = list(agency.newspapers)[0]
+    paper.add_issue(Issue("2022-01-01", 10, 1, 1))
+
+    parsed = client.get(f"/newspaper/{paper.paper_id}?fields=name,issues").get_json()["newspaper"]
+    assert parsed == {"name": paper.name, "issues": [1]}
+
+    parsed = client.get(f"/newspaper/{paper.paper_id}?depth=1").get_json()["newspaper"]
+    assert parsed["issues"][0]["page"] == 10
+
+def test_newspaper_model_nests_issues(client, agency):
+    paper = list(agency.newspapers)[0]
+    paper.add_issue(Issue("2022-01-01", 10, 1, 1))
+    schema = client.get("/swagger.json").get_json()["definitions"]
+    assert schema["NewspaperModel"]["properties"]["issues"]["items"] == {"$ref": "#/definitions/IssueModel"}
+
+    response = client.post(f"/newspaper/{paper.paper_id}", json={"name": paper.name, "frequency": 7, "price": 1.0})
+    assert response.get_json()["newspaper"]["issues"][0]["page"] == 10
+
+def test_list_newspapers_reflects_updates(client, agency):
+    paper = list(agency.newspapers)[0]
+    client.get("/newspaper/")
+    client.post(f"/newspaper/{paper.paper_id}", json={"name": "Renamed", "frequency": 7, "price": 1.0})
+
+    parsed = client.get("/newspaper/").get_json()
+    assert parsed["newspapers"][0]["name"] == "Renamed"
+    assert agency.cache.stats()["hits"] >= 3
+
+def test_conditional_get_newspaper(client, agency):
+    paper = list(agency.newspapers)[0]
+    response = client.get(f"/newspaper/{paper.paper_id}")
+    etag = response.headers["ETag"]
+
+    response = client.get(f"/newspaper/{paper.paper_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    paper.update(price=1.0)
+    response = client.get(f"/newspaper/{paper.paper_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+def test_conditional_get_newspaper_stats(client, agency):
+    paper = list(agency.newspapers)[0]
+    etag = client.get(f"/newspaper/{paper.paper_id}/stats").headers["ETag"]
+    assert client.get(f"/newspaper/{paper.paper_id}/stats", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(f"/newspaper/{paper.paper_id}?depth=1", headers={"If-None-Match": etag}).status_code == 200
+
+    Subscriber(1, "John Doe", "1234 Elm Street").subscribe_to_newspaper(paper)
+    assert client.get(f"/newspaper/{paper.paper_id}/stats", headers={"If-None-Match": etag}).status_code == 200
+
+def test_get_newspaper_information_nonexistent_paper(client, agency):
+    response = client.get("/newspaper/9999")
+    assert response.status_code == 404
+
+
+def test_state_survives_restart(tmp_path):
+    from ...src.app import create_app
+    from ...src.model.agency import Agency
+
+    Agency.singleton_instance = None
+    client = create_app(data_dir=str(tmp_path)).test_client()
+    paper_id = client.post("/newspaper/", json={"name": "Simpsons Comic", "frequency": 7, "price": 3.14}
+                           ).get_json()["newspaper"]["paper_id"]
+    issue_id = client.post(f"/newspaper/{paper_id}/issue",
+                           json={"release_date": "2024-01-01", "page": 12, "editor_id": 0}).get_json()["issue_id"]
+    client.post(f"/newspaper/{paper_id}/issue/{issue_id}/release")
+    Agency.get_instance().persistence.close()
+
+    Agency.singleton_instance = None
+    client = create_app(data_dir=str(tmp_path)).test_client()
+    response = client.get(f"/newspaper/{paper_id}/issue/{issue_id}")
+    assert response.status_code == 200
+    assert response.get_json()["issue newspaper"]["released"]
+    Agency.get_instance().persistence.close()
+
+
+def test_delete_newspaper_in_background(client, agency):
+    response = client.delete("/newspaper/100?background=true")
+    assert response.status_code == 202
+    job_id = response.get_json()["job"]["job_id"]
+    agency.jobs.wait()
+
+    response = client.get(f"/jobs/{job_id}")
+    assert response.status_code == 200
+    job = response.get_json()["job"]
+    assert job["status"] == "done"
+    assert job["result"] == {"removed": True}
+    assert agency.get_newspaper(100) is None
+    assert client.get("/jobs/1").status_code == 404
+
+
+def test_add_issue_calendar(client, agency):
+    agency.add_editor(Editor(0, "Jane", "Main St"))
+    response = client.post("/newspaper/125/calendar",
+                           json={"start": "2024-01-01", "end": "2024-12-31", "page": 90, "editor_id": 0})
+    assert response.status_code == 200
+    summary = response.get_json()
+    assert summary["created"] == 13
+    assert summary["first_release_date"] == "2024-01-01"
+    assert summary["last_release_date"] == "2024-12-26"
+
+    again = client.post("/newspaper/125/calendar", json={"start": "2024-01-01", "end": "2024-12-31"}).get_json()
+    assert again["created"] == 0
+    assert again["skipped"] == 13
+
+
+def test_add_issue_calendar_errors(client, agency):
+    assert client.post("/newspaper/999/calendar", json={"start": "2024-01-01", "end": "2024-01-31"}).status_code == 404
+    assert client.post("/newspaper/125/calendar",
+                       json={"start": "2024-01-01", "end": "2024-01-31", "editor_id": 999}).status_code == 404
+    assert client.post("/newspaper/125/calendar", json={"start": "January", "end": "2024-01-31"}).status_code == 400
+    assert client.post("/newspaper/125/calendar", json={"start": "2024-02-01", "end": "2024-01-31"}).status_code == 400
+
+
+def test_add_issue_calendars(client, agency):
+    response = client.post("/newspaper/calendar", json={"start": "2030-01-01", "end": "2030-01-07"})
+    assert response.status_code == 200
+    summary = response.get_json()
+    assert len(summary["newspapers"]) == len(agency.newspapers)
+    assert summary["created"] == sum(len(range(0, 7, paper.frequency)) for paper in agency.newspapers)
@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta, timezone
+
+from ..fixtures import app, client, agency
+from ...src.model.issue import Issue
+from ...src.model.scheduler import ReleaseScheduler
+
+
+def test_scheduler_is_off_by_default(client, agency):
+    response = client.get("/scheduler/")
+    assert response.status_code == 200
+    assert response.get_json()["running"] is False
+    assert client.get("/scheduler/queue").get_json()["releases"] == []
+
+
+def test_inspect_the_queue(client, agency):
+    paper = agency.get_newspaper(100)
+    tomorrow = (datetime.now(timezone.utc) + timedelta(days=1)).date().isoformat()
+    agency.add_newspaper_issue(paper, Issue(tomorrow, 12, None, 10))
+    agency.add_newspaper_issue(paper, Issue("2024-01-01", 12, None, 11))
+    scheduler = ReleaseScheduler(agency).start()
+    try:
+        assert scheduler.wait_idle(timeout=5)
+        status = client.get("/scheduler/").get_json()
+        assert status["running"] is True
+        assert status["pending"] == 1
+        assert status["caught_up"] == 1
+        assert status["released"] == 1
+
+        releases = client.get("/scheduler/queue?limit=10").get_json()["releases"]
+        assert [(release["issue_id"], release["paper_id"]) for release in releases] == [(10, 100)]
+        assert releases[0]["due_at"].startswith(tomorrow)
+    finally:
+        scheduler.stop()
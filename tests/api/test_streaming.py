@@ -0,0 +1,47 @@
+import json
+
+from ..fixtures import app, client, agency
+from ...src.model.issue import Issue
+from ...src.model.subscriber import Subscriber
+
+
+def test_stream_newspapers_as_json_array(client, agency):
+    response = client.get("/newspaper/?stream=json")
+    assert response.status_code == 200
+    assert response.is_streamed
+    parsed = json.loads(response.get_data())
+    assert [paper["paper_id"] for paper in parsed["newspapers"]] == [100, 101, 115, 125]
+
+    paged = client.get("/newspaper/").get_json()
+    assert parsed["newspapers"] == paged["newspapers"]
+
+def test_stream_subscribers_as_ndjson(client, agency):
+    for subscriber_id in range(1200):
+        agency.add_subscriber(Subscriber(subscriber_id, "John Doe", "1234 Elm Street"))
+
+    response = client.get("/subscriber/", headers={"Accept": "application/x-ndjson"})
+    assert response.mimetype == "application/x-ndjson"
+    lines = response.get_data(as_text=True).splitlines()
+    assert len(lines) == 1200
+    assert json.loads(lines[-1])["subscriber_id"] == 1199
+
+def test_stream_empty_collection(client, agency):
+    response = client.get("/editor/?stream=true")
+    assert json.loads(response.get_data()) == {"editors": []}
+
+def test_stream_filtered_issues(client, agency):
+    paper = list(agency.newspapers)[0]
+    for issue_id in range(1, 5):
+        paper.add_issue(Issue("2022-01-01", 10, 1, issue_id, released=issue_id > 2))
+
+    response = client.get(f"/newspaper/{paper.paper_id}/issue?stream=ndjson&released=true")
+    issues = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [issue["issue_id"] for issue in issues] == [3, 4]
+
+    response = client.get("/newspaper/9999/issue?stream=json")
+    assert response.status_code == 404
+
+def test_swagger_documents_list_endpoints(client):
+    response = client.get("/swagger.json")
+    assert response.status_code == 200
+    assert "/newspaper/" in response.get_json()["paths"]
@@ -1,5 +1,6 @@
 from ..fixtures import app, client, agency
 from ...src.model.subscriber import Subscriber
+from ...src.model.issue import Issue
 
 def test_subscriber_initialization_with_valid_parameters():
     subscriber = Subscriber(1, "John Doe", "1234 Elm Street")
@@ -39,7 +40,7 @@ def test_get_subscriber_information(client,agency):
     if not agency.subscriber:
         print("No subscribers in the agency.")
         return
-    subscriber = agency.subscriber[0]
+    subscriber = list(agency.subscriber)[0]
 
     response = client.get(f"/subscriber/{subscriber.subscriber_id}")
 
@@ -56,7 +57,7 @@ def test_delete_subscriber_by_id(client, agency):
     if not agency.subscriber:
         print("No subscribers in the agency.")
         return
-    subscriber = agency.subscriber[0]
+    subscriber = list(agency.subscriber)[0]
 
     response = client.delete(f"/subscriber/{subscriber.subscriber_id}")
     assert response.status_code == 200
@@ -71,11 +72,11 @@ def test_subscriber_subscribe_to_newspaper(client, agency):
     if not agency.subscriber:
         print("No subscribers in the agency.")
         return
-    subscriber = agency.subscriber[0]
+    subscriber = list(agency.subscriber)[0]
     if not agency.newspapers:
         print("No newspapers in the agency.")
         return
-    newspaper = agency.newspapers[0]
+    newspaper = list(agency.newspapers)[0]
 
     response = client.post(f"/subscriber/{subscriber.subscriber_id}/subscribe/{newspaper.paper_id}")
 
@@ -89,7 +90,7 @@ def test_subscriber_stats(client, agency):
     if not agency.subscriber:
         print("No subscribers in the agency.")
         return
-    subscriber = agency.subscriber[0]
+    subscriber = list(agency.subscriber)[0]
 
     response = client.get(f"/subscriber/{subscriber.subscriber_id}/stats")
 
@@ -105,7 +106,7 @@ def test_subscriber_missing_issues(client, agency):
     if not agency.subscriber:
         print("No subscribers in the agency.")
         return
-    subscriber = agency.subscriber[0]
+    subscriber = list(agency.subscriber)[0]
 
     response = client.get(f"/subscriber/{subscriber.subscriber_id}/missingissues")
 
@@ -121,7 +122,7 @@ def test_update_subscriber(client,agency):
     if not agency.subscriber:
         print("No subscribers in the agency.")
         return
-    subscriber = agency.subscriber[0]
+    subscriber = list(agency.subscriber)[0]
 
     response = client.post(f"/subscriber/{subscriber.subscriber_id}",
                            json={
@@ -132,4 +133,116 @@ def test_update_subscriber(client,agency):
     parsed = response.get_json()
     subscriber_response = parsed["subscriber"]
 
-    assert subscriber_response["name"] == "Jane Doe"
\ No newline at end of file
+    assert subscriber_response["name"] == "Jane Doe"
+
+def test_redelivered_issue_is_counted_once(client, agency):
+    paper = list(agency.newspapers)[0]
+    subscriber = Subscriber(1, "John Doe", "1234 Elm Street")
+    agency.add_subscriber(subscriber)
+    paper.add_issue(Issue("2022-01-01", 10, 1, 1))
+
+    for _ in range(2):
+        response = client.post(f"/newspaper/{paper.paper_id}/issue/1/deliver/1")
+        assert response.status_code == 200
+
+    response = client.get("/subscriber/1/stats")
+    assert response.get_json()["stats subscriber"]["number_of_issues"] == 1
+    assert response.get_json()["stats subscriber"]["issues_per_paper"] == [
+        {"paper_id": paper.paper_id, "number_of_issues": 1}]
+    response = client.get("/subscriber/1")
+    assert response.get_json()["subscriber"]["delivered_issues"] == [1]
+
+def test_missing_issues_pagination_and_count(client, agency):
+    paper = list(agency.newspapers)[0]
+    subscriber = Subscriber(1, "John Doe", "1234 Elm Street")
+    agency.add_subscriber(subscriber)
+    subscriber.subscribe_to_newspaper(paper)
+    for issue_id in range(1, 6):
+        paper.add_issue(Issue("2022-01-01", 10, 1, issue_id, released=True))
+    client.post(f"/newspaper/{paper.paper_id}/issue/1/deliver/1")
+
+    response = client.get("/subscriber/1/missingissues?offset=1&limit=2")
+    assert response.status_code == 200
+    parsed = response.get_json()
+    assert parsed["count"] == 4
+    assert [issue["issue_id"] for issue in parsed["missing_issues"]] == [3, 4]
+
+    response = client.get("/subscriber/1/missingissues?count_only=true")
+    assert response.get_json() == {"count": 4}
+
+def test_list_subscribers_of_newspaper(client, agency):
+    paper = list(agency.newspapers)[0]
+    for subscriber_id in range(1, 5):
+        subscriber = Subscriber(subscriber_id, "John Doe", "1234 Elm Street")
+        agency.add_subscriber(subscriber)
+        if subscriber_id % 2:
+            subscriber.subscribe_to_newspaper(paper)
+
+    response = client.get(f"/subscriber/?paper_id={paper.paper_id}")
+    assert response.status_code == 200
+    assert [subscriber["subscriber_id"] for subscriber in response.get_json()["subscribers"]] == [1, 3]
+
+    response = client.get("/subscriber/?paper_id=9999")
+    assert response.status_code == 404
+
+def test_get_subscriber_projection(client, agency):
+    paper = list(agency.newspapers)[0]
+    subscriber = Subscriber(1, "John Doe", "1234 Elm Street")
+    agency.add_subscriber(subscriber)
+    subscriber.subscribe_to_newspaper(paper)
+
+    parsed = client.get("/subscriber/1").get_json()["subscriber"]
+    assert parsed["newspapers"] == [paper.paper_id]
+
+    parsed = client.get("/subscriber/1?fields=name,newspapers").get_json()["subscriber"]
+    assert parsed == {"name": "John Doe", "newspapers": [paper.paper_id]}
+
+    parsed = client.get("/subscriber/1?depth=1").get_json()["subscriber"]
+    assert parsed["newspapers"][0]["name"] == paper.name
+
+    response = client.get("/subscriber/1?fields=password")
+    assert response.status_code == 400
+
+def test_conditional_get_subscriber_stats(client, agency):
+    paper = list(agency.newspapers)[0]
+    subscriber = Subscriber(1, "John Doe", "1234 Elm Street")
+    agency.add_subscriber(subscriber)
+    subscriber.subscribe_to_newspaper(paper)
+
+    etag = client.get("/subscriber/1/stats").headers["ETag"]
+    assert client.get("/subscriber/1/stats", headers={"If-None-Match": etag}).status_code == 304
+
+    # a price change of a subscribed paper changes the monthly cost
+    paper.update(price=99.0)
+    response = client.get("/subscriber/1/stats", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json()["stats subscriber"]["monthly_cost"] == 99.0
+
+    etag = client.get("/subscriber/1").headers["ETag"]
+    assert client.get("/subscriber/1", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/subscriber/9999", headers={"If-None-Match": etag}).status_code == 404
+
+def test_removed_issues_leave_subscriber_reads(client, agency):
+    paper, other_paper = list(agency.newspapers)[:2]
+    subscriber = Subscriber(1, "John Doe", "1234 Elm Street")
+    agency.add_subscriber(subscriber)
+    for issue_id, newspaper in ((1, paper), (2, other_paper)):
+        issue = Issue("2022-01-01", 10, None, issue_id, released=True)
+        agency.add_newspaper_issue(newspaper, issue)
+        agency.deliver_issue(newspaper, issue, subscriber)
+
+    response = client.get("/subscriber/1")
+    etag = response.headers["ETag"]
+    assert sorted(response.get_json()["subscriber"]["delivered_issues"]) == [1, 2]
+
+    agency.remove_newspaper_issue(paper, agency.get_issue(1))
+    response = client.get("/subscriber/1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json()["subscriber"]["delivered_issues"] == [2]
+
+    # the subscriber never subscribed, so only the deliveries tie it to the paper
+    etag = response.headers["ETag"]
+    client.delete(f"/newspaper/{other_paper.paper_id}")
+    response = client.get("/subscriber/1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json()["subscriber"]["delivered_issues"] == []
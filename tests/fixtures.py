@@ -6,9 +6,15 @@ from ..src.model.agency import Agency
 from .testdata import populate
 
 
-@pytest.fixture()
-def app():
-    yield create_app()
+@pytest.fixture(params=['memory', 'sqlite'])
+def app(request, tmp_path):
+    # every test starts from an empty agency, once for each storage backend
+    Agency.singleton_instance = None
+    if request.param == 'memory':
+        yield create_app()
+        return
+    yield create_app(database=str(tmp_path / 'agency.db'))
+    Agency.singleton_instance.repository.close()
 
 
 @pytest.fixture()
@@ -26,7 +32,7 @@ def agency(app):
 def newspaper(app):
     agency = Agency.get_instance()
     populate(agency)
-    yield agency.newspapers[0]
+    yield list(agency.newspapers)[0]
 
 @pytest.fixture()
 def subscription(app):
@@ -38,4 +44,4 @@ def subscription(app):
 def editor(app):
     agency = Agency.get_instance()
     populate(agency)
-    yield agency.editors[0]
\ No newline at end of file
+    yield list(agency.editors)[0]
\ No newline at end of file
@@ -1,9 +1,14 @@
+import threading
+from datetime import date
+
 import pytest
 
 from ...src.model.newspaper import Newspaper
 from ...src.model.editor import Editor
 from ...src.model.issue import Issue
 from ...src.model.subscriber import Subscriber
+from ...src.model import agency as agency_module
+from ...src.model.agency import Agency, NotRegistered
 
 
 from ..fixtures import app, client, agency
@@ -151,4 +156,237 @@ def test_get_all_subscribers(agency):
                           name="John Doe",
                           address="123 Elm St")
     agency.add_subscriber(new_subscriber)
-    assert len(agency.all_subscribers()) == 1
\ No newline at end of file
+    assert len(agency.all_subscribers()) == 1
+
+def test_add_editor_same_id_should_raise_error(agency):
+    agency.add_editor(Editor(editor_id=999, name="John Doe", address="123 Elm St"))
+    with pytest.raises(ValueError, match='An editor with ID 999 already exists'):
+        agency.add_editor(Editor(editor_id=999, name="Jane Doe", address="456 Oak St"))
+
+def test_remove_newspaper_keeps_other_newspapers(agency):
+    before = len(agency.newspapers)
+    paper = agency.get_newspaper(101)
+    agency.remove_newspaper(paper)
+    assert len(agency.newspapers) == before - 1
+    assert agency.get_newspaper(101) is None
+    assert agency.get_newspaper(100) is not None
+
+def test_get_instance_creates_one_agency():
+    previous, Agency.singleton_instance = Agency.singleton_instance, None
+    try:
+        start = threading.Barrier(8)
+        instances = []
+
+        def get():
+            start.wait()
+            instances.append(Agency.get_instance())
+
+        threads = [threading.Thread(target=get) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len({id(instance) for instance in instances}) == 1
+    finally:
+        Agency.singleton_instance = previous
+
+def test_mutation_of_removed_entity_is_rejected(agency):
+    paper = agency.get_newspaper(100)
+    subscriber = Subscriber(subscriber_id=999, name="John Doe", address="123 Elm St")
+    agency.add_subscriber(subscriber)
+    agency.remove_newspaper(paper)
+    with pytest.raises(NotRegistered, match='Newspaper is not registered'):
+        agency.subscribe(subscriber, paper)
+    assert subscriber.calculate_subscriptions() == 0
+
+def test_concurrent_subscribe_and_remove(agency):
+    paper = Newspaper(paper_id=999, name="Simpsons Comic", frequency=7, price=3.14)
+    agency.add_newspaper(paper)
+    subscribers = [Subscriber(subscriber_id=1000 + n, name="John Doe", address="123 Elm St") for n in range(200)]
+    for subscriber in subscribers:
+        agency.add_subscriber(subscriber)
+
+    def subscribe(chunk):
+        for subscriber in chunk:
+            try:
+                agency.subscribe(subscriber, paper)
+            except NotRegistered:
+                pass
+
+    threads = [threading.Thread(target=subscribe, args=(subscribers[n::4],)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    agency.remove_newspaper(paper)
+    for thread in threads:
+        thread.join()
+    # every subscription either happened before the removal or was rejected after it
+    subscribed = [subscriber for subscriber in subscribers if paper in subscriber.newspapers]
+    assert sorted(paper.subscriber_ids()) == sorted(subscriber.subscriber_id for subscriber in subscribed)
+    assert all(not agency.deliveries.missing_count(subscriber.subscriber_id) for subscriber in subscribers)
+
+def test_remove_editor_reassigns_issues(agency):
+    paper, other_paper = agency.get_newspaper(100), agency.get_newspaper(101)
+    leaving, staying = Editor(1, "Jane", "Main St"), Editor(2, "Joe", "Main St")
+    agency.add_editor(leaving)
+    agency.add_editor(staying)
+    for issue_id in (10, 11):
+        agency.add_newspaper_issue(paper, Issue("2024-01-01", 12, None, issue_id))
+        agency.set_editor_to_issue(leaving, agency.get_issue(issue_id), paper)
+    agency.set_editor_to_issue(staying, agency.get_issue(10), paper)
+    agency.set_editor_to_issue(leaving, agency.get_issue(10), paper)
+    agency.add_newspaper_issue(other_paper, Issue("2024-01-01", 12, None, 12))
+    agency.set_editor_to_issue(leaving, agency.get_issue(12), other_paper)
+    assert sorted(agency.get_editor_issues_ids(leaving)) == [10, 11, 12]
+    assert agency.get_any_other_editor_same_newspaper(leaving, paper) is staying
+
+    assert agency.remove_editor(leaving) == 2
+    assert sorted(agency.get_editor_issues_ids(staying)) == [10, 11]
+    # nobody else works for the other paper
+    assert agency.get_issue(12).editor_id is None
+    assert list(paper.editors) == [staying]
+
+
+def test_change_editor_id_moves_issues(agency):
+    paper = agency.get_newspaper(100)
+    editor = Editor(1, "Jane", "Main St")
+    agency.add_editor(editor)
+    agency.add_newspaper_issue(paper, Issue("2024-01-01", 12, None, 10))
+    agency.set_editor_to_issue(editor, agency.get_issue(10), paper)
+
+    agency.change_editor_id(editor, 5)
+    assert agency.get_editor_issues_ids(editor) == [10]
+    assert agency.get_issue(10).editor_id == 5
+    assert list(agency.issues.of_editor(1)) == []
+
+
+def subscribed_paper(agency):
+    paper = agency.get_newspaper(100)
+    editor = Editor(1, "Jane", "Main St")
+    agency.add_editor(editor)
+    agency.add_newspaper_issue(paper, Issue("2024-01-01", 12, None, 10, released=True))
+    agency.set_editor_to_issue(editor, agency.get_issue(10), paper)
+    for subscriber_id in range(5):
+        subscriber = Subscriber(subscriber_id, "Reader", "Elm St")
+        agency.add_subscriber(subscriber)
+        agency.subscribe(subscriber, paper)
+        agency.subscribe(subscriber, agency.get_newspaper(101))
+        agency.deliver_issue(paper, agency.get_issue(10), subscriber)
+    return paper, editor
+
+
+def test_remove_newspaper_cascades(agency):
+    paper, editor = subscribed_paper(agency)
+    agency.remove_newspaper(paper)
+
+    subscriber = agency.get_subscriber(0)
+    assert [other.paper_id for other in subscriber.newspapers] == [101]
+    assert subscriber.calculate_monthly_cost() == agency.get_newspaper(101).price
+    assert subscriber.delivered_issues == frozenset()
+    assert subscriber.calculate_issues_per_paper() == {}
+    assert list(editor.newspapers) == []
+    assert agency.get_editor_issues_ids(editor) == []
+    assert agency.get_issue(10) is None
+
+
+def test_remove_subscriber_cascades(agency):
+    paper, _ = subscribed_paper(agency)
+    agency.remove_subscriber(agency.get_subscriber(0))
+
+    assert sorted(paper.subscribers.ids()) == [1, 2, 3, 4]
+    assert agency.get_newspaper(101).calculate_subscribers() == 4
+    assert sorted(agency.get_issue(10).subscribers) == [1, 2, 3, 4]
+
+
+def test_remove_newspaper_in_background(agency, monkeypatch):
+    monkeypatch.setattr(agency_module, 'CASCADE_BATCH_SIZE', 2)
+    paper, editor = subscribed_paper(agency)
+    job = agency.remove_newspaper_in_background(paper)
+    agency.jobs.wait()
+
+    assert job.status == 'done', job.error
+    assert job.result == {"removed": True}
+    assert job.done == job.total == 6
+    assert agency.get_newspaper(100) is None
+    assert [other.paper_id for other in agency.get_subscriber(0).newspapers] == [101]
+    assert list(editor.newspapers) == []
+
+
+def test_remove_subscriber_in_background(agency):
+    paper, _ = subscribed_paper(agency)
+    job = agency.remove_subscriber_in_background(agency.get_subscriber(0))
+    agency.jobs.wait()
+
+    assert job.status == 'done', job.error
+    assert job.done == 2
+    assert agency.get_subscriber(0) is None
+    assert sorted(paper.subscribers.ids()) == [1, 2, 3, 4]
+
+
+def sequential_ids(start=5000):
+    next_id = [start]
+    def allocate(count):
+        next_id[0] += count
+        return list(range(next_id[0] - count, next_id[0]))
+    return allocate
+
+
+def test_add_issue_calendar(agency):
+    paper = Newspaper(paper_id=900, name="Weekly", frequency=7, price=1.0)
+    agency.add_newspaper(paper)
+    agency.add_newspaper_issue(paper, Issue("2024-01-08", 10, None, 4999))
+    editor = Editor(7, "Jane", "Main St")
+    agency.add_editor(editor)
+
+    summary = agency.add_issue_calendar(paper, date(2024, 1, 1), date(2024, 1, 31), sequential_ids(), 24, editor)
+
+    assert summary == {"paper_id": 900, "created": 4, "skipped": 1,
+                       "first_release_date": "2024-01-01", "last_release_date": "2024-01-29"}
+    assert sorted(issue.release_date for issue in paper.issues) == \
+        ["2024-01-01", "2024-01-08", "2024-01-15", "2024-01-22", "2024-01-29"]
+    assert agency.get_issue(5000).page == 24
+    assert sorted(issue.issue_id for issue in agency.get_editor_issues(editor)) == [5000, 5001, 5002, 5003]
+    assert paper in list(editor.newspapers)
+
+    again = agency.add_issue_calendar(paper, date(2024, 1, 1), date(2024, 1, 31), sequential_ids(6000))
+    assert again["created"] == 0
+    assert again["skipped"] == 5
+    assert len(paper.issues) == 5
+
+
+def test_add_issue_calendar_rejects_bad_ranges(agency):
+    paper = agency.get_newspaper(101)
+    with pytest.raises(ValueError):
+        agency.add_issue_calendar(paper, date(2024, 2, 1), date(2024, 1, 1), sequential_ids())
+    with pytest.raises(ValueError):
+        agency.add_issue_calendar(paper, date(2000, 1, 1), date(2400, 1, 1), sequential_ids())
+
+
+def test_add_issue_calendars(agency):
+    before = len(agency.issues)
+    summary = agency.add_issue_calendars(date(2030, 1, 1), date(2030, 1, 1), sequential_ids())
+
+    assert summary["created"] == len(agency.newspapers)
+    assert len(summary["newspapers"]) == len(agency.newspapers)
+    assert len(agency.issues) == before + len(agency.newspapers)
+
+
+def test_fan_out_delivery_picks_targets_under_the_lock(agency):
+    paper = Newspaper(paper_id=999, name="Simpsons Comic", frequency=7, price=3.14)
+    agency.add_newspaper(paper)
+    subscribers = [Subscriber(subscriber_id=1000 + n, name="John Doe", address="123 Elm St") for n in range(11)]
+    for subscriber in subscribers:
+        agency.add_subscriber(subscriber)
+    for subscriber in subscribers[:10]:
+        agency.subscribe(subscriber, paper)
+    issue = Issue(issue_id=9990, releasedate="2021-01-01", page=1, editor=None, released=True)
+    agency.add_newspaper_issue(paper, issue)
+
+    results = []
+    thread = threading.Thread(target=lambda: results.append(agency.deliver_issue_to_subscribers(paper, issue)))
+    with agency.lock.write():
+        thread.start()
+        # the fan-out waits for the lock before it reads the subscriptions
+        thread.join(0.2)
+        agency.subscribe(subscribers[10], paper)
+    thread.join()
+    assert results[0]["targeted"] == results[0]["delivered"] == 11
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from ...src.model.analytics import Analytics, Columns, percentiles
+from ...src.model.newspaper import Newspaper
+from ...src.model.issue import Issue
+from ...src.model.subscriber import Subscriber
+
+from ..fixtures import app, client, agency
+
+
+def test_columns_recycle_rows_and_grow():
+    columns = Columns({"value": 'i8'}, capacity=2)
+    for key in range(5):
+        columns.add(key, value=key * 10)
+    columns.remove(1)
+    columns.add(7, value=70)
+    columns.increment(7, "value", 5)
+
+    assert len(columns) == 5
+    assert 1 not in columns
+    assert columns.get(7, "value") == 75
+    assert sorted(columns.column("value").tolist()) == [0, 20, 30, 40, 75]
+    positions = np.flatnonzero(columns.column("value") == 75)
+    assert columns.keys(positions) == [7]
+
+
+def test_percentiles_of_nothing():
+    assert percentiles(np.zeros(0)) == {"p50": 0.0, "p90": 0.0, "p99": 0.0}
+
+
+def rebuilt(agency) -> Analytics:
+    analytics = Analytics()
+    analytics.ensure_built(agency)
+    return analytics
+
+
+def test_summary_follows_the_agency(agency):
+    analytics = agency.get_analytics()
+    paper = Newspaper(paper_id=999, name="Simpsons Comic", frequency=7, price=3.0)
+    agency.add_newspaper(paper)
+    subscriber = Subscriber(998, "Homer", "Evergreen Terrace")
+    agency.add_subscriber(subscriber)
+    agency.subscribe(subscriber, paper)
+    issue = Issue("2024-01-01", 12, None, 997)
+    agency.add_newspaper_issue(paper, issue)
+    agency.release_issue(paper, issue)
+    agency.deliver_issue(paper, issue, subscriber)
+    agency.update_newspaper(paper, price=5.0)
+
+    summary = analytics.summary()
+    assert summary == rebuilt(agency).summary()
+    assert summary["newspapers"] == len(agency.all_newspapers())
+    assert summary["subscribers"] == len(agency.subscriber)
+    assert summary["monthly_revenue"] == pytest.approx(sum(p.calculate_monthly_revenue() for p in agency.all_newspapers()))
+    assert analytics.papers.get(999, "deliveries") == 1
+    # the costs follow the price when the figures are read next
+    assert agency.get_analytics().subscribers.get(998, "cost") == 5.0
+
+    agency.remove_subscriber(subscriber)
+    agency.remove_newspaper(paper)
+    assert analytics.summary() == rebuilt(agency).summary()
+    assert analytics.subscriber_summary() == rebuilt(agency).subscriber_summary()
+
+
+def test_newspaper_summary_ranks_by_revenue(agency):
+    analytics = agency.get_analytics()
+    papers = agency.all_newspapers()
+    summary = analytics.newspaper_summary(top=3)
+    expected = sorted(papers, key=lambda paper: -paper.calculate_monthly_revenue())[:3]
+    assert [row["monthly_revenue"] for row in summary["top_revenue"]] == \
+        pytest.approx([paper.calculate_monthly_revenue() for paper in expected])
+    assert analytics.newspaper_summary(top=0)["top_revenue"] == []
+
+
+def test_newspaper_groups(agency):
+    analytics = agency.get_analytics()
+    papers = agency.all_newspapers()
+    by_frequency = analytics.newspaper_groups("frequency")
+    assert sum(group["newspapers"] for group in by_frequency) == len(papers)
+    assert [group["frequency"] for group in by_frequency] == sorted({paper.frequency for paper in papers})
+
+    by_price = {group["min_price"]: group["newspapers"] for group in analytics.newspaper_groups("price", [10])}
+    assert by_price.get(None, 0) == len([paper for paper in papers if paper.price < 10])
+    assert by_price.get(10, 0) == len([paper for paper in papers if paper.price >= 10])
+    with pytest.raises(ValueError):
+        analytics.newspaper_groups("name")
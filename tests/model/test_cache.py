@@ -0,0 +1,56 @@
+import pytest
+
+from ...src.model.cache import SerializationCache
+from ...src.model.newspaper import Newspaper
+from ...src.model.issue import Issue
+from ...src.model.subscriber import Subscriber
+
+@pytest.fixture
+def cache():
+    return SerializationCache()
+
+def test_hit_until_version_changes(cache):
+    newspaper = Newspaper(paper_id=1, name="Test Newspaper", frequency=7, price=3.14)
+    first = cache.get(('paper', 1), newspaper.version, newspaper.serialize_paper_id)
+    assert cache.get(('paper', 1), newspaper.version, newspaper.serialize_paper_id) is first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    newspaper.update(price=4.0)
+    assert cache.get(('paper', 1), newspaper.version, newspaper.serialize_paper_id)["price"] == 4.0
+    assert cache.misses == 2
+
+def test_encoded(cache):
+    assert cache.get_encoded('key', 1, lambda: {"a": 1}) == b'{"a":1}'
+
+def test_lru_eviction_within_budget(cache):
+    cache = SerializationCache(budget=30)
+    for key in range(5):
+        cache.get(key, 1, lambda: {"value": "x" * 5})
+    stats = cache.stats()
+    assert stats["bytes"] <= 30
+    assert stats["entries"] == 1
+    assert stats["evictions"] == 4
+    cache.get(4, 1, lambda: None)
+    assert cache.hits == 1
+
+def test_mutations_bump_versions():
+    newspaper = Newspaper(paper_id=1, name="Test Newspaper", frequency=7, price=3.14)
+    subscriber = Subscriber(subscriber_id=1, name="John Doe", address="123 Elm St")
+    issue = Issue(issue_id=1, releasedate="2021-01-01", page=1, editor=1)
+
+    versions = (newspaper.version, subscriber.version)
+    subscriber.subscribe_to_newspaper(newspaper)
+    assert newspaper.version != versions[0] and subscriber.version != versions[1]
+
+    versions = (issue.version, subscriber.version)
+    issue.deliver_issue_id_to_subscriber(subscriber)
+    assert issue.version != versions[0] and subscriber.version != versions[1]
+
+def test_subscriber_stamp_follows_newspapers():
+    newspaper = Newspaper(paper_id=1, name="Test Newspaper", frequency=7, price=3.14)
+    subscriber = Subscriber(subscriber_id=1, name="John Doe", address="123 Elm St")
+    subscriber.subscribe_to_newspaper(newspaper)
+    shallow, deep = subscriber.stamp(), subscriber.stamp(depth=1)
+    newspaper.update(name="Renamed")
+    assert subscriber.stamp() == shallow
+    assert subscriber.stamp(depth=1) != deep
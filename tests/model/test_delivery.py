@@ -0,0 +1,44 @@
+import pytest
+
+from ...src.model.agency import Agency
+from ...src.model.delivery import deliver_to_subscribers
+from ...src.model.issue import Issue
+from ...src.model.newspaper import Newspaper
+from ...src.model.subscriber import Subscriber
+
+@pytest.fixture
+def newspaper():
+    agency = Agency()
+    newspaper = Newspaper(paper_id=1, name="Test Newspaper", frequency=7, price=3.14)
+    agency.add_newspaper(newspaper)
+    for subscriber_id in range(25):
+        subscriber = Subscriber(subscriber_id=subscriber_id, name="John Doe", address="123 Elm St")
+        agency.add_subscriber(subscriber)
+        subscriber.subscribe_to_newspaper(newspaper)
+    return newspaper
+
+def test_deliver_to_all_subscribers(newspaper):
+    issue = Issue(issue_id=10, releasedate="2021-01-01", page=1, editor=1, released=True)
+    newspaper.add_issue(issue)
+    progress = []
+    result = deliver_to_subscribers(newspaper, issue, batch_size=10,
+                                    progress=lambda done, total: progress.append((done, total)))
+    assert result["delivered"] == 25
+    assert result["batches"] == 3
+    assert progress[-1] == (3, 3)
+    assert len(issue.subscribers) == 25
+    assert all(subscriber.calculate_missing_issues() == 0 for subscriber in newspaper.subscribers)
+
+def test_deliver_only_missing(newspaper):
+    issue = Issue(issue_id=10, releasedate="2021-01-01", page=1, editor=1, released=True)
+    newspaper.add_issue(issue)
+    deliver_to_subscribers(newspaper, issue, subscriber_ids=range(5))
+    result = deliver_to_subscribers(newspaper, issue, only_missing=True)
+    assert result["targeted"] == 20
+    assert result["delivered"] == 20
+
+def test_deliver_unreleased_issue_should_raise_error(newspaper):
+    issue = Issue(issue_id=10, releasedate="2021-01-01", page=1, editor=1)
+    newspaper.add_issue(issue)
+    with pytest.raises(ValueError, match='has not been released'):
+        deliver_to_subscribers(newspaper, issue)
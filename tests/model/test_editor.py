@@ -11,7 +11,7 @@ def test_assign_issue(editor):
     newspaper = Newspaper(paper_id=1, name="Test Newspaper", frequency=7, price=3.14)
     issue = Issue(issue_id=1, releasedate="2021-01-01", page=1, editor=editor)
     editor.assign_issue(issue, newspaper)
-    assert newspaper.issues == [issue]
+    assert list(newspaper.issues) == [issue]
     assert editor.newspapers == [newspaper]
 
 def test_show_editor_issues(editor):
@@ -0,0 +1,82 @@
+import os
+import threading
+from datetime import timedelta
+
+import pytest
+
+from ...src.model.ids import EPOCH, SEQUENCE_SIZE, WORKERS, IdAllocator, id_time, id_worker
+from ...src.model.sqlite_repository import SqliteRepository
+
+
+class Clock(object):
+    def __init__(self, seconds):
+        self.now = seconds
+
+    def __call__(self):
+        return self.now
+
+
+def test_ids_are_time_ordered():
+    clock = Clock((EPOCH + timedelta(days=10)).timestamp())
+    ids = IdAllocator(worker=5, clock=clock)
+    first = ids.next_id()
+    clock.now += 1
+    second = ids.next_id()
+
+    assert first < second < 2 ** 63
+    assert id_time(first) == EPOCH + timedelta(days=10)
+    assert id_time(second) == EPOCH + timedelta(days=10, seconds=1)
+    assert id_worker(first) == id_worker(second) == 5
+
+
+def test_ids_keep_increasing_when_the_clock_goes_back():
+    clock = Clock((EPOCH + timedelta(days=1)).timestamp())
+    ids = IdAllocator(worker=0, clock=clock)
+    first = ids.next_id()
+    clock.now -= 60
+    assert ids.next_id() > first
+
+
+def test_allocate_spans_milliseconds():
+    clock = Clock((EPOCH + timedelta(days=1)).timestamp())
+    ids = IdAllocator(worker=1, clock=clock)
+    head = ids.allocate(10)
+    block = ids.allocate(3 * SEQUENCE_SIZE)
+    tail = ids.next_id()
+
+    allocated = head + block + [tail]
+    assert allocated == sorted(set(allocated))
+    assert id_time(tail) - id_time(head[0]) == timedelta(milliseconds=3)
+    assert ids.allocate(0) == []
+
+
+def test_ids_are_unique_across_threads():
+    ids = IdAllocator(worker=2)
+    allocated = []
+
+    def allocate():
+        chunk = [ids.next_id() for _ in range(2000)] + ids.allocate(5000)
+        allocated.extend(chunk)
+
+    threads = [threading.Thread(target=allocate) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(allocated)) == 8 * 7000
+
+
+def test_default_worker_follows_the_process():
+    assert IdAllocator().worker == os.getpid() % WORKERS
+    with pytest.raises(ValueError):
+        IdAllocator(worker=WORKERS)
+
+
+def test_processes_sharing_a_database_claim_their_own_worker(tmp_path):
+    first = SqliteRepository(str(tmp_path / 'agency.db'))
+    second = SqliteRepository(str(tmp_path / 'agency.db'))
+    try:
+        assert first.claim_worker() != second.claim_worker()
+    finally:
+        first.close()
+        second.close()
@@ -19,7 +19,7 @@ def test_deliver_issue_id_to_subscriber(issue):
                                 name="John Doe",
                                 address="123 Elm St")
     issue.deliver_issue_id_to_subscriber(new_subscriber)
-    assert new_subscriber in issue.subscribers
+    assert new_subscriber.subscriber_id in issue.subscribers
 
 def test_serialize(issue):
     assert issue.serialize() == {
@@ -29,4 +29,14 @@ def test_serialize(issue):
         "editor": 1,
         "released": False,
         "subscribers": []
-    }
\ No newline at end of file
+    }
+
+
+def test_redelivery_is_idempotent(issue):
+    new_subscriber = Subscriber(subscriber_id=999,
+                                name="John Doe",
+                                address="123 Elm St")
+    assert issue.deliver_issue_id_to_subscriber(new_subscriber)
+    assert not issue.deliver_issue_id_to_subscriber(new_subscriber)
+    assert list(issue.subscribers) == [999]
+    assert list(new_subscriber.delivered_issues) == [1]
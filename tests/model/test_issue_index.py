@@ -0,0 +1,45 @@
+import pytest
+
+from ...src.model.issue_index import IssueIndex
+from ...src.model.newspaper import Newspaper
+from ...src.model.issue import Issue
+
+@pytest.fixture
+def index():
+    return IssueIndex()
+
+def test_add_and_lookup(index):
+    newspaper = Newspaper(paper_id=1, name="Test Newspaper", frequency=7, price=3.14)
+    issue = Issue(issue_id=10, releasedate="2021-01-01", page=1, editor=1)
+    index.add(issue, newspaper)
+    assert index.get(10) is issue
+    assert index.lookup(10) == (newspaper, issue)
+    assert index.newspaper_of(issue) is newspaper
+
+def test_add_is_idempotent_for_same_issue(index):
+    issue = Issue(issue_id=10, releasedate="2021-01-01", page=1, editor=1)
+    index.add(issue)
+    index.add(issue)
+    assert len(index) == 1
+
+def test_add_same_id_should_raise_error(index):
+    index.add(Issue(issue_id=10, releasedate="2021-01-01", page=1, editor=1))
+    with pytest.raises(ValueError, match='An issue with ID 10 already exists'):
+        index.add(Issue(issue_id=10, releasedate="2021-01-02", page=2, editor=1))
+
+def test_newspaper_keeps_index_in_sync(index):
+    newspaper = Newspaper(paper_id=1, name="Test Newspaper", frequency=7, price=3.14)
+    newspaper.index = index
+    issue = Issue(issue_id=10, releasedate="2021-01-01", page=1, editor=1)
+    newspaper.add_issue(issue)
+    assert index.lookup(10) == (newspaper, issue)
+    newspaper.remove_issue(issue)
+    assert index.get(10) is None
+
+def test_remove_newspaper(index):
+    newspaper = Newspaper(paper_id=1, name="Test Newspaper", frequency=7, price=3.14)
+    newspaper.index = index
+    for issue_id in range(3):
+        newspaper.add_issue(Issue(issue_id=issue_id, releasedate="2021-01-01", page=1, editor=1))
+    index.remove_newspaper(newspaper)
+    assert len(index) == 0
@@ -0,0 +1,42 @@
+from ...src.model.jobs import Jobs
+
+
+def test_jobs_run_in_order_and_report_progress():
+    jobs = Jobs()
+    seen = []
+
+    def run(job):
+        job.total = 3
+        for step in range(3):
+            seen.append((job.target, step))
+            job.advance(1)
+        return {"steps": 3}
+
+    first, second = jobs.submit('count', 1, run), jobs.submit('count', 2, run)
+    jobs.wait()
+    assert [target for target, _ in seen] == [1, 1, 1, 2, 2, 2]
+    assert first.status == second.status == 'done'
+    assert first.serialize()["result"] == {"steps": 3}
+    assert jobs.get(second.job_id) is second
+
+
+def test_failed_job_keeps_its_error():
+    jobs = Jobs()
+
+    def run(job):
+        raise ValueError("Newspaper is not registered in the agency")
+
+    job = jobs.submit('remove_newspaper', 1, run)
+    jobs.wait()
+    assert job.status == 'failed'
+    assert job.error == "Newspaper is not registered in the agency"
+
+
+def test_only_recent_finished_jobs_are_kept():
+    jobs = Jobs(keep=2)
+    for target in range(4):
+        jobs.submit('noop', target, lambda job: {})
+        jobs.wait()
+    jobs.submit('noop', 4, lambda job: {})
+    jobs.wait()
+    assert [job.target for job in jobs] == [2, 3, 4]
@@ -0,0 +1,86 @@
+import pytest
+
+from ...src.model.ledger import DeliveryLedger
+
+@pytest.fixture
+def ledger():
+    return DeliveryLedger()
+
+def test_record(ledger):
+    assert ledger.record(1, 10)
+    assert ledger.delivered(1, 10)
+    assert not ledger.delivered(1, 11)
+    assert ledger.subscribers_of(1) == {10}
+    assert ledger.issues_of(10) == {1}
+
+def test_record_is_idempotent(ledger):
+    ledger.record(1, 10)
+    assert not ledger.record(1, 10)
+    assert ledger.count_for_issue(1) == 1
+    assert ledger.count_for_subscriber(10) == 1
+    assert len(ledger) == 1
+
+def test_forget_issue(ledger):
+    ledger.record(1, 10)
+    ledger.record(2, 10)
+    ledger.forget_issue(1)
+    assert ledger.issues_of(10) == {2}
+    assert ledger.subscribers_of(1) == set()
+
+def test_forget_subscriber(ledger):
+    ledger.record(1, 10)
+    ledger.record(1, 11)
+    ledger.forget_subscriber(10)
+    assert ledger.subscribers_of(1) == {11}
+    assert ledger.count_for_subscriber(10) == 0
+
+def test_owe_skips_delivered_issues(ledger):
+    ledger.record(1, 10)
+    ledger.owe(100, 1, [10, 11])
+    assert list(ledger.missing(10)) == []
+    assert list(ledger.missing(11)) == [(100, 1)]
+    assert ledger.missing_count(11) == 1
+
+def test_owe_is_idempotent(ledger):
+    ledger.owe(100, 1, [10])
+    ledger.owe(100, 1, [10])
+    assert ledger.missing_count(10) == 1
+
+def test_record_settles_missing_issue(ledger):
+    ledger.owe(100, 1, [10])
+    ledger.owe(100, 2, [10])
+    ledger.record(1, 10, 100)
+    assert list(ledger.missing(10)) == [(100, 2)]
+    assert ledger.missing_count(10) == 1
+
+def test_forgive(ledger):
+    ledger.owe(100, 1, [10])
+    ledger.owe(101, 2, [10])
+    ledger.forgive(10, 100)
+    assert list(ledger.missing(10)) == [(101, 2)]
+    assert ledger.missing_count(10) == 1
+
+def test_ids_beyond_64_bits(ledger):
+    big_id = 1 << 70
+    ledger.record(1, 10)
+    ledger.record(big_id, 10)
+    ledger.owe(big_id, 2, [10])
+    assert ledger.issues_of(10) == {1, big_id}
+    assert list(ledger.missing(10)) == [(big_id, 2)]
+    ledger.forget_issue(big_id)
+    assert ledger.issues_of(10) == {1}
+
+def test_received_by_paper(ledger):
+    ledger.record(1, 10, 100)
+    ledger.record(2, 10, 100)
+    ledger.record(3, 10, 101)
+    ledger.record(3, 10, 101)
+    ledger.record(3, 11, 101)
+    assert ledger.received_by_paper(10) == {100: 2, 101: 1}
+    ledger.forget_issue(1)
+    assert ledger.received_by_paper(10) == {100: 1, 101: 1}
+    ledger.forget_subscriber(11)
+    assert ledger.received_by_paper(11) == {}
+    ledger.forget_issue(2)
+    ledger.forget_issue(3)
+    assert ledger.received_by_paper(10) == {}
@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+
+from ...src.model.locking import ReadWriteLock
+
+
+def test_readers_share_the_lock():
+    lock = ReadWriteLock()
+    inside = threading.Barrier(3, timeout=5)
+
+    def read():
+        with lock.read():
+            inside.wait()
+
+    threads = [threading.Thread(target=read) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    # all three readers are inside at the same time, or the barrier times out
+    with lock.read():
+        inside.wait()
+    for thread in threads:
+        thread.join()
+
+
+def test_writer_excludes_readers():
+    lock = ReadWriteLock()
+    events = []
+    lock.acquire_write()
+
+    def read():
+        with lock.read():
+            events.append("read")
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    reader.join(0.1)
+    events.append("written")
+    lock.release_write()
+    reader.join(5)
+    assert events == ["written", "read"]
+
+
+def test_waiting_writer_goes_before_new_readers():
+    lock = ReadWriteLock()
+    events = []
+    lock.acquire_read()
+
+    def write():
+        with lock.write():
+            events.append("write")
+
+    def read():
+        with lock.read():
+            events.append("read")
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    while not lock._waiting_writers:
+        pass
+    reader = threading.Thread(target=read)
+    reader.start()
+    reader.join(0.1)
+    lock.release_read()
+    writer.join(5)
+    reader.join(5)
+    assert events == ["write", "read"]
+
+
+def test_reentrancy():
+    lock = ReadWriteLock()
+    with lock.write():
+        with lock.write():
+            with lock.read():
+                assert lock.writing()
+        assert lock.writing()
+    assert not lock.writing()
+    with lock.read():
+        with lock.read():
+            pass
+        with pytest.raises(RuntimeError, match='cannot be upgraded'):
+            lock.acquire_write()
+    # released completely
+    with lock.write():
+        pass
@@ -51,7 +51,7 @@ def test_deliver_issue_id_to_subscriber(newspaper):
                       editor=1)
     newspaper.add_issue(new_issue)
     newspaper.deliver_issue_id_to_subscriber(new_issue, new_subscriber)
-    assert new_subscriber in new_issue.subscribers
+    assert new_subscriber.subscriber_id in new_issue.subscribers
 
 def test_calculate_subscribers(newspaper):
     new_subscriber = Subscriber(subscriber_id=999,
@@ -84,4 +84,14 @@ def test_serialize(newspaper):
         "price": 3.14,
         "issues": [999],
         "subscribers": [999]
-    }
\ No newline at end of file
+    }
+
+
+def test_serialize_projection(newspaper):
+    new_issue = Issue(issue_id=999,
+                      releasedate="2021-01-01",
+                      page=1,
+                      editor=1)
+    newspaper.add_issue(new_issue)
+    assert newspaper.serialize(fields={"paper_id", "issues"}) == {"paper_id": 1, "issues": [999]}
+    assert newspaper.serialize(depth=1)["issues"] == [new_issue.serialize()]
@@ -0,0 +1,65 @@
+import pytest
+
+from ...src.model.registry import Registry
+from ...src.model.newspaper import Newspaper
+
+@pytest.fixture
+def registry():
+    return Registry(lambda paper: paper.paper_id, 'newspaper')
+
+def test_add_and_get(registry):
+    paper = Newspaper(paper_id=1, name="Test Newspaper", frequency=7, price=3.14)
+    registry.add(paper)
+    assert registry.get(1) is paper
+    assert paper in registry
+    assert len(registry) == 1
+
+def test_add_same_id_should_raise_error(registry):
+    registry.add(Newspaper(paper_id=1, name="Test Newspaper", frequency=7, price=3.14))
+    with pytest.raises(ValueError, match='A newspaper with ID 1 already exists'):
+        registry.add(Newspaper(paper_id=1, name="Other Newspaper", frequency=1, price=1.0))
+
+def test_remove_keeps_other_entries(registry):
+    papers = [Newspaper(paper_id=i, name=f"Paper {i}", frequency=1, price=1.0) for i in range(5)]
+    for paper in papers:
+        registry.add(paper)
+    registry.remove(papers[2])
+    assert registry.get(2) is None
+    assert [paper.paper_id for paper in registry] == [0, 1, 3, 4]
+
+def test_rekey(registry):
+    paper = Newspaper(paper_id=1, name="Test Newspaper", frequency=7, price=3.14)
+    registry.add(paper)
+    paper.paper_id = 2
+    registry.rekey(paper, 1)
+    assert registry.get(1) is None
+    assert registry.get(2) is paper
+
+def test_page(registry):
+    for i in range(10):
+        registry.add(Newspaper(paper_id=i, name=f"Paper {i}", frequency=1, price=1.0))
+    first, cursor = registry.page(limit=4)
+    assert [paper.paper_id for paper in first] == [0, 1, 2, 3]
+    second, cursor = registry.page(cursor, limit=4)
+    assert [paper.paper_id for paper in second] == [4, 5, 6, 7]
+    last, cursor = registry.page(cursor, limit=4)
+    assert [paper.paper_id for paper in last] == [8, 9]
+    assert cursor is None
+
+def test_page_is_stable_under_removal(registry):
+    papers = [Newspaper(paper_id=i, name=f"Paper {i}", frequency=1, price=1.0) for i in range(100)]
+    for paper in papers:
+        registry.add(paper)
+    first, cursor = registry.page(limit=3)
+    for paper in papers[:90]:
+        registry.remove(paper)
+    rest, _ = registry.page(cursor)
+    assert [paper.paper_id for paper in rest] == list(range(90, 100))
+
+def test_page_with_filter(registry):
+    for i in range(10):
+        registry.add(Newspaper(paper_id=i, name=f"Paper {i}", frequency=1, price=1.0))
+    page, cursor = registry.page(limit=2, where=lambda paper: paper.paper_id % 3 == 0)
+    assert [paper.paper_id for paper in page] == [0, 3]
+    page, cursor = registry.page(cursor, limit=2, where=lambda paper: paper.paper_id % 3 == 0)
+    assert [paper.paper_id for paper in page] == [6, 9]
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from ...src.model.issue import Issue
+from ...src.model.subscriber import Subscriber
+from ...src.model.scheduler import ReleaseScheduler, due_time
+
+from ..fixtures import app, client, agency
+
+
+def in_seconds(seconds: float) -> str:
+    return (datetime.now(timezone.utc) + timedelta(seconds=seconds)).isoformat()
+
+
+@pytest.fixture
+def scheduled(agency):
+    paper = agency.get_newspaper(100)
+    subscriber = Subscriber(1, "Reader", "Elm St")
+    agency.add_subscriber(subscriber)
+    agency.subscribe(subscriber, paper)
+    agency.add_newspaper_issue(paper, Issue("2024-01-02", 12, None, 11))
+    agency.add_newspaper_issue(paper, Issue("2024-01-01", 12, None, 10))
+    agency.add_newspaper_issue(paper, Issue(in_seconds(3600), 12, None, 12))
+    agency.add_newspaper_issue(paper, Issue(None, 12, None, 13))
+    yield paper, subscriber
+    if agency.scheduler is not None:
+        agency.scheduler.stop()
+
+
+def test_due_time():
+    assert due_time("2024-01-01") == datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+    assert due_time("2024-01-01T06:00:00+02:00") == datetime(2024, 1, 1, 4, tzinfo=timezone.utc).timestamp()
+    assert due_time("tomorrow") is None
+    assert due_time(None) is None
+
+
+def test_overdue_issues_are_caught_up(agency, scheduled):
+    paper, subscriber = scheduled
+    scheduler = ReleaseScheduler(agency, workers=1, deliver=True).start()
+    assert scheduler.wait_idle(timeout=5)
+
+    assert scheduler.caught_up == 2
+    assert agency.get_issue(10).released and agency.get_issue(11).released
+    assert not agency.get_issue(12).released and not agency.get_issue(13).released
+    assert sorted(subscriber.delivered_issues) == [10, 11]
+    assert scheduler.status()["released"] == 2
+    assert scheduler.status()["delivered"] == 2
+    assert [release["issue_id"] for release in scheduler.pending()] == [12]
+
+
+def test_issue_is_released_when_due(agency, scheduled):
+    paper, _ = scheduled
+    scheduler = ReleaseScheduler(agency).start()
+    assert scheduler.wait_idle(timeout=5)
+    agency.add_newspaper_issue(paper, Issue(in_seconds(0.2), 12, None, 14))
+    assert [release["issue_id"] for release in scheduler.pending()] == [14, 12]
+    assert not agency.get_issue(14).released
+
+    # the scheduler wakes up by itself when the issue is due
+    deadline = datetime.now() + timedelta(seconds=5)
+    while not agency.get_issue(14).released and datetime.now() < deadline:
+        scheduler.wait_idle(timeout=0.1)
+    assert agency.get_issue(14).released
+    # released without delivery
+    assert agency.get_issue(14).subscribers == frozenset()
+
+
+def test_manual_release_and_removal_cancel_the_schedule(agency, scheduled):
+    paper, _ = scheduled
+    scheduler = ReleaseScheduler(agency).start()
+    assert scheduler.wait_idle(timeout=5)
+    assert len(scheduler) == 1
+
+    agency.release_issue(paper, agency.get_issue(12))
+    assert len(scheduler) == 0
+    agency.add_newspaper_issue(paper, Issue(in_seconds(3600), 12, None, 15))
+    assert len(scheduler) == 1
+    agency.remove_newspaper(paper)
+    assert scheduler.pending() == []
+    assert scheduler.status()["failed"] == 0
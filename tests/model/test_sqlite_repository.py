@@ -0,0 +1,219 @@
+import gc
+import threading
+
+import pytest
+
+from ...src.model.agency import Agency, NotRegistered
+from ...src.model.editor import Editor
+from ...src.model.issue import Issue
+from ...src.model.newspaper import Newspaper
+from ...src.model.sqlite_repository import SqliteRepository
+from ...src.model.subscriber import Subscriber
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'agency.db')
+
+
+def fill(agency):
+    paper = Newspaper(paper_id=1, name="Daily", frequency=1, price=2.5)
+    agency.add_newspaper(paper)
+    agency.add_newspaper_issue(paper, Issue("2024-01-01", 12, 0, 10))
+    agency.add_newspaper_issue(paper, Issue("2024-01-02", 16, 0, 11))
+    agency.add_editor(Editor(7, "Jane", "Main St"))
+    agency.set_editor_to_issue(agency.get_editor(7), agency.get_issue(10), paper)
+    for subscriber_id in range(3):
+        agency.add_subscriber(Subscriber(subscriber_id, f"Reader {subscriber_id}", "Elm St"))
+        agency.subscribe(agency.get_subscriber(subscriber_id), paper)
+    agency.release_issue(paper, agency.get_issue(11))
+    agency.release_issue(paper, agency.get_issue(10))
+    agency.deliver_issue(paper, agency.get_issue(10), agency.get_subscriber(0))
+
+
+def test_state_survives_reopening(path):
+    agency = Agency(SqliteRepository(path))
+    fill(agency)
+    paper_version = agency.get_newspaper(1).version
+    agency.repository.close()
+
+    agency = Agency(SqliteRepository(path))
+    paper = agency.get_newspaper(1)
+    assert paper.name == "Daily"
+    assert paper.version == paper_version
+    assert list(paper.issues.ids()) == [10, 11]
+    assert paper.subscriber_ids() == [0, 1, 2]
+    assert agency.get_issue(10).editor_id == 7
+    assert [p.paper_id for p in agency.get_editor(7).newspapers] == [1]
+    assert agency.get_subscriber(0).delivered_issues == {10}
+    # missing issues are listed in release order
+    assert agency.get_subscriber(1).missing_issues() == [{"issue_id": 11, "paper_id": 1},
+                                                        {"issue_id": 10, "paper_id": 1}]
+    assert agency.get_subscriber(0).calculate_missing_issues() == 1
+    assert agency.get_subscriber(0).calculate_issues_per_paper() == {1: 1}
+    assert agency.get_subscriber(0).calculate_monthly_cost() == 2.5
+    agency.update_newspaper(paper, price=0.1)
+    agency.repository.close()
+
+    agency = Agency(SqliteRepository(path))
+    assert agency.get_subscriber(2).calculate_monthly_cost() == 0.1
+    agency.repository.close()
+
+
+def test_identity_map(path):
+    agency = Agency(SqliteRepository(path))
+    agency.add_subscriber(Subscriber(1, "Reader", "Elm St"))
+    subscriber = agency.get_subscriber(1)
+    assert agency.get_subscriber(1) is subscriber
+    assert subscriber in agency.subscriber
+
+    del subscriber
+    gc.collect()
+    assert 1 not in agency.repository.identity('subscriber')
+    assert agency.get_subscriber(1).name == "Reader"
+    agency.repository.close()
+
+
+def test_changes_are_written_back(path):
+    agency = Agency(SqliteRepository(path))
+    fill(agency)
+    agency.update_subscriber(agency.get_subscriber(2), name="Renamed")
+    agency.change_editor_id(agency.get_editor(7), 8)
+    agency.unsubscribe(agency.get_subscriber(1), agency.get_newspaper(1))
+    agency.repository.close()
+
+    agency = Agency(SqliteRepository(path))
+    assert agency.get_subscriber(2).name == "Renamed"
+    assert agency.get_editor(7) is None
+    assert [p.paper_id for p in agency.get_editor(8).newspapers] == [1]
+    assert agency.get_subscriber(1).calculate_subscriptions() == 0
+    assert agency.get_subscriber(1).calculate_missing_issues() == 0
+    agency.repository.close()
+
+
+def test_duplicates_and_large_ids(path):
+    agency = Agency(SqliteRepository(path))
+    big_id = (1 << 64) - 5
+    agency.add_newspaper(Newspaper(paper_id=big_id, name="Daily", frequency=1, price=2.5))
+    with pytest.raises(ValueError, match="already exists"):
+        agency.add_newspaper(Newspaper(paper_id=big_id, name="Other", frequency=1, price=1.0))
+    assert list(agency.newspapers.ids()) == [big_id]
+    assert agency.get_newspaper(big_id).name == "Daily"
+    agency.repository.close()
+
+
+def test_failed_transaction_is_rolled_back(path):
+    agency = Agency(SqliteRepository(path))
+    with pytest.raises(ValueError):
+        with agency.batch():
+            agency.add_editor(Editor(1, "Jane", "Main St"))
+            agency.add_editor(Editor(1, "Joe", "Main St"))
+    assert len(agency.editors) == 0
+    assert agency.get_editor(1) is None
+    agency.repository.close()
+
+
+def test_pages(path):
+    agency = Agency(SqliteRepository(path))
+    with agency.batch():
+        for subscriber_id in range(25):
+            agency.add_subscriber(Subscriber(subscriber_id, "Reader", "Elm St"))
+    page, cursor = agency.subscriber.page(limit=10)
+    assert [s.subscriber_id for s in page] == list(range(10))
+    page, cursor = agency.subscriber.page(cursor, 10, where=lambda s: s.subscriber_id % 2 == 0)
+    assert [s.subscriber_id for s in page] == [10, 12, 14, 16, 18, 20, 22, 24]
+    assert cursor is None
+    agency.repository.close()
+
+
+def test_concurrent_writers(path):
+    agency = Agency(SqliteRepository(path, pool_size=4))
+    paper = Newspaper(paper_id=1, name="Daily", frequency=1, price=2.5)
+    agency.add_newspaper(paper)
+
+    def subscribe(start):
+        for subscriber_id in range(start, start + 50):
+            subscriber = Subscriber(subscriber_id, "Reader", "Elm St")
+            agency.add_subscriber(subscriber)
+            agency.subscribe(subscriber, paper)
+
+    threads = [threading.Thread(target=subscribe, args=(start,)) for start in range(0, 400, 50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(agency.subscriber) == 400
+    assert paper.calculate_subscribers() == 400
+    agency.repository.close()
+
+
+def test_changes_of_another_process(path):
+    # two repositories on one file stand in for two server processes
+    first = Agency(SqliteRepository(path))
+    fill(first)
+    second = Agency(SqliteRepository(path))
+    paper = second.get_newspaper(1)
+    subscriber = second.get_subscriber(1)
+    assert not second.repository.stale()
+
+    first.update_newspaper(first.get_newspaper(1), name="Renamed")
+    first.remove_subscriber(first.get_subscriber(1))
+    assert second.repository.stale()
+    second.sync()
+    assert not second.repository.stale()
+    # the objects held by the second process are updated in place
+    assert paper.name == "Renamed"
+    assert paper.version == first.get_newspaper(1).version
+    assert second.get_subscriber(1) is None
+    with pytest.raises(NotRegistered):
+        second.update_subscriber(subscriber, name="Gone")
+
+    # a write notices the other process' changes even without a sync
+    first.update_newspaper(first.get_newspaper(1), price=3.0)
+    second.update_newspaper(paper, frequency=7)
+    assert (paper.price, paper.frequency) == (3.0, 7)
+    first.repository.close()
+    second.repository.close()
+
+
+def test_only_changed_objects_are_reloaded(path):
+    first = Agency(SqliteRepository(path))
+    fill(first)
+    second = Agency(SqliteRepository(path))
+    held = [second.get_subscriber(subscriber_id) for subscriber_id in range(3)] + [second.get_newspaper(1)]
+    reloads = []
+    for connection in second.repository.pool._connections:
+        connection.set_trace_callback(lambda sql: reloads.append(sql) if sql.startswith('SELECT s.') else None)
+
+    first.update_subscriber(first.get_subscriber(1), name="Renamed")
+    second.sync()
+    assert held[1].name == "Renamed"
+    assert held[0].name == "Reader 0"
+    # only the changed subscriber is read again, not every object the process holds
+    assert len(reloads) == 1
+
+    # a process that fell behind further than the log reaches checks everything it holds
+    first.update_subscriber(first.get_subscriber(2), name="Pruned")
+    first.repository.write('DELETE FROM changes')
+    second.sync()
+    assert held[2].name == "Pruned"
+    first.repository.close()
+    second.repository.close()
+
+
+def test_jobs_of_another_process(path):
+    first = Agency(SqliteRepository(path))
+    fill(first)
+    second = Agency(SqliteRepository(path))
+
+    job = first.remove_newspaper_in_background(first.get_newspaper(1))
+    first.jobs.wait()
+    # the other process reports on the job, from the state the first one stored
+    seen = second.jobs.get(job.job_id)
+    assert seen.serialize() == job.serialize()
+    assert seen.status == 'done'
+    assert seen.result == {"removed": True}
+    assert [other.job_id for other in second.jobs] == [job.job_id]
+    assert second.jobs.get(job.job_id + 1) is None
+    first.repository.close()
+    second.repository.close()
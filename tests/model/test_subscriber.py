@@ -2,6 +2,8 @@ import pytest
 
 from ...src.model.subscriber import Subscriber
 from ...src.model.newspaper import Newspaper
+from ...src.model.issue import Issue
+from ...src.model.agency import Agency
 
 @pytest.fixture
 def subscriber():
@@ -24,4 +26,77 @@ def test_serialize(subscriber):
         "address": "123 Elm St",
         "newspapers": [],
         "delivered_issues": []
-    }
\ No newline at end of file
+    }
+
+def test_missing_issues_follow_releases_and_deliveries(subscriber):
+    agency = Agency()
+    newspaper = Newspaper(paper_id=1, name="Test Newspaper", frequency=7, price=3.14)
+    agency.add_newspaper(newspaper)
+    agency.add_subscriber(subscriber)
+    subscriber.subscribe_to_newspaper(newspaper)
+
+    issue = Issue(issue_id=10, releasedate="2021-01-01", page=1, editor=1)
+    newspaper.add_issue(issue)
+    assert subscriber.calculate_missing_issues() == 0
+
+    newspaper.release_issue(issue)
+    assert subscriber.missing_issues() == [{"issue_id": 10, "paper_id": 1}]
+
+    newspaper.deliver_issue_id_to_subscriber(issue, subscriber)
+    assert subscriber.calculate_missing_issues() == 0
+
+def test_unsubscribe_drops_missing_issues(subscriber):
+    agency = Agency()
+    newspaper = Newspaper(paper_id=1, name="Test Newspaper", frequency=7, price=3.14)
+    agency.add_newspaper(newspaper)
+    agency.add_subscriber(subscriber)
+    newspaper.add_issue(Issue(issue_id=10, releasedate="2021-01-01", page=1, editor=1, released=True))
+
+    subscriber.subscribe_to_newspaper(newspaper)
+    assert subscriber.calculate_missing_issues() == 1
+
+    subscriber.unsubscribe_from_newspaper(newspaper)
+    assert subscriber.newspapers == []
+    assert subscriber.calculate_missing_issues() == 0
+
+def test_serialize_projection(subscriber):
+    newspaper = Newspaper(paper_id=1, name="Test Newspaper", frequency=7, price=3.14)
+    subscriber.subscribe_to_newspaper(newspaper)
+    assert subscriber.serialize(fields={"name"}) == {"name": "John Doe"}
+    assert subscriber.serialize()["newspapers"] == [1]
+    assert subscriber.serialize(depth=1)["newspapers"] == [newspaper.serialize_paper_id()]
+    assert subscriber.serialize(depth=2)["newspapers"] == [newspaper.serialize()]
+
+def test_newspapers_list_is_created_on_demand(subscriber):
+    assert subscriber.calculate_subscriptions() == 0
+    assert subscriber.serialize()["newspapers"] == []
+    assert subscriber._newspapers is None
+    subscriber.subscribe_to_newspaper(Newspaper(paper_id=1, name="Test Newspaper", frequency=7, price=3.14))
+    assert [newspaper.paper_id for newspaper in subscriber.newspapers] == [1]
+    with pytest.raises(AttributeError):
+        subscriber.nickname = "JD"
+
+def test_monthly_cost_is_kept_exact(subscriber):
+    papers = [Newspaper(paper_id=n, name="Test Newspaper", frequency=7, price=price)
+              for n, price in enumerate([0.1, 0.2, 3.14])]
+    for paper in papers:
+        subscriber.subscribe_to_newspaper(paper)
+    subscriber.subscribe_to_newspaper(papers[0])
+    assert subscriber.calculate_monthly_cost() == 3.44
+    papers[2].update(price=2.0)
+    assert subscriber.calculate_monthly_cost() == 2.3
+    assert subscriber.calculate_annual_cost() == 27.6
+    subscriber.unsubscribe_from_newspaper(papers[1])
+    subscriber.unsubscribe_from_newspaper(papers[2])
+    assert subscriber.calculate_monthly_cost() == 0.1
+    subscriber.unsubscribe_from_newspaper(papers[0])
+    assert subscriber.calculate_monthly_cost() == 0
+
+def test_price_change_leaves_subscribers_alone(subscriber):
+    paper = Newspaper(paper_id=1, name="Test Newspaper", frequency=7, price=3.0)
+    subscriber.subscribe_to_newspaper(paper)
+    version = subscriber.version
+    paper.update(price=4.5)
+    # the cost is read from the current price, so the subscriber is not rewritten
+    assert subscriber.version == version
+    assert subscriber.calculate_monthly_cost() == 4.5